@@ -155,22 +155,7 @@ def profile_setup_view(request):
         preferences.budget_preference = request.POST.get('budget_preference', 'medium')
         preferences.save()
         
-        # NUEVO: Crear perfil nutricional
-        from recommendations.models import NutritionalProfile
-        nutritional_profile, created = NutritionalProfile.objects.get_or_create(
-            user=user,
-            defaults={
-                'target_calories': user.daily_calories or 2000,
-                'target_protein': user.daily_protein or 150,
-                'target_carbs': user.daily_carbs or 250,
-                'target_fat': user.daily_fat or 65,
-                'target_fiber': 25,
-                'max_sodium': 2300,
-                'min_calcium': 1000,
-                'min_iron': 8,
-                'min_vitamin_c': 90
-            }
-        )
+        # El perfil nutricional se crea por señal al guardar el usuario con el perfil completo
         
         messages.success(request, '¡Perfil completado! Bienvenido a NutriMatch.')
         return redirect('dashboard')
@@ -1,9 +1,12 @@
 # core/views.py
+import logging
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.db.models import Count, Sum
 
+logger = logging.getLogger(__name__)
+
 def home_view(request):
     """Página de inicio"""
     if request.user.is_authenticated:
@@ -20,93 +23,15 @@ def dashboard_view(request):
     if not request.user.profile_completed:
         return redirect('auth:profile_setup')
     
-    from recommendations.models import DailyNutritionLog, FoodConsumption
-    from django.utils import timezone
-    
-    today = timezone.now().date()
-    
-    # Valores por defecto
-    today_nutrition = {
-        'calories': 0, 
-        'protein': 0, 
-        'carbs': 0, 
-        'fat': 0, 
-        'adherence_score': None
-    }
-    
-    # Inicializar recent_foods vacío
-    recent_foods = []
-    
-    try:
-        daily_log = DailyNutritionLog.objects.get(user=request.user, date=today)
-        today_nutrition = {
-            'calories': daily_log.consumed_calories or 0,
-            'protein': daily_log.consumed_protein or 0,
-            'carbs': daily_log.consumed_carbs or 0,
-            'fat': daily_log.consumed_fat or 0,
-            'adherence_score': daily_log.adherence_score
-        }
-        print(f"DEBUG - Datos encontrados: {today_nutrition}")  # Debug adicional
-        
-        # Obtener comidas recientes del día
-        recent_foods = FoodConsumption.objects.filter(
-            daily_log=daily_log
-        ).select_related('food').order_by('-timestamp')[:5]
-        
-    except DailyNutritionLog.DoesNotExist:
-        print("DEBUG - No hay datos para hoy, usando valores por defecto")  # Debug adicional
-        pass
-    
-    # Targets con valores por defecto
-    nutrition_targets = {
-        'calories': request.user.daily_calories or 2000,
-        'protein': request.user.daily_protein or 150,
-        'carbs': request.user.daily_carbs or 250,
-        'fat': request.user.daily_fat or 65
-    }
-    
-    print(f"DEBUG - Targets: {nutrition_targets}")  # Debug adicional
+    from recommendations.snapshots import get_dashboard_snapshot
     
-    # Calcular porcentajes de forma muy simple
-    percentages = {}
-    
-    # Calorías
-    if nutrition_targets['calories'] > 0:
-        percentages['calories'] = round((today_nutrition['calories'] / nutrition_targets['calories']) * 100, 1)
-    else:
-        percentages['calories'] = 0
-    
-    # Proteína
-    if nutrition_targets['protein'] > 0:
-        percentages['protein'] = round((today_nutrition['protein'] / nutrition_targets['protein']) * 100, 1)
-    else:
-        percentages['protein'] = 0
-    
-    # Carbohidratos
-    if nutrition_targets['carbs'] > 0:
-        percentages['carbs'] = round((today_nutrition['carbs'] / nutrition_targets['carbs']) * 100, 1)
-    else:
-        percentages['carbs'] = 0
-    
-    # Grasas
-    if nutrition_targets['fat'] > 0:
-        percentages['fat'] = round((today_nutrition['fat'] / nutrition_targets['fat']) * 100, 1)
-    else:
-        percentages['fat'] = 0
-    
-    # Limitar a 100% máximo
-    for key in percentages:
-        if percentages[key] > 100:
-            percentages[key] = 100
-    
-    print(f"DEBUG - Percentages: {percentages}")  # Para debug original
+    # Snapshot cacheado: totales, objetivos, porcentajes y comidas recientes de hoy
+    snapshot = get_dashboard_snapshot(request.user)
+    logger.debug('Dashboard de %s: %s', request.user.username, snapshot['percentages'])
     
     context = {
         'user': request.user,
-        'today_nutrition': today_nutrition,
-        'nutrition_targets': nutrition_targets,
-        'percentages': percentages,
-        'recent_foods': recent_foods  # Agregado de la segunda función
+        **snapshot
     }
     
     return render(request, 'core/dashboard.html', context)
@@ -157,9 +82,6 @@ def progress_view(request):
         chart_data['fat'].append(float(log.consumed_fat or 0))
         chart_data['adherence'].append(float(log.adherence_score or 0))
     
-    # Debug: Imprimir los datos para verificar
-    print("Chart data:", chart_data)
-    
     # Estadísticas generales
     if daily_logs:
         avg_calories = sum(log.consumed_calories or 0 for log in daily_logs) / len(daily_logs)
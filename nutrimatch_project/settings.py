@@ -156,6 +156,28 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20
 }
 
+# Caché (contexto nutricional por usuario, listas de segmento, etc.)
+# En producción con varios procesos debe ser un backend compartido
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='nutrimatch'),
+    }
+}
+
+# Registro de sesiones de recomendación: 'async' (write-behind) o 'sync' (tests)
+RECOMMENDATION_LOG_MODE = config('RECOMMENDATION_LOG_MODE', default='async')
+RECOMMENDATION_LOG_QUEUE_SIZE = 1000
+RECOMMENDATION_LOG_BATCH_SIZE = 100
+RECOMMENDATION_LOG_FLUSH_INTERVAL = 1.0  # segundos
+
+# Sincronización offline de consumos: máximo de eventos por petición y tamaño de lote
+CONSUMPTION_SYNC_MAX_EVENTS = config('CONSUMPTION_SYNC_MAX_EVENTS', default=1000, cast=int)
+CONSUMPTION_SYNC_CHUNK_SIZE = 200
+
+# Filtros del catálogo de alimentos: 'orm' (SQL) o 'columnar' (NumPy en memoria)
+FOOD_FILTER_ENGINE = config('FOOD_FILTER_ENGINE', default='orm')
+
 # CORS (para desarrollo frontend)
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",  # React
@@ -1,7 +1,10 @@
 # nutrition/admin.py
 from django.contrib import admin
+from django.db import transaction
+from django.db.models import Count
 from django.utils.html import format_html
-from .models import Food, FoodCategory, FoodAlias
+from .catalog import record_catalog_changes
+from .models import Food, FoodCategory, FoodAlias, CatalogChange
 
 @admin.register(FoodCategory)
 class FoodCategoryAdmin(admin.ModelAdmin):
@@ -16,9 +19,13 @@ class FoodCategoryAdmin(admin.ModelAdmin):
         )
     color_preview.short_description = 'Color'
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(food_count=Count('food'))
+    
     def food_count(self, obj):
-        return obj.food_set.count()
+        return obj.food_count
     food_count.short_description = 'Cantidad de Alimentos'
+    food_count.admin_order_field = 'food_count'
 
 @admin.register(Food)
 class FoodAdmin(admin.ModelAdmin):
@@ -78,16 +85,24 @@ class FoodAdmin(admin.ModelAdmin):
     name_display.admin_order_field = 'name_es'
     
     def mark_as_verified(self, request, queryset):
-        updated = queryset.update(is_verified=True)
+        with transaction.atomic():
+            food_ids = list(queryset.values_list('id', flat=True))
+            updated = queryset.update(is_verified=True)
+            # update() no dispara señales: registrar los cambios del catálogo
+            record_catalog_changes('food', food_ids)
         self.message_user(request, f'{updated} alimentos marcados como verificados.')
     mark_as_verified.short_description = "Marcar como verificados"
     
     def recalculate_metrics(self, request, queryset):
-        updated = 0
-        for food in queryset:
-            food.save()  # Esto ejecutará el cálculo automático
-            updated += 1
-        self.message_user(request, f'Métricas recalculadas para {updated} alimentos.')
+        foods = list(queryset)
+        for food in foods:
+            food.refresh_computed_fields()
+        with transaction.atomic():
+            Food.objects.bulk_update(
+                foods, ['protein_density', 'nutrient_density_score', 'name_key', 'name_es_key'], batch_size=500
+            )
+            record_catalog_changes('food', [food.id for food in foods])
+        self.message_user(request, f'Métricas recalculadas para {len(foods)} alimentos.')
     recalculate_metrics.short_description = "Recalcular métricas"
 
 @admin.register(FoodAlias)
@@ -95,4 +110,17 @@ class FoodAliasAdmin(admin.ModelAdmin):
     list_display = ('alias', 'food', 'language')
     list_filter = ('language',)
     search_fields = ('alias', 'food__name', 'food__name_es')
-    autocomplete_fields = ['food']
\ No newline at end of file
+    autocomplete_fields = ['food']
+
+@admin.register(CatalogChange)
+class CatalogChangeAdmin(admin.ModelAdmin):
+    """Solo lectura: lo escriben las señales y las operaciones en bloque del catálogo"""
+    list_display = ('id', 'version', 'model', 'object_id', 'action', 'created_at')
+    list_filter = ('model', 'action')
+    readonly_fields = [field.name for field in CatalogChange._meta.fields]
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
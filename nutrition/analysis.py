@@ -0,0 +1,102 @@
+# nutrition/analysis.py
+import numpy as np
+from .models import Food, NUTRIENT_FIELDS
+
+MAX_ANALYSIS_MEALS = 100
+MAX_ANALYSIS_ITEMS = 2000
+
+
+def _parse_item(item):
+    """(food_id, cantidad) de un elemento, o mensaje de error"""
+    if not isinstance(item, dict):
+        return None, 'Cada elemento debe ser un objeto con food_id y quantity'
+    try:
+        food_id = int(item.get('food_id'))
+    except (TypeError, ValueError):
+        return None, 'food_id inválido'
+    try:
+        quantity = float(item.get('quantity'))
+    except (TypeError, ValueError):
+        return None, 'quantity inválida'
+    if not np.isfinite(quantity) or quantity <= 0:
+        return None, 'quantity debe ser mayor que 0'
+    return (food_id, quantity), None
+
+
+def analyze_meals(meals):
+    """
+    Nutrientes por elemento, por comida y totales para varias comidas.
+
+    `meals`: lista de {'name': opcional, 'items': [{'food_id', 'quantity'}]}.
+    Todos los alimentos distintos se leen con un único in_bulk; los valores
+    se calculan como matriz (elementos × nutrientes) escalada por
+    cantidad/porción y se suman por comida con np.add.at. Un elemento
+    inválido o un alimento inexistente no interrumpe el resto: se devuelve
+    con su error.
+    """
+    results = []
+    parsed = []  # (índice de comida, índice de elemento, food_id, cantidad)
+    for meal_index, meal in enumerate(meals):
+        meal = meal if isinstance(meal, dict) else {}
+        items = meal.get('items')
+        result = {'name': meal.get('name'), 'items': [], 'errors': 0}
+        if not isinstance(items, list):
+            result['error'] = 'items debe ser una lista'
+            result['errors'] += 1
+            items = []
+        for item_index, item in enumerate(items):
+            pair, error = _parse_item(item)
+            if error:
+                result['items'].append({'food_id': item.get('food_id') if isinstance(item, dict) else None, 'error': error})
+                result['errors'] += 1
+            else:
+                result['items'].append(None)
+                parsed.append((meal_index, item_index, *pair))
+        results.append(result)
+
+    food_ids = sorted({food_id for _, _, food_id, _ in parsed})
+    foods = Food.objects.only('id', 'name', 'name_es', 'serving_size', *NUTRIENT_FIELDS).in_bulk(food_ids)
+
+    # Matriz de nutrientes por porción, una fila por alimento encontrado
+    rows = {food_id: row for row, food_id in enumerate(foods)}
+    matrix = np.array(
+        [[getattr(food, field) or 0 for field in NUTRIENT_FIELDS] for food in foods.values()],
+        dtype=np.float64
+    ).reshape(len(foods), len(NUTRIENT_FIELDS))
+
+    valid = []
+    for meal_index, item_index, food_id, quantity in parsed:
+        food = foods.get(food_id)
+        if food is None or not food.serving_size:
+            error = 'Alimento no encontrado' if food is None else 'El alimento no tiene porción definida'
+            results[meal_index]['items'][item_index] = {'food_id': food_id, 'error': error}
+            results[meal_index]['errors'] += 1
+            continue
+        valid.append((meal_index, item_index, food_id, quantity, quantity / food.serving_size))
+
+    item_values = np.zeros((len(valid), len(NUTRIENT_FIELDS)))
+    meal_totals = np.zeros((len(results), len(NUTRIENT_FIELDS)))
+    if valid:
+        meal_indexes = np.array([entry[0] for entry in valid])
+        food_rows = np.array([rows[entry[2]] for entry in valid])
+        factors = np.array([entry[4] for entry in valid])
+        item_values = matrix[food_rows] * factors[:, None]
+        np.add.at(meal_totals, meal_indexes, item_values)
+
+    for (meal_index, item_index, food_id, quantity, _), values in zip(valid, np.round(item_values, 2).tolist()):
+        food = foods[food_id]
+        results[meal_index]['items'][item_index] = {
+            'food_id': food_id,
+            'food_name': food.name_es or food.name,
+            'quantity': quantity,
+            'nutrients': dict(zip(NUTRIENT_FIELDS, values)),
+        }
+
+    for result, totals in zip(results, np.round(meal_totals, 2).tolist()):
+        result['totals'] = dict(zip(NUTRIENT_FIELDS, totals))
+
+    return {
+        'meals': results,
+        'totals': dict(zip(NUTRIENT_FIELDS, np.round(meal_totals.sum(axis=0), 2).tolist())),
+        'errors': sum(result['errors'] for result in results),
+    }
@@ -0,0 +1,105 @@
+# nutrition/autocomplete.py
+import threading
+import marisa_trie
+from .catalog import get_catalog_version, refresh_catalog_cache
+from .models import Food, FoodAlias
+from .text import normalize_text
+
+# Tipo de coincidencia, en orden de preferencia
+FULL_NAME_MATCH = 0
+WORD_MATCH = 1
+
+
+class FoodAutocompleteIndex:
+    """
+    Trie de prefijos (marisa-trie) sobre nombres normalizados en español,
+    inglés y alias. Además del nombre completo se indexa cada palabra
+    interior ('pechuga de pollo' también responde a 'pollo'). Las
+    sugerencias se devuelven con su payload precalculado: no hay consultas.
+    """
+
+    MIN_QUERY_LENGTH = 2
+    MIN_WORD_LENGTH = 3
+    # Coincidencias examinadas antes de ordenar (acota prefijos muy comunes)
+    SCAN_LIMIT = 300
+
+    def __init__(self, entries, payloads, version=None):
+        """`entries`: (texto, posición del payload); `payloads`: dicts listos para la respuesta"""
+        self.version = version
+        self.payloads = payloads
+
+        records = []
+        for text, position in entries:
+            normalized = normalize_text(text)
+            if not normalized:
+                continue
+            records.append((normalized, (position, FULL_NAME_MATCH)))
+            words = normalized.split()
+            for start in range(1, len(words)):
+                if len(words[start]) >= self.MIN_WORD_LENGTH:
+                    records.append((' '.join(words[start:]), (position, WORD_MATCH)))
+
+        self.trie = marisa_trie.RecordTrie('<IB', records)
+
+    @classmethod
+    def build(cls, version=None):
+        """Cargar alimentos (con categoría) y alias con dos consultas"""
+        payloads = []
+        positions = {}
+        entries = []
+        for food in Food.objects.order_by('id').values(
+            'id', 'name', 'name_es', 'calories', 'protein', 'category__name_es'
+        ):
+            positions[food['id']] = len(payloads)
+            payloads.append({
+                'id': food['id'],
+                'name': food['name_es'] or food['name'],
+                'category': food['category__name_es'] or 'Sin categoría',
+                'calories': food['calories'],
+                'protein': food['protein']
+            })
+            entries.append((food['name'], positions[food['id']]))
+            if food['name_es']:
+                entries.append((food['name_es'], positions[food['id']]))
+
+        for food_id, alias in FoodAlias.objects.values_list('food_id', 'alias'):
+            if food_id in positions:
+                entries.append((alias, positions[food_id]))
+
+        return cls(entries, payloads, version)
+
+    def suggest(self, query, limit=10):
+        """Payloads de los alimentos cuyo nombre (o una de sus palabras) empieza por la consulta"""
+        prefix = normalize_text(query)
+        if len(prefix) < self.MIN_QUERY_LENGTH:
+            return []
+
+        best = {}
+        for scanned, (key, (position, match_type)) in enumerate(self.trie.iteritems(prefix)):
+            if scanned >= self.SCAN_LIMIT:
+                break
+            rank = (match_type, len(key))
+            if position not in best or rank < best[position]:
+                best[position] = rank
+
+        ranked = sorted(best, key=lambda position: (best[position], self.payloads[position]['name']))
+        return [self.payloads[position] for position in ranked[:limit]]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_autocomplete_index():
+    """Trie del proceso, al día con la versión del catálogo"""
+    global _index
+    version = get_catalog_version()
+    index = _index
+    if index is not None and index.version == version:
+        return index
+
+    with _index_lock:
+        _index = refresh_catalog_cache(
+            _index, version, FoodAutocompleteIndex.build, depends_on=('food', 'category', 'alias')
+        )
+        return _index
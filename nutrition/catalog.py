@@ -0,0 +1,127 @@
+# nutrition/catalog.py
+from collections import defaultdict
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Min
+from .models import CatalogChange, CatalogVersion
+
+CATALOG_VERSION_KEY = 'nutrition:catalog_version'
+# Fila única de CatalogVersion
+CATALOG_VERSION_ROW = 1
+# Segundos que se confía en la versión cacheada antes de releerla: los comandos
+# (import_foods, translate_food_names...) corren en otro proceso y sólo
+# publican en su propia caché si ésta es local (LocMem)
+CATALOG_VERSION_TTL = 5
+
+# Con más cambios pendientes que éstos sale más barato reconstruir que actualizar
+CHANGE_FEED_LIMIT = 1000
+
+
+def get_catalog_version():
+    """
+    Versión actual del catálogo: valor de CatalogVersion (0 si no hay
+    cambios). Puede ir hasta CATALOG_VERSION_TTL segundos atrasada respecto a
+    cambios hechos en otro proceso.
+    """
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        version = refresh_catalog_version()
+    return version
+
+
+def refresh_catalog_version():
+    """Releer la versión de la base de datos y publicarla en la caché"""
+    version = CatalogVersion.objects.filter(pk=CATALOG_VERSION_ROW).values_list('value', flat=True).first() or 0
+    cache.set(CATALOG_VERSION_KEY, version, CATALOG_VERSION_TTL)
+    return version
+
+
+def record_catalog_changes(model, object_ids, action='save'):
+    """
+    Registrar que cambiaron objetos del catálogo (`model`: 'food',
+    'category' o 'alias'). Las operaciones en bloque (bulk_create,
+    bulk_update, update) no disparan señales y deben llamarla
+    explícitamente. La nueva versión se publica al confirmar la transacción,
+    para que ningún proceso reconstruya sus índices con datos sin confirmar.
+    """
+    object_ids = list(object_ids)
+    if not object_ids:
+        return
+    with transaction.atomic():
+        version = _next_catalog_version()
+        CatalogChange.objects.bulk_create([
+            CatalogChange(model=model, object_id=object_id, action=action, version=version)
+            for object_id in object_ids
+        ], batch_size=1000)
+    transaction.on_commit(refresh_catalog_version)
+
+
+def _next_catalog_version():
+    """
+    Incrementar el contador con un UPDATE, que bloquea la fila hasta el
+    commit: otra transacción que registre cambios espera, así que una versión
+    visible implica que todas las anteriores ya están confirmadas.
+    """
+    counter = CatalogVersion.objects.filter(pk=CATALOG_VERSION_ROW)
+    if not counter.update(value=F('value') + 1):
+        # Fila ausente (base de datos vaciada): crearla y repetir
+        CatalogVersion.objects.bulk_create([CatalogVersion(pk=CATALOG_VERSION_ROW)], ignore_conflicts=True)
+        counter.update(value=F('value') + 1)
+    return counter.values_list('value', flat=True).get()
+
+
+def get_changes_since(version, limit=CHANGE_FEED_LIMIT):
+    """
+    IDs cambiados por modelo desde `version` (excluida): {'food': {...}, ...}.
+
+    Devuelve None si no se puede responder de forma incremental (más de
+    `limit` cambios, o el registro ya se podó por debajo de esa versión):
+    quien pregunta debe reconstruir desde cero.
+    """
+    oldest = CatalogChange.objects.aggregate(oldest=Min('version'))['oldest']
+    if oldest is not None and oldest > version + 1:
+        return None
+
+    rows = list(CatalogChange.objects.filter(version__gt=version).order_by('version', 'id').values_list(
+        'model', 'object_id'
+    )[:limit + 1])
+    if len(rows) > limit:
+        return None
+
+    changes = defaultdict(set)
+    for model, object_id in rows:
+        changes[model].add(object_id)
+    return dict(changes)
+
+
+def refresh_catalog_cache(current, version, build, depends_on, update=None):
+    """
+    Poner al día una estructura derivada del catálogo (con atributo `version`).
+
+    - Misma versión: se devuelve tal cual.
+    - Los cambios no tocan los modelos de `depends_on`: sólo se adopta la versión.
+    - `update(current, changes, version)` puede aplicar los cambios y devolver
+      una estructura nueva (None si prefiere reconstruir).
+    - En otro caso (o sin registro suficiente): `build(version)`.
+    """
+    if current is not None and current.version == version:
+        return current
+
+    changes = get_changes_since(current.version) if current is not None else None
+    if changes is not None:
+        relevant = {model: ids for model, ids in changes.items() if model in depends_on}
+        if not relevant:
+            current.version = version
+            return current
+        if update is not None:
+            updated = update(current, relevant, version)
+            if updated is not None:
+                return updated
+    return build(version)
+
+
+def prune_catalog_changes(before):
+    """Borrar el registro anterior a `before` (datetime); la versión actual no cambia"""
+    latest = get_catalog_version()
+    deleted, _ = CatalogChange.objects.filter(created_at__lt=before, version__lt=latest).delete()
+    return deleted
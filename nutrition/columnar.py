@@ -0,0 +1,217 @@
+# nutrition/columnar.py
+import threading
+from bisect import bisect_left, bisect_right
+import numpy as np
+from rest_framework.exceptions import ValidationError
+from .catalog import get_catalog_version, refresh_catalog_cache
+from .models import Food
+
+NUMERIC_FIELDS = ('calories', 'protein', 'carbohydrate', 'fat', 'fiber', 'sodium', 'protein_density')
+
+# Atajos de FoodListView: parámetro -> (campo, lookup, valor)
+FLAG_FILTERS = {
+    'high_protein': ('protein', 'gte', 15),
+    'low_carb': ('carbohydrate', 'lte', 10),
+    'high_fiber': ('fiber', 'gte', 5),
+    'low_sodium': ('sodium', 'lte', 140),
+}
+
+FILTER_ENGINES = ('orm', 'columnar')
+
+_TRUE_VALUES = ('true', '1')
+_FALSE_VALUES = ('false', '0')
+
+
+def parse_filters(params, filterset_fields):
+    """
+    Convertir los parámetros de la petición en condiciones (campo, lookup, valor)
+    con las mismas reglas que filterset_fields y los atajos de FLAG_FILTERS.
+    """
+    conditions = []
+    errors = {}
+    for field, lookups in filterset_fields.items():
+        for lookup in lookups:
+            param = field if lookup == 'exact' else f'{field}__{lookup}'
+            raw = params.get(param, '')
+            if raw == '':
+                continue
+            try:
+                if field == 'is_verified':
+                    if raw.lower() not in _TRUE_VALUES + _FALSE_VALUES:
+                        raise ValueError
+                    value = raw.lower() in _TRUE_VALUES
+                elif field == 'category':
+                    value = int(raw)
+                else:
+                    value = float(raw)
+            except ValueError:
+                errors[param] = ['Valor inválido']
+                continue
+            conditions.append((field, lookup, value))
+
+    if errors:
+        raise ValidationError(errors)
+
+    for param, condition in FLAG_FILTERS.items():
+        if params.get(param) == 'true':
+            conditions.append(condition)
+    return conditions
+
+
+class ColumnarCatalog:
+    """
+    Copia columnar del catálogo en arrays NumPy (una consulta). Los filtros
+    por rangos se evalúan como máscaras booleanas combinadas con AND, sin
+    depender de qué índice elija MySQL, y la página se selecciona con
+    argpartition en vez de ordenar todas las coincidencias.
+    """
+
+    def __init__(self, rows, version=None):
+        """`rows`: tuplas (id, name_key, category_id, is_verified, *NUMERIC_FIELDS)"""
+        self.version = version
+        rows = list(rows)
+        columns = list(zip(*rows)) if rows else [()] * (4 + len(NUMERIC_FIELDS))
+
+        self.ids = np.array(columns[0], dtype=np.int64)
+        self.name_keys = list(columns[1])
+        self.category_ids = np.array([-1 if value is None else value for value in columns[2]], dtype=np.int64)
+        self.is_verified = np.array(columns[3], dtype=bool)
+        self.columns = {
+            field: np.array([np.nan if value is None else value for value in column], dtype=np.float64)
+            for field, column in zip(NUMERIC_FIELDS, columns[4:])
+        }
+        self._rank_names()
+
+    @staticmethod
+    def _query():
+        return Food.objects.order_by('id').values_list(
+            'id', 'name_key', 'category_id', 'is_verified', *NUMERIC_FIELDS
+        )
+
+    @classmethod
+    def build(cls, version=None):
+        return cls(cls._query(), version)
+
+    def _rank_names(self):
+        """Orden por nombre: rango precalculado sobre (name_key, id), el mismo orden que en MySQL"""
+        ids = self.ids.tolist()
+        order = sorted(range(len(ids)), key=lambda position: (self.name_keys[position], ids[position]))
+        self.name_rank = np.empty(len(ids), dtype=np.int64)
+        self.name_rank[order] = np.arange(len(ids))
+        self.sorted_name_keys = [(self.name_keys[position], ids[position]) for position in order]
+
+    def apply_changes(self, changes, version):
+        """
+        Catálogo nuevo con los alimentos de `changes['food']` releídos (los
+        borrados desaparecen); el actual no se modifica porque otros hilos
+        pueden estar leyéndolo.
+        """
+        food_ids = list(changes.get('food', ()))
+        keep = np.flatnonzero(~np.isin(self.ids, food_ids))
+
+        catalog = ColumnarCatalog(self._query().filter(id__in=food_ids), version)
+        catalog.ids = np.concatenate([self.ids[keep], catalog.ids])
+        catalog.name_keys = [self.name_keys[position] for position in keep] + catalog.name_keys
+        catalog.category_ids = np.concatenate([self.category_ids[keep], catalog.category_ids])
+        catalog.is_verified = np.concatenate([self.is_verified[keep], catalog.is_verified])
+        catalog.columns = {
+            field: np.concatenate([column[keep], catalog.columns[field]])
+            for field, column in self.columns.items()
+        }
+        catalog._rank_names()
+        return catalog
+
+    def __len__(self):
+        return len(self.ids)
+
+    def food_id(self, position):
+        return int(self.ids[position])
+
+    def value(self, field, position):
+        """Valor de la fila tal y como lo devolvería el ORM (para el cursor)"""
+        if field == 'name_key':
+            return self.name_keys[position]
+        value = self.columns[field][position]
+        return None if np.isnan(value) else float(value)
+
+    def mask(self, conditions):
+        """Máscara booleana de las filas que cumplen todas las condiciones"""
+        mask = np.ones(len(self), dtype=bool)
+        for field, lookup, value in conditions:
+            if field == 'category':
+                column = self.category_ids
+            elif field == 'is_verified':
+                column = self.is_verified
+            else:
+                column = self.columns[field]
+
+            if lookup == 'gte':
+                mask &= column >= value
+            elif lookup == 'lte':
+                mask &= column <= value
+            else:
+                mask &= column == value
+        return mask
+
+    def page(self, mask, field, descending, cursor, size):
+        """
+        Posiciones de las `size` primeras filas de la máscara en el orden
+        (campo, id), posteriores al cursor (valor, id) si lo hay. NaN (NULL)
+        al final, como en KeysetPagination.
+        """
+        if field == 'name_key':
+            keys = -self.name_rank if descending else self.name_rank
+            if cursor is not None:
+                position = (str(cursor[0]), cursor[1])
+                if descending:
+                    mask = mask & (self.name_rank < bisect_left(self.sorted_name_keys, position))
+                else:
+                    mask = mask & (self.name_rank >= bisect_right(self.sorted_name_keys, position))
+            candidates = np.flatnonzero(mask)
+            if len(candidates) > size:
+                candidates = candidates[np.argpartition(keys[candidates], size - 1)[:size]]
+            return candidates[np.argsort(keys[candidates])].tolist()
+
+        values = -self.columns[field] if descending else self.columns[field]
+        tie_ids = -self.ids if descending else self.ids
+        missing = np.isnan(values)
+
+        if cursor is not None:
+            value, pk = cursor
+            tie_pk = -pk if descending else pk
+            if value is None:
+                mask = mask & missing & (tie_ids > tie_pk)
+            else:
+                value = -value if descending else value
+                mask = mask & ((values > value) | ((values == value) & (tie_ids > tie_pk)) | missing)
+
+        candidates = np.flatnonzero(mask)
+        filled = np.where(missing[candidates], np.inf, values[candidates])
+        if len(candidates) > size:
+            # Umbral de la página; se conservan todos los empates con él
+            threshold = np.partition(filled, size - 1)[size - 1]
+            keep = filled <= threshold
+            candidates, filled = candidates[keep], filled[keep]
+
+        order = np.lexsort((tie_ids[candidates], filled))[:size]
+        return candidates[order].tolist()
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_columnar_catalog():
+    """Catálogo columnar del proceso, al día con la versión del catálogo (incremental si se puede)"""
+    global _catalog
+    version = get_catalog_version()
+    catalog = _catalog
+    if catalog is not None and catalog.version == version:
+        return catalog
+
+    with _catalog_lock:
+        _catalog = refresh_catalog_cache(
+            _catalog, version, ColumnarCatalog.build, depends_on=('food',),
+            update=lambda catalog, changes, version: catalog.apply_changes(changes, version)
+        )
+        return _catalog
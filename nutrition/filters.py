@@ -0,0 +1,18 @@
+# nutrition/filters.py
+from rest_framework import filters
+from .text import normalize_text
+
+
+class NormalizedSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter por prefijo sobre las claves de búsqueda (minúsculas, sin
+    tildes ni signos): 'platano' encuentra 'Plátano maduro'. La consulta se
+    normaliza igual que las claves y se busca como un único prefijo, de modo
+    que con search_fields '^campo_key' cada columna se filtra con
+    LIKE 'termino%' y MySQL recorre su índice por rangos. Las coincidencias
+    en mitad del nombre las resuelve /search/ (índice BM25), no este filtro.
+    """
+
+    def get_search_terms(self, request):
+        term = normalize_text(' '.join(super().get_search_terms(request)))
+        return [term] if term else []
@@ -0,0 +1,110 @@
+# nutrition/http_cache.py
+import gzip
+import hashlib
+from functools import wraps
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from .catalog import get_catalog_version
+
+CATALOG_HTTP_CACHE_TIMEOUT = 60 * 60 * 24  # la clave incluye la versión del catálogo
+GZIP_MIN_SIZE = 1024
+
+
+def _cache_key(request, version):
+    # URL absoluta (los enlaces de paginación incluyen host y esquema) y Accept,
+    # que decide el renderer: la clave varía con lo mismo que Vary
+    accept = request.META.get('HTTP_ACCEPT', '').strip()
+    key_hash = hashlib.md5(f'{request.build_absolute_uri()}\n{accept}'.encode()).hexdigest()
+    return f'catalog_http:{version}:{key_hash}'
+
+
+def _accepts_gzip(request):
+    """Accept-Encoding admite gzip con q > 0 (explícitamente o con *)"""
+    qualities = {}
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities.get('gzip', qualities.get('x-gzip', qualities.get('*', 0))) > 0
+
+
+def _etag_matches(request, etag):
+    header = request.META.get('HTTP_IF_NONE_MATCH', '')
+    return header.strip() == '*' or etag in [tag.strip() for tag in header.split(',')]
+
+
+def _build_entry(response):
+    """Cuerpo serializado, su versión gzip y ETags fuertes de cada representación"""
+    body = response.content
+    digest = hashlib.md5(body).hexdigest()
+    entry = {
+        'content_type': response['Content-Type'],
+        'body': body,
+        'etag': f'"{digest}"',
+        'gzip': None,
+    }
+    if len(body) >= GZIP_MIN_SIZE:
+        entry['gzip'] = gzip.compress(body, mtime=0)
+        entry['gzip_etag'] = f'"{digest}-gz"'
+    return entry
+
+
+def catalog_cache(max_age=60):
+    """
+    Cachear respuestas GET de vistas derivadas sólo del catálogo de alimentos.
+
+    La clave combina URL (con querystring), cabecera Accept y versión del
+    catálogo, así que cualquier cambio registrado en CatalogChange invalida
+    todas las entradas sin TTL arbitrarios. Se guarda el JSON ya renderizado
+    y comprimido con gzip (que se sirve si Accept-Encoding lo admite con
+    q > 0); un acierto, y un If-None-Match que coincide (304), no tocan la
+    base de datos. HEAD recibe sólo las cabeceras. Las peticiones del
+    navegador (HTML de la API navegable) y las respuestas que no son 200
+    pasan sin caché.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or 'text/html' in request.META.get('HTTP_ACCEPT', ''):
+                return view_func(request, *args, **kwargs)
+
+            cache_key = _cache_key(request, get_catalog_version())
+            entry = cache.get(cache_key)
+            if entry is None:
+                response = view_func(request, *args, **kwargs)
+                if callable(getattr(response, 'render', None)):
+                    response = response.render()
+                if response.status_code != 200 or 'json' not in response.get('Content-Type', ''):
+                    return response
+                entry = _build_entry(response)
+                cache.set(cache_key, entry, CATALOG_HTTP_CACHE_TIMEOUT)
+
+            use_gzip = entry['gzip'] is not None and _accepts_gzip(request)
+            etag = entry['gzip_etag'] if use_gzip else entry['etag']
+
+            if _etag_matches(request, etag):
+                response = HttpResponseNotModified()
+            else:
+                body = entry['gzip'] if use_gzip else entry['body']
+                # HEAD: sólo cabeceras, con la longitud que tendría el cuerpo
+                response = HttpResponse(b'' if request.method == 'HEAD' else body, content_type=entry['content_type'])
+                response['Content-Length'] = len(body)
+                if use_gzip:
+                    response['Content-Encoding'] = 'gzip'
+            response['ETag'] = etag
+            response['Cache-Control'] = f'public, max-age={max_age}'
+            patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+            return response
+        return wrapped
+    return decorator
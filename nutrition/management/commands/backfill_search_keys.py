@@ -0,0 +1,54 @@
+# nutrition/management/commands/backfill_search_keys.py
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from nutrition.catalog import record_catalog_changes
+from nutrition.models import Food, FoodAlias
+from nutrition.text import normalize_text
+
+
+class Command(BaseCommand):
+    help = 'Recalcular las claves de búsqueda normalizadas de alimentos y alias'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Filas por lote')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size <= 0:
+            raise CommandError('--chunk-size debe ser mayor que 0')
+
+        foods_updated = self.backfill(
+            Food, 'food', {'name_key': 'name', 'name_es_key': 'name_es'}, chunk_size
+        )
+        aliases_updated = self.backfill(FoodAlias, 'alias', {'alias_key': 'alias'}, chunk_size)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Claves actualizadas: {foods_updated} alimentos, {aliases_updated} alias'
+        ))
+
+    def backfill(self, model, change_model, key_fields, chunk_size):
+        """Recorrer la tabla por rangos de ID y guardar sólo las filas cuya clave cambia"""
+        fields = ['id', *key_fields.keys(), *key_fields.values()]
+        updated = 0
+        last_id = 0
+        while True:
+            rows = list(model.objects.filter(id__gt=last_id).order_by('id').only(*fields)[:chunk_size])
+            if not rows:
+                return updated
+            last_id = rows[-1].id
+
+            changed = []
+            for row in rows:
+                keys = {key: normalize_text(getattr(row, source)) for key, source in key_fields.items()}
+                if any(getattr(row, key) != value for key, value in keys.items()):
+                    for key, value in keys.items():
+                        setattr(row, key, value)
+                    changed.append(row)
+
+            if changed:
+                # bulk_update no dispara señales: registrar los cambios del catálogo
+                with transaction.atomic():
+                    model.objects.bulk_update(changed, list(key_fields))
+                    record_catalog_changes(change_model, [row.id for row in changed])
+                updated += len(changed)
+            self.stdout.write(f'{model.__name__}: hasta ID {last_id}, {updated} actualizados')
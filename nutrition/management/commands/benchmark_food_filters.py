@@ -0,0 +1,74 @@
+# nutrition/management/commands/benchmark_food_filters.py
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework import generics
+from rest_framework.test import APIRequestFactory
+from nutrition.columnar import get_columnar_catalog
+from nutrition.views import FoodListView
+
+# Consultas representativas del listado de alimentos
+DEFAULT_QUERIES = [
+    'calories__lte=300',
+    'calories__gte=100&calories__lte=400&protein__gte=10',
+    'protein__gte=20&fat__lte=10&ordering=-protein',
+    'high_protein=true&low_carb=true&ordering=calories',
+    'high_fiber=true&low_sodium=true&is_verified=true',
+    'carbohydrate__lte=30&fiber__gte=3&sodium__lte=400&ordering=-protein_density',
+    'calories__lte=500&ordering=-name',
+]
+
+
+class UncachedFoodListView(FoodListView):
+    """FoodListView sin catalog_cache: cada repetición mide el motor, no un acierto de caché"""
+    dispatch = generics.ListAPIView.dispatch
+
+
+class Command(BaseCommand):
+    help = 'Comparar el motor de filtros del catálogo ORM (SQL) con el columnar (NumPy)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--query', action='append', help='Querystring a medir (repetible)')
+        parser.add_argument('--repeat', type=int, default=20, help='Repeticiones por consulta y motor')
+        parser.add_argument('--page-size', type=int, default=20, help='Tamaño de página')
+        parser.add_argument('--host', default='localhost', help='Host de las peticiones (debe estar en ALLOWED_HOSTS)')
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        if repeat <= 0:
+            raise CommandError('--repeat debe ser mayor que 0')
+
+        queries = options['query'] or DEFAULT_QUERIES
+        factory = APIRequestFactory()
+        view = UncachedFoodListView.as_view()
+
+        # La construcción del catálogo columnar se mide aparte (ocurre una vez por versión)
+        started = time.perf_counter()
+        catalog = get_columnar_catalog()
+        self.stdout.write(f'Catálogo columnar: {len(catalog)} alimentos, {(time.perf_counter() - started) * 1000:.1f} ms')
+
+        for query in queries:
+            timings = {}
+            pages = {}
+            for engine in ('orm', 'columnar'):
+                url = f'/api/nutrition/foods/?{query}&engine={engine}&page_size={options["page_size"]}&count=true'
+                samples = []
+                for _ in range(repeat):
+                    request = factory.get(url, HTTP_HOST=options['host'])
+                    started = time.perf_counter()
+                    response = view(request)
+                    samples.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    raise CommandError(f'{engine} respondió {response.status_code} para {query}: {response.data}')
+                timings[engine] = samples
+                pages[engine] = (response.data.get('count'), [food['id'] for food in response.data['results']])
+
+            orm_ms = statistics.median(timings['orm'])
+            columnar_ms = statistics.median(timings['columnar'])
+            same_page = pages['orm'] == pages['columnar']
+            self.stdout.write(
+                f'{query}\n'
+                f'  orm: {orm_ms:.2f} ms  columnar: {columnar_ms:.2f} ms  '
+                f'(x{orm_ms / columnar_ms if columnar_ms else 0:.1f})  '
+                f'total: {pages["orm"][0]}  misma página: {"sí" if same_page else "NO"}'
+            )
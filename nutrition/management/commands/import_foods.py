@@ -4,6 +4,7 @@ import os
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from nutrition.models import Food, FoodCategory
+from nutrition.catalog import record_catalog_changes
 
 class Command(BaseCommand):
     help = 'Importar alimentos desde archivo CSV'
@@ -252,14 +253,14 @@ class Command(BaseCommand):
                 food_data['category'] = self.get_food_category(food_name)
                 food_data['data_source'] = 'csv_import'
                 
-                # Crear objeto Food
+                # Crear objeto Food (bulk_create no llama a save: calcular derivados aquí)
                 food = Food(**food_data)
+                food.refresh_computed_fields()
                 foods_to_create.append(food)
                 
                 # Insertar en lotes
                 if len(foods_to_create) >= batch_size:
-                    with transaction.atomic():
-                        Food.objects.bulk_create(foods_to_create, ignore_conflicts=True)
+                    self.insert_batch(foods_to_create)
                     imported += len(foods_to_create)
                     foods_to_create = []
                     
@@ -275,8 +276,7 @@ class Command(BaseCommand):
         
         # Insertar último lote
         if foods_to_create:
-            with transaction.atomic():
-                Food.objects.bulk_create(foods_to_create, ignore_conflicts=True)
+            self.insert_batch(foods_to_create)
             imported += len(foods_to_create)
         
         # Resumen final
@@ -286,4 +286,14 @@ class Command(BaseCommand):
         self.stdout.write(f'Alimentos importados: {imported}')
         self.stdout.write(f'Alimentos omitidos: {skipped}')
         self.stdout.write(f'Errores: {errors}')
-        self.stdout.write('='*50)
\ No newline at end of file
+        self.stdout.write('='*50)
+
+    def insert_batch(self, foods):
+        """Insertar un lote y registrarlo en el registro de cambios del catálogo"""
+        with transaction.atomic():
+            Food.objects.bulk_create(foods, ignore_conflicts=True)
+            # bulk_create no dispara señales (ni devuelve IDs en MySQL): buscarlos por nombre
+            food_ids = Food.objects.filter(
+                name__in=[food.name for food in foods], data_source='csv_import'
+            ).values_list('id', flat=True)
+            record_catalog_changes('food', list(food_ids))
@@ -0,0 +1,19 @@
+# nutrition/management/commands/prune_catalog_changes.py
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from nutrition.catalog import prune_catalog_changes
+
+
+class Command(BaseCommand):
+    help = 'Borrar el registro de cambios del catálogo más antiguo que --days días'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Días de registro a conservar')
+
+    def handle(self, *args, **options):
+        if options['days'] <= 0:
+            raise CommandError('--days debe ser mayor que 0')
+
+        deleted = prune_catalog_changes(timezone.now() - timedelta(days=options['days']))
+        self.stdout.write(self.style.SUCCESS(f'Cambios borrados: {deleted}'))
@@ -1,11 +1,17 @@
 # nutrition/management/commands/translate_food_names.py
 import pandas as pd
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from nutrition.catalog import record_catalog_changes
 from nutrition.models import Food
+from nutrition.text import normalize_text
 
 class Command(BaseCommand):
     help = 'Traducir nombres de alimentos al español'
     
+    BATCH_SIZE = 500
+    
     def add_arguments(self, parser):
         parser.add_argument(
             '--translation-file',
@@ -34,12 +40,11 @@ class Command(BaseCommand):
             df = pd.read_csv(file_path)
             translations = dict(zip(df['english'], df['spanish']))
             
-            updated = 0
-            for food in Food.objects.filter(name_es__isnull=True):
+            translated = []
+            for food in Food.objects.filter(name_es__isnull=True).only('id', 'name'):
                 if food.name in translations:
-                    food.name_es = translations[food.name]
-                    food.save()
-                    updated += 1
+                    translated.append(self.set_name_es(food, translations[food.name]))
+            updated = self.save_translations(translated)
             
             self.stdout.write(
                 self.style.SUCCESS(f'Actualizados {updated} nombres en español')
@@ -79,25 +84,33 @@ class Command(BaseCommand):
             'spinach': 'espinacas',
         }
         
-        updated = 0
-        for food in Food.objects.filter(name_es__isnull=True):
+        translated = []
+        for food in Food.objects.filter(name_es__isnull=True).only('id', 'name'):
             food_name_lower = food.name.lower()
-            translated = False
             
             for eng, esp in basic_translations.items():
                 if eng in food_name_lower:
-                    food.name_es = food.name.lower().replace(eng, esp).title()
-                    food.save()
-                    updated += 1
-                    translated = True
+                    translated.append(self.set_name_es(food, food_name_lower.replace(eng, esp).title()))
                     break
-            
-            if not translated:
+            else:
                 # Mantener nombre original si no se puede traducir
-                food.name_es = food.name
-                food.save()
-                updated += 1
+                translated.append(self.set_name_es(food, food.name))
+        updated = self.save_translations(translated)
         
         self.stdout.write(
             self.style.SUCCESS(f'Procesados {updated} nombres')
-        )
\ No newline at end of file
+        )
+
+    def set_name_es(self, food, name_es):
+        """Asignar la traducción junto con su clave de búsqueda normalizada"""
+        food.name_es = name_es
+        food.name_es_key = normalize_text(name_es)
+        food.updated_at = timezone.now()  # bulk_update no aplica auto_now
+        return food
+
+    def save_translations(self, foods):
+        """Guardar en lotes con bulk_update (sin un UPDATE ni una señal por alimento)"""
+        with transaction.atomic():
+            Food.objects.bulk_update(foods, ['name_es', 'name_es_key', 'updated_at'], batch_size=self.BATCH_SIZE)
+            record_catalog_changes('food', [food.id for food in foods])
+        return len(foods)
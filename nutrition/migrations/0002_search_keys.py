@@ -0,0 +1,58 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:05
+
+from django.db import migrations, models
+from nutrition.text import normalize_text
+
+CHUNK_SIZE = 2000
+
+
+def fill_search_keys(apps, schema_editor):
+    Food = apps.get_model('nutrition', 'Food')
+    FoodAlias = apps.get_model('nutrition', 'FoodAlias')
+
+    last_id = 0
+    while True:
+        foods = list(Food.objects.filter(id__gt=last_id).order_by('id').only('id', 'name', 'name_es')[:CHUNK_SIZE])
+        if not foods:
+            break
+        for food in foods:
+            food.name_key = normalize_text(food.name)
+            food.name_es_key = normalize_text(food.name_es)
+        Food.objects.bulk_update(foods, ['name_key', 'name_es_key'])
+        last_id = foods[-1].id
+
+    last_id = 0
+    while True:
+        aliases = list(FoodAlias.objects.filter(id__gt=last_id).order_by('id').only('id', 'alias')[:CHUNK_SIZE])
+        if not aliases:
+            break
+        for alias in aliases:
+            alias.alias_key = normalize_text(alias.alias)
+        FoodAlias.objects.bulk_update(aliases, ['alias_key'])
+        last_id = aliases[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nutrition', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='food',
+            name='name_key',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='food',
+            name='name_es_key',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='foodalias',
+            name='alias_key',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=200),
+        ),
+        migrations.RunPython(fill_search_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nutrition', '0002_search_keys'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='food',
+            name='nutrition_f_name_caa2b0_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='food',
+            name='nutrition_f_calorie_679c5f_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='food',
+            name='nutrition_f_protein_10ef7e_idx',
+        ),
+        migrations.AddIndex(
+            model_name='food',
+            index=models.Index(fields=['name', 'id'], name='food_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='food',
+            index=models.Index(fields=['calories', 'id'], name='food_calories_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='food',
+            index=models.Index(fields=['protein', 'id'], name='food_protein_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='food',
+            index=models.Index(fields=['protein_density', 'id'], name='food_protein_density_id_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-19 20:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nutrition', '0004_catalogchange'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='food',
+            name='food_name_id_idx',
+        ),
+        migrations.AlterField(
+            model_name='food',
+            name='name_key',
+            field=models.CharField(blank=True, db_collation='utf8mb4_bin', default='', editable=False, max_length=200),
+        ),
+        migrations.AddIndex(
+            model_name='food',
+            index=models.Index(fields=['name_key', 'id'], name='food_name_key_id_idx'),
+        ),
+    ]
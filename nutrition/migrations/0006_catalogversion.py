@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-19 21:30
+
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def initialize_catalog_version(apps, schema_editor):
+    """Los cambios existentes conservan su id como versión; el contador parte del máximo"""
+    CatalogChange = apps.get_model('nutrition', 'CatalogChange')
+    CatalogVersion = apps.get_model('nutrition', 'CatalogVersion')
+    CatalogChange.objects.update(version=F('id'))
+    latest = CatalogChange.objects.aggregate(latest=Max('id'))['latest'] or 0
+    CatalogVersion.objects.update_or_create(pk=1, defaults={'value': latest})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nutrition', '0005_food_name_key_ordering'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='catalogchange',
+            name='version',
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(initialize_catalog_version, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,7 @@
 # nutrition/models.py
 from django.db import models
 from django.core.validators import MinValueValidator
+from .text import normalize_text
 
 class FoodCategory(models.Model):
     """Categorías de alimentos"""
@@ -68,6 +69,15 @@ class Food(models.Model):
     protein_density = models.FloatField(null=True, blank=True)  # proteína por caloría
     nutrient_density_score = models.FloatField(null=True, blank=True)
     
+    # Claves de búsqueda normalizadas (minúsculas, sin tildes ni signos).
+    # name_key también es el orden por nombre: con colación binaria MySQL la
+    # ordena por código igual que Python (motor columnar) y su índice es
+    # food_name_key_id_idx
+    name_key = models.CharField(
+        max_length=200, blank=True, default='', editable=False, db_collation='utf8mb4_bin'
+    )
+    name_es_key = models.CharField(max_length=200, blank=True, default='', db_index=True, editable=False)
+    
     # Control de calidad y origen
     is_verified = models.BooleanField(default=False)
     usda_fdc_id = models.CharField(max_length=20, null=True, blank=True, unique=True)
@@ -79,10 +89,12 @@ class Food(models.Model):
     
     class Meta:
         indexes = [
-            models.Index(fields=['name']),
             models.Index(fields=['name_es']),
-            models.Index(fields=['calories']),
-            models.Index(fields=['protein']),
+            # Órdenes estables (campo, id) para la paginación por cursor
+            models.Index(fields=['name_key', 'id'], name='food_name_key_id_idx'),
+            models.Index(fields=['calories', 'id'], name='food_calories_id_idx'),
+            models.Index(fields=['protein', 'id'], name='food_protein_id_idx'),
+            models.Index(fields=['protein_density', 'id'], name='food_protein_density_id_idx'),
         ]
     
     def __str__(self):
@@ -109,16 +121,33 @@ class Food(models.Model):
         nutrient_score = (vitamin_score + mineral_score + self.fiber) / self.calories * 1000
         return round(nutrient_score, 2)
     
-    def save(self, *args, **kwargs):
-        """Override save para calcular campos automáticamente"""
+    def refresh_search_keys(self):
+        """Recalcular las claves normalizadas a partir de los nombres"""
+        self.name_key = normalize_text(self.name)
+        self.name_es_key = normalize_text(self.name_es)
+    
+    def refresh_computed_fields(self):
+        """Campos derivados; usar antes de bulk_create/bulk_update, que no llaman a save"""
         self.protein_density = self.calculate_protein_density()
         self.nutrient_density_score = self.calculate_nutrient_density()
+        self.refresh_search_keys()
+    
+    def save(self, *args, **kwargs):
+        """Override save para calcular campos automáticamente"""
+        self.refresh_computed_fields()
         super().save(*args, **kwargs)
 
+# Columnas de nutrientes por porción (serving_size), en el orden del modelo
+NUTRIENT_FIELDS = tuple(
+    field.name for field in Food._meta.fields
+    if isinstance(field, models.FloatField) and field.name not in ('protein_density', 'nutrient_density_score')
+)
+
 class FoodAlias(models.Model):
     """Nombres alternativos para alimentos"""
     food = models.ForeignKey(Food, on_delete=models.CASCADE, related_name='aliases')
     alias = models.CharField(max_length=200, db_index=True)
+    alias_key = models.CharField(max_length=200, blank=True, default='', db_index=True, editable=False)
     language = models.CharField(max_length=5, default='es')
     
     class Meta:
@@ -126,6 +155,47 @@ class FoodAlias(models.Model):
     
     def __str__(self):
         return f"{self.alias} -> {self.food.name}"
+    
+    def save(self, *args, **kwargs):
+        self.alias_key = normalize_text(self.alias)
+        super().save(*args, **kwargs)
+
+class CatalogVersion(models.Model):
+    """
+    Contador de versión del catálogo (una sola fila). Se incrementa con un
+    UPDATE en la misma transacción que registra los cambios: el bloqueo de
+    la fila hace que las versiones sigan el orden de commit, cosa que los id
+    autoincrementales no garantizan.
+    """
+    value = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"v{self.value}"
+
+class CatalogChange(models.Model):
+    """
+    Registro de cambios del catálogo (alimentos, categorías y alias). Cada
+    cambio guarda la versión del catálogo (CatalogVersion) con la que se
+    confirmó, lo que permite saber qué objetos cambiaron desde una versión dada.
+    """
+    MODEL_CHOICES = [
+        ('food', 'Alimento'),
+        ('category', 'Categoría'),
+        ('alias', 'Alias'),
+    ]
+    ACTION_CHOICES = [
+        ('save', 'Guardado'),
+        ('delete', 'Eliminado'),
+    ]
+    
+    model = models.CharField(max_length=10, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=6, choices=ACTION_CHOICES, default='save')
+    version = models.BigIntegerField(default=0, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    def __str__(self):
+        return f"v{self.version}: {self.action} {self.model} {self.object_id}"
 
 class Meta:
     verbose_name = "Alimento"
@@ -0,0 +1,117 @@
+# nutrition/offline.py
+import io
+import json
+import zlib
+from collections import defaultdict
+from django.db.models import Q
+from .catalog import get_changes_since
+from .models import Food, FoodAlias, NUTRIENT_FIELDS
+
+# Campos de cada alimento en el snapshot offline (además de category y aliases)
+SNAPSHOT_FIELDS = (
+    'id', 'name', 'name_es', 'category_id', 'serving_size', *NUTRIENT_FIELDS,
+    'protein_density', 'nutrient_density_score', 'is_verified',
+)
+SNAPSHOT_COLUMNS = (*SNAPSHOT_FIELDS, 'category', 'aliases')
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def load_snapshot_rows(foods, limit=None):
+    """Filas del snapshot (dicts) para un queryset de alimentos: una consulta más para los alias"""
+    rows = foods.values(*SNAPSHOT_FIELDS, 'category__name', 'category__name_es')
+    rows = list(rows[:limit] if limit else rows)
+
+    aliases = defaultdict(list)
+    for food_id, alias in FoodAlias.objects.filter(
+        food_id__in=[row['id'] for row in rows]
+    ).order_by('id').values_list('food_id', 'alias'):
+        aliases[food_id].append(alias)
+
+    for row in rows:
+        category_name_es = row.pop('category__name_es')
+        category_name = row.pop('category__name')
+        row['category'] = category_name_es or category_name
+        row['aliases'] = aliases.get(row['id'], [])
+    return rows
+
+
+def iter_snapshot_chunks(chunk_size=DEFAULT_CHUNK_SIZE):
+    """Catálogo completo en lotes de `chunk_size` filas (paginación por ID, memoria acotada)"""
+    last_id = 0
+    while True:
+        rows = load_snapshot_rows(Food.objects.filter(id__gt=last_id).order_by('id'), chunk_size)
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1]['id']
+
+
+def iter_ndjson_gzip(version, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Snapshot en NDJSON comprimido con gzip, generado por lotes: una línea de
+    cabecera con la versión y luego un alimento por línea.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: formato gzip
+    header = {'version': version, 'columns': SNAPSHOT_COLUMNS}
+    yield compressor.compress((json.dumps(header) + '\n').encode())
+
+    for rows in iter_snapshot_chunks(chunk_size):
+        lines = ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+        chunk = compressor.compress(lines.encode())
+        if chunk:
+            yield chunk
+    yield compressor.flush()
+
+
+def iter_arrow_stream(version, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Snapshot en formato Arrow IPC (stream), un record batch por lote"""
+    import pyarrow as pa
+
+    fields = [
+        pa.field('id', pa.int64()),
+        pa.field('name', pa.string()),
+        pa.field('name_es', pa.string()),
+        pa.field('category_id', pa.int64()),
+        pa.field('serving_size', pa.int32()),
+        *[pa.field(name, pa.float64()) for name in NUTRIENT_FIELDS],
+        pa.field('protein_density', pa.float64()),
+        pa.field('nutrient_density_score', pa.float64()),
+        pa.field('is_verified', pa.bool_()),
+        pa.field('category', pa.string()),
+        pa.field('aliases', pa.list_(pa.string())),
+    ]
+    schema = pa.schema(fields, metadata={'catalog_version': str(version)})
+
+    # El writer escribe en un buffer que se vacía tras cada lote
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for rows in iter_snapshot_chunks(chunk_size):
+            writer.write_batch(pa.RecordBatch.from_pylist(rows, schema=schema))
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    yield sink.getvalue()
+
+
+def catalog_delta(since):
+    """
+    Cambios del catálogo desde la versión `since`: filas completas de los
+    alimentos creados o modificados (incluidos los de categorías renombradas)
+    e IDs de los borrados. None si el registro no alcanza y el cliente debe
+    descargar un snapshot completo.
+    """
+    changes = get_changes_since(since)
+    if changes is None:
+        return None
+
+    food_ids = changes.get('food', set())
+    category_ids = changes.get('category', set())
+    if not food_ids and not category_ids:
+        return {'upserted': [], 'deleted': []}
+
+    rows = load_snapshot_rows(
+        Food.objects.filter(Q(id__in=food_ids) | Q(category_id__in=category_ids)).order_by('id')
+    )
+    present = {row['id'] for row in rows}
+    return {'upserted': rows, 'deleted': sorted(food_ids - present)}
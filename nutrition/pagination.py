@@ -0,0 +1,181 @@
+# nutrition/pagination.py
+import base64
+import json
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por cursor sobre un orden estable (campo, id).
+
+    El cursor guarda el último (valor, id) entregado y la página siguiente
+    se pide con WHERE (campo, id) > cursor ... LIMIT n, que recorre el índice
+    compuesto (campo, id) desde ese punto: la página 5.000 cuesta lo mismo
+    que la primera. Los NULL van siempre al final. El total (COUNT) sólo se
+    calcula si se pide con ?count=true.
+
+    Los órdenes admitidos salen de `ordering_fields` de la vista y el orden
+    por defecto de `ordering`; el parámetro es el mismo que el de
+    OrderingFilter (?ordering=-protein), que no debe usarse a la vez.
+    `ordering_columns` de la vista traduce un orden público a la columna que
+    se ordena y se guarda en el cursor ({'name': 'name_key'}).
+    """
+
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    ordering_param = 'ordering'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Cursor inválido'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, view)
+        field, descending = self._split(self.ordering)
+        field = self.get_column(field, view)
+        nullable = queryset.model._meta.get_field(field).null
+
+        self.count = queryset.count() if self._wants_count(request) else None
+
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            queryset = queryset.filter(self._after(field, descending, nullable, cursor['v'], cursor['id']))
+
+        # NULLS LAST sólo en columnas nulables: en el resto el orden sigue al índice
+        nulls_last = True if nullable else None
+        if descending:
+            order = (F(field).desc(nulls_last=nulls_last), F('id').desc())
+        else:
+            order = (F(field).asc(nulls_last=nulls_last), F('id').asc())
+        results = list(queryset.order_by(*order)[:self.page_size + 1])
+
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        self.next_cursor = None
+        if self.has_next:
+            last = self.page[-1]
+            self.next_cursor = self.encode_cursor(getattr(last, field), last.pk)
+        return self.page
+
+    def paginate_columnar(self, catalog, mask, request, view=None):
+        """
+        Misma paginación sobre el catálogo columnar (nutrition.columnar):
+        `mask` son las filas que cumplen los filtros. Devuelve los IDs de la
+        página en orden; los cursores son intercambiables con los del ORM.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, view)
+        field, descending = self._split(self.ordering)
+        field = self.get_column(field, view)
+
+        self.count = int(mask.sum()) if self._wants_count(request) else None
+
+        cursor = self.decode_cursor(request)
+        positions = catalog.page(
+            mask, field, descending,
+            (cursor['v'], cursor['id']) if cursor is not None else None,
+            self.page_size + 1
+        )
+
+        self.has_next = len(positions) > self.page_size
+        positions = positions[:self.page_size]
+        self.next_cursor = None
+        if self.has_next:
+            last = positions[-1]
+            self.next_cursor = self.encode_cursor(catalog.value(field, last), catalog.food_id(last))
+        return [catalog.food_id(position) for position in positions]
+
+    def get_paginated_response(self, data):
+        payload = {'next': self.get_next_link()}
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_ordering(self, request, view):
+        allowed = getattr(view, 'ordering_fields', None) or ['id']
+        default = getattr(view, 'ordering', None) or [allowed[0]]
+        ordering = request.query_params.get(self.ordering_param, '').strip()
+        if ordering.lstrip('-') in allowed:
+            return ordering
+        return default[0]
+
+    def get_column(self, field, view):
+        return getattr(view, 'ordering_columns', {}).get(field, field)
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.cursor_query_param, self.next_cursor)
+        if self.count is not None:
+            # El total ya se envió en la primera página
+            url = remove_query_param(url, self.count_query_param)
+        return url
+
+    def encode_cursor(self, value, pk):
+        data = json.dumps({'o': self.ordering, 'v': value, 'id': pk}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            cursor = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            valid = (
+                cursor['o'] == self.ordering
+                and isinstance(cursor['id'], int)
+                and isinstance(cursor['v'], (str, int, float, type(None)))
+            )
+        except (TypeError, ValueError, KeyError):
+            valid = False
+        if not valid:
+            # Un cursor de otro orden no indica una posición en éste
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def _wants_count(self, request):
+        return request.query_params.get(self.count_query_param, '').lower() in ('1', 'true')
+
+    @staticmethod
+    def _split(ordering):
+        return ordering.lstrip('-'), ordering.startswith('-')
+
+    @staticmethod
+    def _after(field, descending, nullable, value, pk):
+        """Filas posteriores a (value, pk) en el orden (campo, id) con NULL al final"""
+        beyond = 'lt' if descending else 'gt'
+        if value is None:
+            # Ya dentro de la cola de NULL: sólo desempata el id
+            return Q(**{f'{field}__isnull': True, f'id__{beyond}': pk})
+
+        after = Q(**{f'{field}__{beyond}': value}) | Q(**{field: value, f'id__{beyond}': pk})
+        if nullable:
+            after |= Q(**{f'{field}__isnull': True})
+        return after
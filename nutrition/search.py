@@ -0,0 +1,133 @@
+# nutrition/search.py
+import threading
+from collections import defaultdict
+import numpy as np
+from .catalog import get_catalog_version, refresh_catalog_cache
+from .models import Food, FoodAlias
+from .text import char_ngrams, normalize_text, tokenize
+
+
+class FoodSearchIndex:
+    """
+    Índice invertido de trigramas de caracteres sobre nombres y alias, con
+    ranking BM25. Los trigramas toleran errores de escritura y búsquedas
+    parciales ('pollo' encuentra 'Pechuga de pollo'); cada consulta sólo
+    recorre las listas de sus trigramas, no el catálogo completo.
+    """
+
+    K1 = 1.2
+    B = 0.75
+    # Fracción mínima de trigramas de la consulta que debe contener un alimento
+    MIN_COVERAGE = 0.5
+    # Bonificación cuando el nombre empieza por la consulta
+    PREFIX_BOOST = 1.5
+
+    def __init__(self, documents, version=None):
+        """`documents`: iterable de (food_id, [textos]) con nombre, nombre_es y alias"""
+        self.version = version
+        food_ids = []
+        names = []
+        postings = defaultdict(lambda: ([], []))
+        lengths = []
+
+        for position, (food_id, texts) in enumerate(documents):
+            food_ids.append(food_id)
+            names.append(' '.join(normalize_text(text) for text in texts[:2] if text))
+
+            counts = defaultdict(int)
+            for text in texts:
+                for token in tokenize(text):
+                    for gram in char_ngrams(token):
+                        counts[gram] += 1
+            for gram, count in counts.items():
+                docs, tfs = postings[gram]
+                docs.append(position)
+                tfs.append(count)
+            lengths.append(sum(counts.values()))
+
+        self.food_ids = np.array(food_ids, dtype=np.int64)
+        self.names = names
+        self.postings = {
+            gram: (np.array(docs, dtype=np.int32), np.array(tfs, dtype=np.float32))
+            for gram, (docs, tfs) in postings.items()
+        }
+
+        doc_count = len(food_ids)
+        lengths = np.array(lengths, dtype=np.float32)
+        average_length = lengths.mean() if doc_count else 1.0
+        # Normalización BM25 por longitud precalculada por documento
+        self.length_norm = self.K1 * (1 - self.B + self.B * lengths / max(average_length, 1.0))
+        self.idf = {
+            gram: float(np.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5)))
+            for gram, (docs, _) in self.postings.items()
+        }
+
+    @classmethod
+    def build(cls, version=None):
+        """Cargar el catálogo con dos consultas: alimentos y alias"""
+        aliases = defaultdict(list)
+        for food_id, alias in FoodAlias.objects.values_list('food_id', 'alias'):
+            aliases[food_id].append(alias)
+
+        documents = (
+            (food_id, [name_es or '', name, *aliases.get(food_id, [])])
+            for food_id, name, name_es in Food.objects.order_by('id').values_list('id', 'name', 'name_es')
+        )
+        return cls(documents, version)
+
+    def __len__(self):
+        return len(self.food_ids)
+
+    def search(self, query, limit=50):
+        """IDs de alimentos ordenados por relevancia BM25 (como mucho `limit`)"""
+        query_grams = [gram for token in tokenize(query) for gram in char_ngrams(token)]
+        query_grams = [gram for gram in dict.fromkeys(query_grams) if gram in self.postings]
+        if not query_grams or not len(self):
+            return []
+
+        scores = np.zeros(len(self.food_ids), dtype=np.float32)
+        matches = np.zeros(len(self.food_ids), dtype=np.int16)
+        for gram in query_grams:
+            docs, tfs = self.postings[gram]
+            scores[docs] += self.idf[gram] * tfs * (self.K1 + 1) / (tfs + self.length_norm[docs])
+            matches[docs] += 1
+
+        required = max(1, int(np.ceil(len(query_grams) * self.MIN_COVERAGE)))
+        candidates = np.flatnonzero(matches >= required)
+        if not len(candidates):
+            return []
+
+        # Preselección por BM25 para que el ajuste final no dependa del catálogo
+        shortlist_size = limit * 4
+        if len(candidates) > shortlist_size:
+            best = np.argpartition(-scores[candidates], shortlist_size - 1)[:shortlist_size]
+            candidates = candidates[best]
+
+        # Preferir nombres que empiezan por la consulta (típico al autocompletar)
+        normalized_query = normalize_text(query)
+        candidate_scores = scores[candidates]
+        for offset, position in enumerate(candidates):
+            if self.names[position].startswith(normalized_query):
+                candidate_scores[offset] *= self.PREFIX_BOOST
+
+        order = np.argsort(-candidate_scores, kind='stable')[:limit]
+        return self.food_ids[candidates[order]].tolist()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_search_index():
+    """Índice del proceso, al día con la versión del catálogo"""
+    global _index
+    version = get_catalog_version()
+    index = _index
+    if index is not None and index.version == version:
+        return index
+
+    with _index_lock:
+        _index = refresh_catalog_cache(
+            _index, version, FoodSearchIndex.build, depends_on=('food', 'alias')
+        )
+        return _index
@@ -10,7 +10,9 @@ class FoodCategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'name_es', 'description', 'color', 'food_count']
     
     def get_food_count(self, obj):
-        return obj.food_set.count()
+        # FoodCategoryListView lo anota en la consulta; anidado en otros serializers se cuenta aparte
+        food_count = getattr(obj, 'food_count', None)
+        return food_count if food_count is not None else obj.food_set.count()
 
 class FoodListSerializer(serializers.ModelSerializer):
     """Serializer para lista de alimentos (campos básicos)"""
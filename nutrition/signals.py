@@ -0,0 +1,34 @@
+# nutrition/signals.py
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from .catalog import record_catalog_changes
+from .models import Food, FoodAlias, FoodCategory
+
+CATALOG_MODELS = {Food: 'food', FoodCategory: 'category', FoodAlias: 'alias'}
+
+
+@receiver(post_save, sender=Food)
+@receiver(post_save, sender=FoodCategory)
+@receiver(post_save, sender=FoodAlias)
+def catalog_saved(sender, instance, **kwargs):
+    record_catalog_changes(CATALOG_MODELS[sender], [instance.pk])
+
+
+@receiver(post_delete, sender=Food)
+@receiver(post_delete, sender=FoodCategory)
+@receiver(post_delete, sender=FoodAlias)
+def catalog_deleted(sender, instance, **kwargs):
+    record_catalog_changes(CATALOG_MODELS[sender], [instance.pk], action='delete')
+
+
+@receiver(post_save, sender=FoodAlias)
+@receiver(post_delete, sender=FoodAlias)
+def alias_food_changed(sender, instance, **kwargs):
+    # Los alias viajan con su alimento (snapshot offline): también cambió el alimento
+    record_catalog_changes('food', [instance.food_id])
+
+
+@receiver(pre_delete, sender=FoodCategory)
+def category_deleting(sender, instance, **kwargs):
+    # SET_NULL actualiza los alimentos con un UPDATE, sin señales
+    record_catalog_changes('food', list(instance.food_set.values_list('id', flat=True)))
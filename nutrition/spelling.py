@@ -0,0 +1,130 @@
+# nutrition/spelling.py
+import threading
+from collections import Counter, defaultdict
+from .catalog import get_catalog_version, refresh_catalog_cache
+from .models import Food, FoodAlias
+from .text import tokenize
+
+
+def edit_distance(source, target, max_distance):
+    """
+    Distancia de Damerau-Levenshtein (transposiciones adyacentes), o
+    `max_distance + 1` en cuanto se sabe que la supera.
+    """
+    if abs(len(source) - len(target)) > max_distance:
+        return max_distance + 1
+
+    previous_previous = None
+    previous = list(range(len(target) + 1))
+    for i, source_char in enumerate(source, 1):
+        current = [i] + [0] * len(target)
+        for j, target_char in enumerate(target, 1):
+            cost = 0 if source_char == target_char else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous_previous is not None and i > 1 and j > 1
+                    and source_char == target[j - 2] and source[i - 2] == target_char):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+
+class SpellingCorrector:
+    """
+    Corrector estilo SymSpell sobre las palabras del catálogo. Para cada
+    palabra se precalculan sus borrados de hasta `max_distance` caracteres
+    (sobre un prefijo de `prefix_length`); corregir una palabra sólo genera
+    los borrados de la consulta y verifica los candidatos que comparten
+    alguno, sin recorrer el vocabulario. Los empates se resuelven por
+    frecuencia de la palabra en el catálogo.
+    """
+
+    MIN_TOKEN_LENGTH = 3
+    # Palabras cortas: un solo error para no inventar coincidencias
+    SHORT_TOKEN_LENGTH = 5
+
+    def __init__(self, word_counts, version=None, max_distance=2, prefix_length=7):
+        self.version = version
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.word_counts = dict(word_counts)
+        self.deletes = defaultdict(list)
+        for word in self.word_counts:
+            for variant in self._deletes(word[:prefix_length], max_distance):
+                self.deletes[variant].append(word)
+
+    @classmethod
+    def build(cls, version=None):
+        """Frecuencias de palabras de nombres, nombres en español y alias (dos consultas)"""
+        word_counts = Counter()
+        for name, name_es in Food.objects.values_list('name', 'name_es'):
+            word_counts.update(tokenize(name))
+            word_counts.update(tokenize(name_es))
+        for alias in FoodAlias.objects.values_list('alias', flat=True):
+            word_counts.update(tokenize(alias))
+        return cls(word_counts, version)
+
+    @staticmethod
+    def _deletes(word, max_distance):
+        """El propio prefijo y todas sus variantes con hasta `max_distance` caracteres borrados"""
+        variants = {word}
+        frontier = {word}
+        for _ in range(max_distance):
+            frontier = {
+                candidate[:i] + candidate[i + 1:]
+                for candidate in frontier if len(candidate) > 1
+                for i in range(len(candidate))
+            } - variants
+            variants |= frontier
+        return variants
+
+    def correct_word(self, word):
+        """Palabra del catálogo más cercana (o None si ninguna está a distancia permitida)"""
+        if word in self.word_counts:
+            return word
+        if len(word) < self.MIN_TOKEN_LENGTH or word.isdigit():
+            return None
+
+        max_distance = 1 if len(word) < self.SHORT_TOKEN_LENGTH else self.max_distance
+        candidates = set()
+        for variant in self._deletes(word[:self.prefix_length], max_distance):
+            candidates.update(self.deletes.get(variant, ()))
+
+        best = None
+        best_rank = None
+        for candidate in candidates:
+            distance = edit_distance(word, candidate, max_distance)
+            if distance > max_distance:
+                continue
+            rank = (distance, -self.word_counts[candidate])
+            if best_rank is None or rank < best_rank:
+                best, best_rank = candidate, rank
+        return best
+
+    def correct(self, query):
+        """Consulta corregida palabra por palabra, o None si no cambia nada"""
+        words = tokenize(query)
+        corrected = [self.correct_word(word) or word for word in words]
+        if corrected == words:
+            return None
+        return ' '.join(corrected)
+
+
+_corrector = None
+_corrector_lock = threading.Lock()
+
+
+def get_spelling_corrector():
+    """Corrector del proceso, al día con la versión del catálogo"""
+    global _corrector
+    version = get_catalog_version()
+    corrector = _corrector
+    if corrector is not None and corrector.version == version:
+        return corrector
+
+    with _corrector_lock:
+        _corrector = refresh_catalog_cache(
+            _corrector, version, SpellingCorrector.build, depends_on=('food', 'alias')
+        )
+        return _corrector
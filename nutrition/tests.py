@@ -1,3 +1,85 @@
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework.utils.urls import replace_query_param
+from . import columnar
+from .catalog import get_catalog_version, get_changes_since, record_catalog_changes
+from .models import CatalogChange, Food
 
-# Create your tests here.
+
+class FoodListEngineOrderingTests(TestCase):
+    """Los motores ORM y columnar deben dar las mismas páginas y cursores intercambiables"""
+
+    NAMES = [
+        'Zanahoria', 'banana', 'Banana', 'ámbar', 'apple', '(Pan) integral',
+        'Ñame', 'nabo', 'Árbol 2', 'arbol 10', 'Plátano maduro', 'platano',
+    ]
+    PAGE_SIZE = 3
+
+    def setUp(self):
+        cache.clear()
+        columnar._catalog = None
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            for name in self.NAMES:
+                Food.objects.create(name=name, calories=100, protein=5, carbohydrate=10, fat=1)
+
+    def _url(self, engine, ordering):
+        return f'{reverse("nutrition:food-list")}?engine={engine}&ordering={ordering}&page_size={self.PAGE_SIZE}'
+
+    def _pages(self, url):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            # catalog_cache devuelve un HttpResponse ya renderizado (sin .data)
+            data = response.json()
+            pages.append([food['id'] for food in data['results']])
+            url = data['next']
+        return pages
+
+    def test_engines_return_same_pages(self):
+        for ordering in ('name', '-name'):
+            with self.subTest(ordering=ordering):
+                orm_pages = self._pages(self._url('orm', ordering))
+                self.assertEqual(orm_pages, self._pages(self._url('columnar', ordering)))
+                self.assertEqual(sum(len(page) for page in orm_pages), len(self.NAMES))
+
+    def test_name_order_uses_normalized_key(self):
+        ids = [food_id for page in self._pages(self._url('orm', 'name')) for food_id in page]
+        foods = Food.objects.in_bulk(ids)
+        keys = [foods[food_id].name_key for food_id in ids]
+        self.assertEqual(keys, sorted(keys))
+
+    def test_cursors_work_across_engines(self):
+        for first, second in (('orm', 'columnar'), ('columnar', 'orm')):
+            with self.subTest(first=first, second=second):
+                expected = self._pages(self._url(second, 'name'))
+                next_url = self.client.get(self._url(first, 'name')).json()['next']
+                switched = self._pages(replace_query_param(next_url, 'engine', second))
+                self.assertEqual(switched, expected[1:])
+
+
+class CatalogVersionTests(TestCase):
+    """La versión del catálogo sigue el orden de commit, no el de los id"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_recorded_changes_bump_version(self):
+        start = get_catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            record_catalog_changes('food', [101, 102])
+        with self.captureOnCommitCallbacks(execute=True):
+            record_catalog_changes('alias', [7])
+
+        self.assertEqual(get_catalog_version(), start + 2)
+        self.assertEqual(get_changes_since(start + 1), {'alias': {7}})
+        self.assertEqual(get_changes_since(start), {'food': {101, 102}, 'alias': {7}})
+
+    def test_changes_are_read_by_version_not_id(self):
+        # Un id menor confirmado más tarde (versión mayor) no debe perderse
+        CatalogChange.objects.create(id=50, model='food', object_id=1, version=1)
+        CatalogChange.objects.create(id=40, model='food', object_id=2, version=2)
+        self.assertEqual(get_changes_since(1), {'food': {2}})
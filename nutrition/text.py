@@ -0,0 +1,30 @@
+# nutrition/text.py
+import re
+import unicodedata
+
+_NON_ALNUM = re.compile(r'[^a-z0-9ñ]+')
+
+
+def normalize_text(value):
+    """Minúsculas, sin tildes ni signos: 'Plátano (maduro)' -> 'platano maduro'"""
+    if not value:
+        return ''
+    value = value.lower().replace('ñ', '\x00')
+    value = ''.join(
+        char for char in unicodedata.normalize('NFKD', value)
+        if not unicodedata.combining(char)
+    ).replace('\x00', 'ñ')
+    return _NON_ALNUM.sub(' ', value).strip()
+
+
+def tokenize(value):
+    """Palabras normalizadas del texto"""
+    return normalize_text(value).split()
+
+
+def char_ngrams(token, size=3):
+    """N-gramas de caracteres de una palabra con bordes marcados ('leche' -> ' le', 'lec', ...)"""
+    padded = f' {token} '
+    if len(padded) <= size:
+        return [padded]
+    return [padded[i:i + size] for i in range(len(padded) - size + 1)]
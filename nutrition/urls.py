@@ -11,7 +11,10 @@ urlpatterns = [
     path('search/', views.FoodSearchView.as_view(), name='food-search'),
     path('suggestions/', views.food_suggestions, name='food-suggestions'),
     path('analysis/', views.nutrition_analysis, name='nutrition-analysis'),
+    path('analysis/batch/', views.nutrition_batch_analysis, name='nutrition-batch-analysis'),
     path('similar/<int:food_id>/', views.similar_foods, name='similar-foods'),
+    path('catalog/snapshot/', views.catalog_snapshot, name='catalog-snapshot'),
+    path('catalog/delta/', views.catalog_changes, name='catalog-delta'),
 
     path('usda-search/', views.search_usda_foods, name='usda-search'),
     path('import-usda/', views.import_usda_food, name='import-usda'),
@@ -1,10 +1,14 @@
 # nutrition/views.py
-from rest_framework import generics, filters, status
+from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
-from django.db.models import Q, Count, Sum
+from rest_framework.exceptions import ValidationError
+from django.conf import settings
+from django.http import HttpResponseNotModified, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.db.models import Count, Sum
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import Food, FoodCategory
 from .serializers import (
@@ -12,32 +16,47 @@ from .serializers import (
     FoodCategorySerializer
 )
 from .services import USDAFoodDataService
+from .search import get_search_index
+from .autocomplete import get_autocomplete_index
+from .spelling import get_spelling_corrector
+from .filters import NormalizedSearchFilter
+from .pagination import KeysetPagination
+from .http_cache import catalog_cache
+from .catalog import get_catalog_version
+from .analysis import MAX_ANALYSIS_ITEMS, MAX_ANALYSIS_MEALS, analyze_meals
+from .offline import catalog_delta, iter_arrow_stream, iter_ndjson_gzip
+from .columnar import FILTER_ENGINES, FLAG_FILTERS, get_columnar_catalog, parse_filters
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 20
     page_size_query_param = 'page_size'
     max_page_size = 100
 
+@method_decorator(catalog_cache(max_age=300), name='dispatch')
 class FoodCategoryListView(generics.ListAPIView):
     """Lista todas las categorías de alimentos"""
-    queryset = FoodCategory.objects.all()
+    # Conteo de alimentos en la misma consulta (antes un COUNT por categoría)
+    queryset = FoodCategory.objects.annotate(food_count=Count('food'))
     serializer_class = FoodCategorySerializer
     permission_classes = []  # Público
 
+@method_decorator(catalog_cache(), name='dispatch')
 class FoodListView(generics.ListAPIView):
     """Lista alimentos con filtros y búsqueda"""
     queryset = Food.objects.select_related('category').all()
     serializer_class = FoodListSerializer
-    pagination_class = StandardResultsSetPagination
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend, NormalizedSearchFilter]
     permission_classes = []  # Público
     
-    # Campos de búsqueda
-    search_fields = ['name', 'name_es', 'aliases__alias']
+    # Búsqueda por prefijo sobre claves normalizadas e indexadas
+    search_fields = ['^name_key', '^name_es_key', '^aliases__alias_key']
     
-    # Campos de ordenamiento
+    # Campos de ordenamiento (?ordering=, aplicado por KeysetPagination junto con el id)
     ordering_fields = ['name', 'calories', 'protein', 'protein_density']
     ordering = ['name']
+    # El nombre se ordena por su clave normalizada, igual en SQL y en el motor columnar
+    ordering_columns = {'name': 'name_key'}
     
     # Filtros
     filterset_fields = {
@@ -54,25 +73,39 @@ class FoodListView(generics.ListAPIView):
     def get_queryset(self):
         queryset = super().get_queryset()
         
-        # Filtros personalizados
-        high_protein = self.request.query_params.get('high_protein')
-        if high_protein == 'true':
-            queryset = queryset.filter(protein__gte=15)
-        
-        low_carb = self.request.query_params.get('low_carb')
-        if low_carb == 'true':
-            queryset = queryset.filter(carbohydrate__lte=10)
+        # Filtros personalizados (high_protein, low_carb, high_fiber, low_sodium)
+        for param, (field, lookup, value) in FLAG_FILTERS.items():
+            if self.request.query_params.get(param) == 'true':
+                queryset = queryset.filter(**{f'{field}__{lookup}': value})
         
-        high_fiber = self.request.query_params.get('high_fiber')
-        if high_fiber == 'true':
-            queryset = queryset.filter(fiber__gte=5)
+        return queryset
+    
+    def get_filter_engine(self):
+        """'orm' (SQL) o 'columnar' (máscaras NumPy en memoria); ?engine= o FOOD_FILTER_ENGINE"""
+        engine = self.request.query_params.get('engine') or settings.FOOD_FILTER_ENGINE
+        if engine not in FILTER_ENGINES:
+            raise ValidationError({'engine': [f'Opciones: {", ".join(FILTER_ENGINES)}']})
+        # La búsqueda de texto sólo existe en el camino SQL
+        if self.request.query_params.get(NormalizedSearchFilter.search_param):
+            return 'orm'
+        return engine
+    
+    def list(self, request, *args, **kwargs):
+        if self.get_filter_engine() != 'columnar':
+            return super().list(request, *args, **kwargs)
         
-        low_sodium = self.request.query_params.get('low_sodium')
-        if low_sodium == 'true':
-            queryset = queryset.filter(sodium__lte=140)
+        catalog = get_columnar_catalog()
+        mask = catalog.mask(parse_filters(request.query_params, self.filterset_fields))
+        page_ids = self.paginator.paginate_columnar(catalog, mask, request, view=self)
         
-        return queryset
+        # Serializar sólo la página, en el orden calculado
+        foods = Food.objects.select_related('category').in_bulk(page_ids)
+        serializer = self.get_serializer(
+            [foods[food_id] for food_id in page_ids if food_id in foods], many=True
+        )
+        return self.get_paginated_response(serializer.data)
 
+@method_decorator(catalog_cache(max_age=300), name='dispatch')
 class FoodDetailView(generics.RetrieveAPIView):
     """Detalle completo de un alimento"""
     queryset = Food.objects.select_related('category').prefetch_related('aliases')
@@ -80,49 +113,50 @@ class FoodDetailView(generics.RetrieveAPIView):
     permission_classes = []  # Público
 
 class FoodSearchView(generics.ListAPIView):
-    """Búsqueda optimizada de alimentos"""
+    """Búsqueda de alimentos ordenada por relevancia (índice BM25 en memoria)"""
     serializer_class = FoodSearchSerializer
     pagination_class = StandardResultsSetPagination
     permission_classes = []  # Público
     
+    # Máximo de resultados ordenados que se paginan
+    MAX_RESULTS = 500
+    
     def get_queryset(self):
-        query = self.request.query_params.get('q', '')
-        if not query:
-            return Food.objects.none()
+        return Food.objects.none()
+    
+    def list(self, request, *args, **kwargs):
+        query = request.query_params.get('q', '')
+        food_ids = get_search_index().search(query, limit=self.MAX_RESULTS) if query else []
         
-        # Búsqueda en múltiples campos
-        return Food.objects.select_related('category').filter(
-            Q(name__icontains=query) |
-            Q(name_es__icontains=query) |
-            Q(aliases__alias__icontains=query)
-        ).distinct()
+        # Sin resultados: reintentar con la consulta corregida ("quizás quisiste decir")
+        corrected_query = None
+        if query and not food_ids:
+            corrected_query = get_spelling_corrector().correct(query)
+            if corrected_query:
+                food_ids = get_search_index().search(corrected_query, limit=self.MAX_RESULTS)
+        
+        # Paginar los IDs y cargar sólo los alimentos de la página
+        page_ids = self.paginate_queryset(food_ids)
+        foods = Food.objects.select_related('category').in_bulk(page_ids)
+        serializer = self.get_serializer(
+            [foods[food_id] for food_id in page_ids if food_id in foods], many=True
+        )
+        response = self.get_paginated_response(serializer.data)
+        response.data['corrected_query'] = corrected_query
+        return response
 
 @api_view(['GET'])
 def food_suggestions(request):
-    """Sugerencias de alimentos para autocompletado"""
+    """Sugerencias de alimentos para autocompletado (trie en memoria, sin consultas)"""
     query = request.GET.get('q', '')
     if len(query) < 2:
         return Response([])
     
-    foods = Food.objects.filter(
-        Q(name__icontains=query) | Q(name_es__icontains=query)
-    )[:10]
-    
-    suggestions = []
-    for food in foods:
-        suggestions.append({
-            'id': food.id,
-            'name': food.name_es or food.name,
-            'category': food.category.name_es if food.category else 'Sin categoría',
-            'calories': food.calories,
-            'protein': food.protein
-        })
-    
-    return Response(suggestions)
+    return Response(get_autocomplete_index().suggest(query, limit=10))
 
 @api_view(['GET'])
 def nutrition_analysis(request):
-    """Análisis nutricional de múltiples alimentos"""
+    """Análisis nutricional de múltiples alimentos (una comida por querystring)"""
     food_ids = request.GET.get('food_ids', '').split(',')
     quantities = request.GET.get('quantities', '').split(',')
     
@@ -132,58 +166,69 @@ def nutrition_analysis(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
+    items = [
+        {'food_id': food_id, 'quantity': quantity}
+        for food_id, quantity in zip(food_ids, quantities)
+        if food_id and quantity
+    ]
+    meal = analyze_meals([{'items': items}])['meals'][0]
+    
+    errors = [item for item in meal['items'] if 'error' in item]
+    if errors:
+        return Response(
+            {'error': f"{errors[0]['error']} (food_id={errors[0]['food_id']})"}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    summary_nutrients = ('calories', 'protein', 'carbohydrate', 'fat', 'fiber', 'sodium')
     total_nutrition = {
-        'calories': 0, 'protein': 0, 'carbohydrate': 0, 'fat': 0,
-        'fiber': 0, 'sodium': 0, 'calcium': 0, 'iron': 0
+        nutrient: round(meal['totals'][nutrient], 1)
+        for nutrient in (*summary_nutrients, 'calcium', 'iron')
     }
+    foods_analysis = [
+        {
+            'food_id': item['food_id'],
+            'food_name': item['food_name'],
+            'quantity': item['quantity'],
+            **{nutrient: round(item['nutrients'][nutrient], 1) for nutrient in summary_nutrients},
+        }
+        for item in meal['items']
+    ]
     
-    foods_analysis = []
+    return Response({
+        'total_nutrition': total_nutrition,
+        'foods_breakdown': foods_analysis,
+        'food_count': len(foods_analysis)
+    })
+
+@api_view(['POST'])
+def nutrition_batch_analysis(request):
+    """
+    Análisis nutricional de varias comidas en una petición:
+    {"meals": [{"name": "...", "items": [{"food_id": 1, "quantity": 150}, ...]}, ...]}
+    Los errores se devuelven por elemento sin invalidar el resto.
+    """
+    meals = request.data.get('meals') if isinstance(request.data, dict) else None
+    if not isinstance(meals, list) or not meals:
+        return Response({'error': 'meals debe ser una lista no vacía'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(meals) > MAX_ANALYSIS_MEALS:
+        return Response(
+            {'error': f'Máximo {MAX_ANALYSIS_MEALS} comidas por petición'},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
     
-    try:
-        for food_id, quantity in zip(food_ids, quantities):
-            if not food_id or not quantity:
-                continue
-                
-            food = Food.objects.get(id=int(food_id))
-            qty = float(quantity)
-            factor = qty / food.serving_size
-            
-            food_nutrition = {
-                'food_id': food.id,
-                'food_name': food.name_es or food.name,
-                'quantity': qty,
-                'calories': round(food.calories * factor, 1),
-                'protein': round(food.protein * factor, 1),
-                'carbohydrate': round(food.carbohydrate * factor, 1),
-                'fat': round(food.fat * factor, 1),
-                'fiber': round(food.fiber * factor, 1),
-                'sodium': round(food.sodium * factor, 1),
-            }
-            
-            foods_analysis.append(food_nutrition)
-            
-            # Sumar al total
-            for nutrient in total_nutrition:
-                if nutrient in food_nutrition:
-                    total_nutrition[nutrient] += food_nutrition[nutrient]
-        
-        # Redondear totales
-        for nutrient in total_nutrition:
-            total_nutrition[nutrient] = round(total_nutrition[nutrient], 1)
-        
-        return Response({
-            'total_nutrition': total_nutrition,
-            'foods_breakdown': foods_analysis,
-            'food_count': len(foods_analysis)
-        })
-        
-    except (ValueError, Food.DoesNotExist) as e:
+    items_count = sum(len(meal['items']) for meal in meals if isinstance(meal, dict) and isinstance(meal.get('items'), list))
+    if items_count > MAX_ANALYSIS_ITEMS:
         return Response(
-            {'error': str(e)}, 
-            status=status.HTTP_400_BAD_REQUEST
+            {'error': f'Máximo {MAX_ANALYSIS_ITEMS} alimentos por petición'},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
         )
+    
+    return Response(analyze_meals(meals))
 
+@catalog_cache(max_age=300)
 @api_view(['GET'])
+@permission_classes([])  # Público, como el detalle del alimento
 def similar_foods(request, food_id):
     """Encuentra alimentos similares nutricionalmente"""
     try:
@@ -207,6 +252,59 @@ def similar_foods(request, food_id):
             status=status.HTTP_404_NOT_FOUND
         )
 
+@api_view(['GET'])
+@permission_classes([])  # Público
+def catalog_snapshot(request):
+    """
+    Catálogo completo para uso offline, generado por lotes (streaming):
+    NDJSON con gzip (por defecto) o Arrow IPC con ?snapshot_format=arrow.
+    La versión va en X-Catalog-Version y sirve de `since` para catalog/delta/.
+    """
+    snapshot_format = request.GET.get('snapshot_format', 'ndjson')
+    if snapshot_format not in ('ndjson', 'arrow'):
+        return Response({'error': 'snapshot_format debe ser "ndjson" o "arrow"'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    version = get_catalog_version()
+    etag = f'"catalog-{version}-{snapshot_format}"'
+    if etag in [tag.strip() for tag in request.META.get('HTTP_IF_NONE_MATCH', '').split(',')]:
+        response = HttpResponseNotModified()
+    elif snapshot_format == 'arrow':
+        response = StreamingHttpResponse(
+            iter_arrow_stream(version), content_type='application/vnd.apache.arrow.stream'
+        )
+        response['Content-Disposition'] = f'attachment; filename="catalog-v{version}.arrows"'
+    else:
+        response = StreamingHttpResponse(iter_ndjson_gzip(version), content_type='application/x-ndjson')
+        response['Content-Encoding'] = 'gzip'
+        response['Content-Disposition'] = f'attachment; filename="catalog-v{version}.ndjson"'
+    
+    response['ETag'] = etag
+    response['X-Catalog-Version'] = str(version)
+    response['Cache-Control'] = 'public, max-age=300'
+    return response
+
+@api_view(['GET'])
+@permission_classes([])  # Público
+def catalog_changes(request):
+    """Alimentos creados/modificados y borrados desde ?since=<versión del catálogo>"""
+    try:
+        since = int(request.GET['since'])
+    except (KeyError, ValueError):
+        return Response({'error': 'since debe ser una versión del catálogo (entero)'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    version = get_catalog_version()
+    if since == version:
+        return Response({'version': version, 'upserted': [], 'deleted': []})
+    
+    delta = catalog_delta(since) if since < version else None
+    if delta is None:
+        # Demasiados cambios, registro ya podado o versión desconocida: descargar el snapshot
+        return Response(
+            {'error': 'Versión demasiado antigua', 'snapshot_required': True, 'version': version},
+            status=status.HTTP_410_GONE
+        )
+    return Response({'version': version, **delta})
+
 ## API usda
 @api_view(['GET'])
 def search_usda_foods(request):
@@ -270,10 +368,17 @@ def enhanced_food_search(request):
     if len(query) < 2:
         return Response({'error': 'Query muy corto'}, status=status.HTTP_400_BAD_REQUEST)
     
-    # Buscar primero en BD local
-    local_foods = Food.objects.filter(
-        Q(name__icontains=query) | Q(name_es__icontains=query)
-    )[:5]
+    # Buscar primero en el índice local
+    local_ids = get_search_index().search(query, limit=5)
+    
+    # Corregir errores de escritura antes de recurrir a la API (lenta) de USDA
+    corrected_query = None
+    if not local_ids:
+        corrected_query = get_spelling_corrector().correct(query)
+        if corrected_query:
+            local_ids = get_search_index().search(corrected_query, limit=5)
+    foods_by_id = Food.objects.select_related('category').in_bulk(local_ids)
+    local_foods = [foods_by_id[food_id] for food_id in local_ids if food_id in foods_by_id]
     
     local_results = FoodSearchSerializer(local_foods, many=True).data
     
@@ -281,7 +386,7 @@ def enhanced_food_search(request):
     usda_results = []
     if len(local_results) < 3:
         usda_service = USDAFoodDataService()
-        usda_data = usda_service.search_foods(query, max_results=5)
+        usda_data = usda_service.search_foods(corrected_query or query, max_results=5)
         
         if 'foods' in usda_data:
             for food in usda_data['foods']:
@@ -296,5 +401,6 @@ def enhanced_food_search(request):
     return Response({
         'local_results': local_results,
         'usda_results': usda_results,
-        'combined_count': len(local_results) + len(usda_results)
+        'combined_count': len(local_results) + len(usda_results),
+        'corrected_query': corrected_query
     })
\ No newline at end of file
@@ -4,7 +4,7 @@ from django.utils.html import format_html
 from .models import (
     UserFoodRating, NutritionalProfile, DailyNutritionLog, 
     FoodConsumption, RecommendationSession, Recommendation,
-    UserFoodPreference, SimilarFood
+    UserFoodPreference, SimilarFood, CohortSnapshot
 )
 
 @admin.register(UserFoodRating)
@@ -108,4 +108,24 @@ class SimilarFoodAdmin(admin.ModelAdmin):
     search_fields = ('food1__name', 'food1__name_es', 'food2__name', 'food2__name_es')
     autocomplete_fields = ['food1', 'food2']
     
-    list_filter = ('overall_similarity',)
\ No newline at end of file
+    list_filter = ('overall_similarity',)
+
+@admin.register(CohortSnapshot)
+class CohortSnapshotAdmin(admin.ModelAdmin):
+    """Solo lectura: se recalcula con `manage.py build_cohort_snapshots`"""
+    list_display = (
+        'dimension', 'cohort', 'users_count', 'days_logged', 'avg_adherence',
+        'on_target_rate', 'avg_calories', 'macro_split', 'computed_at'
+    )
+    list_filter = ('dimension',)
+    readonly_fields = [field.name for field in CohortSnapshot._meta.fields]
+    
+    def macro_split(self, obj):
+        return f'P {obj.protein_energy_pct}% / C {obj.carbs_energy_pct}% / G {obj.fat_energy_pct}%'
+    macro_split.short_description = 'Reparto energético'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
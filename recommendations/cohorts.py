@@ -0,0 +1,182 @@
+# recommendations/cohorts.py
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Case, CharField, Count, Value, When
+from django.utils import timezone
+from .models import CohortSnapshot, DailyNutritionLog, FoodConsumption
+from .rollups import LOGGED_EPSILON, ON_TARGET_ADHERENCE
+
+User = get_user_model()
+
+DIMENSIONS = ('goal', 'activity_level', 'age_band')
+UNKNOWN_COHORT = 'sin_dato'
+
+# Rangos de edad: límites inferiores inclusivos
+AGE_BANDS = ((0, '<18'), (18, '18-24'), (25, '25-34'), (35, '35-44'), (45, '45-54'), (55, '55-64'), (65, '65+'))
+AGE_BAND_EDGES = [lower for lower, _ in AGE_BANDS[1:]]
+AGE_BAND_LABELS = [label for _, label in AGE_BANDS]
+
+TOP_FOODS = 5
+DEFAULT_CHUNK_SIZE = 50000
+
+
+def age_band_expression(field='age'):
+    """Rango de edad calculado en SQL (para agrupar consumos sin traer usuarios)"""
+    whens = [
+        When(**{f'{field}__gte': lower, f'{field}__lt': upper}, then=Value(label))
+        for (lower, label), (upper, _) in zip(AGE_BANDS, AGE_BANDS[1:])
+    ]
+    whens.append(When(**{f'{field}__gte': AGE_BANDS[-1][0]}, then=Value(AGE_BANDS[-1][1])))
+    return Case(*whens, default=Value(UNKNOWN_COHORT), output_field=CharField())
+
+
+def load_user_cohorts():
+    """DataFrame indexado por user_id con la cohorte de cada dimensión (columnas categóricas)"""
+    users = pd.DataFrame.from_records(
+        list(User.objects.values_list('id', 'goal', 'activity_level', 'age')),
+        columns=['user_id', 'goal', 'activity_level', 'age']
+    ).set_index('user_id')
+
+    bands = np.searchsorted(AGE_BAND_EDGES, users['age'].fillna(-1).to_numpy(dtype=float), side='right')
+    users['age_band'] = np.where(
+        users['age'].isna(), UNKNOWN_COHORT, np.array(AGE_BAND_LABELS, dtype=object)[bands]
+    )
+    users = users.drop(columns='age').fillna(UNKNOWN_COHORT)
+    return users.astype('category')
+
+
+def iter_day_log_frames(start_date, end_date, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Logs con consumo de la ventana en DataFrames de `chunk_size` filas (paginación por ID)"""
+    logs = DailyNutritionLog.objects.filter(
+        date__range=[start_date, end_date],
+        consumed_calories__gt=LOGGED_EPSILON
+    ).order_by('id')
+    columns = ['id', 'user_id', 'consumed_calories', 'consumed_protein',
+               'consumed_carbs', 'consumed_fat', 'adherence_score']
+
+    last_id = 0
+    while True:
+        rows = list(logs.filter(id__gt=last_id).values_list(*columns)[:chunk_size])
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield pd.DataFrame.from_records(rows, columns=columns)
+
+
+def _partial_sums(frame, users):
+    """Sumas por cohorte de un lote, para cada dimensión (combinables entre lotes)"""
+    adherence = frame['adherence_score'].astype(float)
+    values = pd.DataFrame({
+        'days': 1,
+        'calories': frame['consumed_calories'],
+        'protein': frame['consumed_protein'],
+        'carbs': frame['consumed_carbs'],
+        'fat': frame['consumed_fat'],
+        'adherence_sum': adherence.fillna(0),
+        'adherence_sq': adherence.fillna(0) ** 2,
+        'adherence_n': adherence.notna().astype(int),
+        'on_target': (adherence >= ON_TARGET_ADHERENCE).astype(int),
+    })
+
+    cohorts = users.reindex(frame['user_id'].to_numpy())
+    return {
+        dimension: values.groupby(cohorts[dimension].to_numpy()).sum()
+        for dimension in DIMENSIONS
+    }
+
+
+def _top_foods(dimension, start_date, end_date):
+    """Alimentos más consumidos por cohorte con una consulta agrupada"""
+    consumptions = FoodConsumption.objects.filter(daily_log__date__range=[start_date, end_date])
+    if dimension == 'age_band':
+        consumptions = consumptions.annotate(cohort=age_band_expression('daily_log__user__age'))
+        cohort_field = 'cohort'
+    else:
+        cohort_field = f'daily_log__user__{dimension}'
+
+    rows = consumptions.values(cohort_field, 'food_id', 'food__name_es', 'food__name').annotate(
+        times=Count('id')
+    ).order_by()
+    foods = pd.DataFrame.from_records(
+        list(rows), columns=[cohort_field, 'food_id', 'food__name_es', 'food__name', 'times']
+    )
+    if foods.empty:
+        return {}
+
+    foods[cohort_field] = foods[cohort_field].fillna(UNKNOWN_COHORT)
+    foods['name'] = foods['food__name_es'].fillna(foods['food__name'])
+    top = foods.sort_values('times', ascending=False).groupby(cohort_field, sort=False).head(TOP_FOODS)
+    return {
+        cohort: group[['food_id', 'name', 'times']].to_dict('records')
+        for cohort, group in top.groupby(cohort_field, sort=False)
+    }
+
+
+def build_cohort_snapshots(days=30, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Recalcular CohortSnapshot para la ventana de los últimos `days` días.
+
+    Los logs se leen por lotes en columnas y se reducen a sumas por cohorte
+    (groupby vectorizado); sólo las sumas parciales y los IDs de usuarios
+    activos permanecen en memoria entre lotes.
+    """
+    end_date = timezone.now().date()
+    start_date = end_date - timedelta(days=days - 1)
+    users = load_user_cohorts()
+
+    totals = {dimension: None for dimension in DIMENSIONS}
+    active_user_ids = np.array([], dtype=np.int64)
+    for frame in iter_day_log_frames(start_date, end_date, chunk_size):
+        active_user_ids = np.union1d(active_user_ids, frame['user_id'].unique())
+        for dimension, partial in _partial_sums(frame, users).items():
+            totals[dimension] = partial if totals[dimension] is None else totals[dimension].add(partial, fill_value=0)
+
+    active_users = users.reindex(active_user_ids)
+    computed_at = timezone.now()
+    snapshots = []
+    for dimension in DIMENSIONS:
+        sums = totals[dimension]
+        if sums is None:
+            continue
+        users_count = active_users[dimension].value_counts()
+        top_foods = _top_foods(dimension, start_date, end_date)
+
+        adherence_n = sums['adherence_n'].replace(0, np.nan)
+        avg_adherence = sums['adherence_sum'] / adherence_n
+        std_adherence = np.sqrt(np.maximum(sums['adherence_sq'] / adherence_n - avg_adherence ** 2, 0))
+        energy = sums['protein'] * 4 + sums['carbs'] * 4 + sums['fat'] * 9
+        energy = energy.replace(0, np.nan)
+
+        for cohort, row in sums.iterrows():
+            snapshots.append(CohortSnapshot(
+                dimension=dimension,
+                cohort=str(cohort),
+                window_start=start_date,
+                window_end=end_date,
+                users_count=int(users_count.get(cohort, 0)),
+                days_logged=int(row['days']),
+                avg_adherence=_rounded(avg_adherence[cohort]),
+                std_adherence=_rounded(std_adherence[cohort]),
+                on_target_rate=_rounded(row['on_target'] / row['adherence_n'], 3) if row['adherence_n'] else None,
+                avg_calories=round(row['calories'] / row['days'], 1),
+                avg_protein=round(row['protein'] / row['days'], 1),
+                avg_carbs=round(row['carbs'] / row['days'], 1),
+                avg_fat=round(row['fat'] / row['days'], 1),
+                protein_energy_pct=_rounded(row['protein'] * 4 / energy[cohort] * 100) or 0,
+                carbs_energy_pct=_rounded(row['carbs'] * 4 / energy[cohort] * 100) or 0,
+                fat_energy_pct=_rounded(row['fat'] * 9 / energy[cohort] * 100) or 0,
+                top_foods=top_foods.get(str(cohort), []),
+                computed_at=computed_at,
+            ))
+
+    with transaction.atomic():
+        CohortSnapshot.objects.all().delete()
+        CohortSnapshot.objects.bulk_create(snapshots)
+    return snapshots
+
+
+def _rounded(value, digits=1):
+    return None if pd.isna(value) else round(float(value), digits)
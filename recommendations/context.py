@@ -0,0 +1,179 @@
+# recommendations/context.py
+from types import SimpleNamespace
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+User = get_user_model()
+
+CONTEXT_CACHE_TIMEOUT = 60 * 60  # 1 hora; se invalida al editar perfil/preferencias
+
+# Objetivos por defecto cuando el usuario no tiene necesidades calculadas
+DEFAULT_TARGETS = {
+    'calories': 2000,
+    'protein': 150,
+    'carbs': 250,
+    'fat': 65,
+}
+
+PROFILE_FIELDS = (
+    'target_calories', 'target_protein', 'target_carbs', 'target_fat', 'target_fiber',
+    'max_sodium', 'min_calcium', 'min_iron', 'min_vitamin_c',
+    'protein_importance', 'health_importance', 'taste_importance',
+)
+PREFERENCE_FIELDS = (
+    'is_vegetarian', 'is_vegan', 'is_gluten_free', 'is_dairy_free', 'is_keto',
+    'preferred_meal_count', 'max_prep_time', 'budget_preference',
+)
+USER_FIELDS = (
+    'goal', 'activity_level', 'daily_calories', 'daily_protein', 'daily_carbs', 'daily_fat',
+)
+# Objetivos del perfil nutricional que se derivan de las necesidades daily_* del usuario
+TARGET_FIELDS = ('target_calories', 'target_protein', 'target_carbs', 'target_fat')
+
+
+def nutritional_profile_defaults(user):
+    """Valores iniciales del perfil nutricional a partir de las necesidades del usuario"""
+    return {
+        'target_calories': user.daily_calories or DEFAULT_TARGETS['calories'],
+        'target_protein': user.daily_protein or DEFAULT_TARGETS['protein'],
+        'target_carbs': user.daily_carbs or DEFAULT_TARGETS['carbs'],
+        'target_fat': user.daily_fat or DEFAULT_TARGETS['fat'],
+        'target_fiber': 25,
+        'max_sodium': 2300,
+        'min_calcium': 1000,
+        'min_iron': 8,
+        'min_vitamin_c': 90
+    }
+
+
+def ensure_nutritional_profile(user, update_targets=False):
+    """
+    Crear el perfil nutricional si no existe (al completar el perfil). Con
+    `update_targets`, un perfil existente recibe los objetivos recalculados
+    a partir de daily_* (los objetivos del perfil tienen prioridad en
+    UserNutritionContext.targets).
+    """
+    from .models import NutritionalProfile
+    defaults = nutritional_profile_defaults(user)
+    profile, created = NutritionalProfile.objects.get_or_create(user=user, defaults=defaults)
+    if update_targets and not created:
+        targets = {field: defaults[field] for field in TARGET_FIELDS}
+        if any(getattr(profile, field) != value for field, value in targets.items()):
+            for field, value in targets.items():
+                setattr(profile, field, value)
+            profile.save(update_fields=[*TARGET_FIELDS, 'updated_at'])
+    return profile
+
+
+def _cache_key(user_id):
+    return f'nutrition_context:{user_id}'
+
+
+def invalidate_nutrition_context(user_id):
+    cache.delete(_cache_key(user_id))
+
+
+class UserNutritionContext:
+    """Perfil nutricional, preferencias y alergias del usuario, cargados una vez"""
+
+    def __init__(self, user_id, data):
+        self.user_id = user_id
+        self.data = data
+        self.profile = SimpleNamespace(**data['profile']) if data['profile'] else None
+        self.preferences = SimpleNamespace(**data['preferences']) if data['preferences'] else None
+        self.allergens = data['allergens']
+        self.goal = data['user']['goal']
+        self.activity_level = data['user']['activity_level']
+
+    @classmethod
+    def for_user(cls, user):
+        """Contexto memoizado en la petición y cacheado por usuario"""
+        context = getattr(user, '_nutrition_context', None)
+        if context is not None:
+            return context
+
+        data = cache.get(_cache_key(user.pk))
+        if data is None:
+            data = cls._load(user.pk)
+            cache.set(_cache_key(user.pk), data, CONTEXT_CACHE_TIMEOUT)
+
+        context = cls(user.pk, data)
+        user._nutrition_context = context
+        return context
+
+    @staticmethod
+    def _load(user_id):
+        """Una sola consulta con JOINs: una fila por alergia (o una fila si no hay)"""
+        profile_columns = [f'nutritional_profile__{field}' for field in PROFILE_FIELDS]
+        preference_columns = [f'preferences__{field}' for field in PREFERENCE_FIELDS]
+        rows = list(User.objects.filter(pk=user_id).values(
+            *USER_FIELDS, *profile_columns, *preference_columns,
+            'nutritional_profile__id', 'preferences__id', 'allergies__allergen'
+        ))
+
+        if not rows:
+            return {
+                'profile': None,
+                'preferences': None,
+                'allergens': [],
+                'user': dict.fromkeys(USER_FIELDS),
+            }
+
+        first = rows[0]
+        profile = None
+        if first['nutritional_profile__id'] is not None:
+            profile = {field: first[f'nutritional_profile__{field}'] for field in PROFILE_FIELDS}
+
+        preferences = None
+        if first['preferences__id'] is not None:
+            preferences = {field: first[f'preferences__{field}'] for field in PREFERENCE_FIELDS}
+
+        return {
+            'profile': profile,
+            'preferences': preferences,
+            'allergens': [row['allergies__allergen'] for row in rows if row['allergies__allergen']],
+            'user': {field: first[field] for field in USER_FIELDS},
+        }
+
+    @property
+    def targets(self):
+        """Objetivos diarios: perfil nutricional, luego necesidades del usuario, luego defaults"""
+        profile = vars(self.profile) if self.profile else None
+        return resolve_targets(profile, self.data['user'])
+
+
+def resolve_targets(profile, user):
+    """
+    Objetivos diarios a partir de dicts de perfil (target_*, o None) y de
+    usuario (daily_*): perfil nutricional, luego necesidades, luego defaults.
+    """
+    if profile:
+        return {
+            'calories': profile['target_calories'],
+            'protein': profile['target_protein'],
+            'carbs': profile['target_carbs'],
+            'fat': profile['target_fat'],
+        }
+    return {
+        'calories': user['daily_calories'] or DEFAULT_TARGETS['calories'],
+        'protein': user['daily_protein'] or DEFAULT_TARGETS['protein'],
+        'carbs': user['daily_carbs'] or DEFAULT_TARGETS['carbs'],
+        'fat': user['daily_fat'] or DEFAULT_TARGETS['fat'],
+    }
+
+
+def load_targets_for_users(user_ids):
+    """Objetivos diarios de varios usuarios con una sola consulta (procesos por lotes)"""
+    daily_fields = ('daily_calories', 'daily_protein', 'daily_carbs', 'daily_fat')
+    rows = User.objects.filter(pk__in=user_ids).values(
+        'pk', 'nutritional_profile__id', *daily_fields,
+        *[f'nutritional_profile__{field}' for field in TARGET_FIELDS]
+    )
+
+    targets = {}
+    for row in rows:
+        profile = None
+        if row['nutritional_profile__id'] is not None:
+            profile = {field: row[f'nutritional_profile__{field}'] for field in TARGET_FIELDS}
+        targets[row['pk']] = resolve_targets(profile, row)
+    return targets
@@ -0,0 +1,137 @@
+# recommendations/daily_totals.py
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Max
+from django.db.models.functions import NullIf
+from django.utils import timezone
+from .models import DailyNutritionLog
+
+NUTRIENTS = ('calories', 'protein', 'carbs', 'fat', 'fiber', 'sodium')
+TOTAL_FIELDS = tuple(f'consumed_{nutrient}' for nutrient in NUTRIENTS)
+
+LOG_STAMP_TIMEOUT = 60 * 60 * 24 * 30  # 30 días; si falta se relee de la base de datos
+
+
+def get_or_create_daily_log_id(user_id, date):
+    """
+    Upsert de la fila del día (user, date) seguro ante carreras.
+
+    Usa INSERT ... ON CONFLICT DO NOTHING / INSERT IGNORE en vez de
+    get_or_create, así dos peticiones simultáneas nunca fallan por la clave
+    única. Llamar fuera de transaction.atomic() para que la relectura vea la
+    fila insertada por otra conexión.
+    """
+    daily_logs = DailyNutritionLog.objects.filter(user_id=user_id, date=date)
+    log_id = daily_logs.values_list('id', flat=True).first()
+    if log_id is None:
+        DailyNutritionLog.objects.bulk_create(
+            [DailyNutritionLog(user_id=user_id, date=date)], ignore_conflicts=True
+        )
+        log_id = daily_logs.values_list('id', flat=True).get()
+    return log_id
+
+
+def serving_factor_expression():
+    """
+    quantity / serving_size del alimento de un FoodConsumption, en SQL.
+    NULL si la porción es 0 (en vez de dividir por cero); Sum lo ignora.
+    """
+    return F('quantity') / NullIf(F('food__serving_size'), 0)
+
+
+def consumption_deltas(consumptions):
+    """
+    Sumar los nutrientes de varios FoodConsumption (con calculate_nutrients()
+    ya aplicado) en un único dict de deltas para increment_daily_totals.
+    """
+    deltas = dict.fromkeys(NUTRIENTS, 0)
+    for consumption in consumptions:
+        food = consumption.food
+        factor = consumption.quantity / food.serving_size
+        deltas['calories'] += consumption.calories_consumed
+        deltas['protein'] += consumption.protein_consumed
+        deltas['carbs'] += consumption.carbs_consumed
+        deltas['fat'] += consumption.fat_consumed
+        # Fibra y sodio no se guardan por consumo: proporcionales a la porción
+        deltas['fiber'] += food.fiber * factor
+        deltas['sodium'] += food.sodium * factor
+    return deltas
+
+
+def increment_daily_totals(daily_log_id, deltas, targets, meal_deltas=None):
+    """
+    Sumar `deltas` ({'calories': ..., 'protein': ...}) a los totales del día
+    con un único UPDATE atómico (F) y recalcular adherencia y balance con los valores
+    resultantes. Los acumulados semanal/mensual (y por tipo de comida si se
+    pasa `meal_deltas`) se actualizan en la misma transacción. Llamar dentro
+    de transaction.atomic(): el bloqueo de la fila sólo dura hasta el commit.
+    """
+    from .rollups import apply_day_change
+
+    updates = {
+        f'consumed_{nutrient}': F(f'consumed_{nutrient}') + deltas[nutrient]
+        for nutrient in NUTRIENTS
+        if deltas.get(nutrient)
+    }
+    # update() no toca auto_now
+    updates['updated_at'] = timezone.now()
+
+    daily_log = DailyNutritionLog.objects.filter(pk=daily_log_id)
+    daily_log.update(**updates)
+
+    # Lectura con bloqueo: siempre ve la versión más reciente de la fila
+    row = daily_log.select_for_update().values(
+        'user_id', 'date', 'adherence_score', *TOTAL_FIELDS
+    ).get()
+    totals = {field: row[field] for field in TOTAL_FIELDS}
+    totals.update(compute_day_scores(totals, targets))
+    daily_log.update(
+        adherence_score=totals['adherence_score'],
+        balance_score=totals['balance_score']
+    )
+
+    before = {
+        'consumed_calories': totals['consumed_calories'] - deltas.get('calories', 0),
+        'adherence_score': row['adherence_score'],
+    }
+    apply_day_change(row['user_id'], row['date'], deltas, before, totals, meal_deltas)
+
+    # Marcar tras el commit para que nadie cachee datos aún no confirmados
+    user_id = row['user_id']
+    transaction.on_commit(lambda: touch_log_stamp(user_id))
+    return totals
+
+
+def compute_day_scores(totals, targets):
+    """Adherencia y balance de un día a partir de sus totales consumed_*"""
+    return {
+        'adherence_score': DailyNutritionLog.compute_adherence_score(
+            totals['consumed_calories'], totals['consumed_protein'],
+            targets['calories'], targets['protein']
+        ),
+        'balance_score': DailyNutritionLog.compute_balance_score(
+            totals['consumed_protein'], totals['consumed_carbs'], totals['consumed_fat'],
+            targets['protein'], targets['carbs'], targets['fat']
+        ),
+    }
+
+
+def _log_stamp_key(user_id):
+    return f'nutrition_logs_stamp:{user_id}'
+
+
+def touch_log_stamp(user_id):
+    """Registrar que los logs diarios del usuario cambiaron (invalida cachés derivadas)"""
+    cache.set(_log_stamp_key(user_id), timezone.now().timestamp(), LOG_STAMP_TIMEOUT)
+
+
+def get_log_stamp(user_id):
+    """Marca de la última actualización de logs; si no está en caché, Max(updated_at)"""
+    stamp = cache.get(_log_stamp_key(user_id))
+    if stamp is None:
+        last_update = DailyNutritionLog.objects.filter(user_id=user_id).aggregate(
+            last_update=Max('updated_at')
+        )['last_update']
+        stamp = last_update.timestamp() if last_update else 0
+        cache.set(_log_stamp_key(user_id), stamp, LOG_STAMP_TIMEOUT)
+    return stamp
@@ -0,0 +1,24 @@
+# recommendations/deadline.py
+import time
+
+
+class Deadline:
+    """Presupuesto de latencia de una solicitud de recomendaciones"""
+
+    def __init__(self, budget_ms=None):
+        self.budget_ms = budget_ms
+        self.start = time.perf_counter()
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.start) * 1000
+
+    def remaining_ms(self):
+        if self.budget_ms is None:
+            return float('inf')
+        return self.budget_ms - self.elapsed_ms()
+
+    def has_fraction(self, fraction):
+        """¿Queda al menos esta fracción del presupuesto? Sin presupuesto siempre True"""
+        if self.budget_ms is None:
+            return True
+        return self.remaining_ms() >= self.budget_ms * fraction
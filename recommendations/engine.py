@@ -1,24 +1,52 @@
 # recommendations/engine.py
 import numpy as np
-from django.db.models import Q, Avg, Count
+from django.db.models import Q, Avg, Count, Max
 from django.utils import timezone
 from datetime import datetime, timedelta
 from nutrition.models import Food
+from nutrition.text import normalize_text
 from .models import (
     UserFoodRating, UserFoodPreference, DailyNutritionLog,
     FoodConsumption, NutritionalProfile
 )
+from .retrieval import CandidateRetriever
+from .deadline import Deadline
+from .fallback import get_segment_food_ids, quick_segment_food_ids
+from .context import UserNutritionContext
+
+# Palabras clave excluidas por restricción dietética (se puede mejorar con tags)
+DIETARY_EXCLUSIONS = {
+    'is_vegetarian': ['chicken', 'beef', 'pork', 'meat'],
+    'is_vegan': ['milk', 'cheese', 'egg', 'yogurt'],
+    'is_gluten_free': ['bread', 'pasta', 'wheat'],
+}
 
 class RecommendationEngine:
     """Motor principal de recomendaciones de NutriMatch"""
     
-    def __init__(self, user):
+    # Fracción mínima del presupuesto de latencia que debe quedar para
+    # ejecutar cada etapa opcional
+    STAGE_RESERVES = {
+        'optional_sources': 0.6,
+        'category_fallback': 0.5,
+        'ranking': 0.2,
+        'diversity': 0.1,
+        'explanations': 0.05,
+    }
+    RANKING_CHECK_EVERY = 25
+    
+    def __init__(self, user, context=None):
         self.user = user
-        self.nutritional_profile = getattr(user, 'nutritional_profile', None)
-        self.user_preferences = getattr(user, 'preferences', None)
+        self.context = context or UserNutritionContext.for_user(user)
+        self.nutritional_profile = self.context.profile
+        self.user_preferences = self.context.preferences
+        self.retrieval_budgets = None
+        self.last_retrieval_stats = {}
+        self.last_run = {}
+        self._ranking_features = None
         
     def get_recommendations(self, session_type='meal_suggestion', meal_type=None, 
-                          current_nutrition=None, count=10):
+                          current_nutrition=None, count=10, time_budget_ms=None):
         """
         Obtener recomendaciones personalizadas
         
@@ -27,68 +55,176 @@ class RecommendationEngine:
             meal_type: Tipo de comida ('breakfast', 'lunch', 'dinner', 'snack')
             current_nutrition: Estado nutricional actual del día
             count: Número de recomendaciones a devolver
+            time_budget_ms: Presupuesto de latencia; al agotarse se omiten las
+                etapas opcionales y se usa la lista precalculada del segmento
         """
+        deadline = Deadline(time_budget_ms)
+        skipped_stages = []
         
-        # Obtener alimentos candidatos
-        candidate_foods = self._get_candidate_foods(meal_type)
+        # Etapa 1: recuperación de candidatos desde varias fuentes
+        candidate_foods = self._get_candidate_foods(meal_type, current_nutrition, deadline)
+        skipped_stages.extend(
+            f'retrieval:{source}' for source in self.last_retrieval_stats.get('skipped', [])
+        )
         
-        # Calcular scores para cada alimento
         scored_foods = []
-        for food in candidate_foods:
-            score_data = self._calculate_food_score(food, current_nutrition, meal_type)
-            if score_data['total_score'] > 0:
-                scored_foods.append(score_data)
-        
-        # Ordenar por score total
-        scored_foods.sort(key=lambda x: x['total_score'], reverse=True)
+        fast_path = not deadline.has_fraction(self.STAGE_RESERVES['ranking'])
+        
+        if not fast_path:
+            # Etapa 2: ranking. Señales del usuario cargadas una vez para todos
+            include_categories = deadline.has_fraction(self.STAGE_RESERVES['category_fallback'])
+            if not include_categories:
+                skipped_stages.append('category_fallback')
+            self._ranking_features = self._load_ranking_features(
+                candidate_foods, include_categories=include_categories
+            )
+            
+            # Calcular scores para cada alimento
+            for position, food in enumerate(candidate_foods):
+                if (position % self.RANKING_CHECK_EVERY == 0 and position
+                        and not deadline.has_fraction(self.STAGE_RESERVES['ranking'])):
+                    skipped_stages.append('ranking_truncated')
+                    break
+                score_data = self._calculate_food_score(food, current_nutrition, meal_type)
+                if score_data['total_score'] > 0:
+                    scored_foods.append(score_data)
+            
+            # Ordenar por score total
+            scored_foods.sort(key=lambda x: x['total_score'], reverse=True)
+        
+        if len(scored_foods) < count:
+            # Ruta rápida: completar con la lista precalculada del segmento
+            fast_path = True
+            skipped_stages.append('ranking' if not scored_foods else 'ranking_partial')
+            scored_foods.extend(self._get_segment_fallback(
+                meal_type, current_nutrition, count - len(scored_foods),
+                exclude_ids={item['food'].id for item in scored_foods}
+            ))
         
         # Aplicar diversidad (evitar recomendar alimentos muy similares)
-        diverse_foods = self._apply_diversity_filter(scored_foods, count * 2)
-        
-        # Tomar top N
-        return diverse_foods[:count]
+        if not fast_path and deadline.has_fraction(self.STAGE_RESERVES['diversity']):
+            diverse_foods = self._apply_diversity_filter(scored_foods, count * 2)
+        else:
+            skipped_stages.append('diversity')
+            diverse_foods = scored_foods
+        
+        # Tomar top N y explicar sólo lo que se devuelve
+        recommendations = diverse_foods[:count]
+        explain = deadline.has_fraction(self.STAGE_RESERVES['explanations'])
+        if not explain:
+            skipped_stages.append('explanations')
+        for item in recommendations:
+            if explain:
+                item['reason'] = self._generate_recommendation_reason(
+                    item['food'], item['nutrition_score'], item['preference_score']
+                )
+            else:
+                item['reason'] = "Recomendado como opción balanceada para tu objetivo."
+        
+        self.last_run = {
+            'time_budget_ms': time_budget_ms,
+            'elapsed_ms': round(deadline.elapsed_ms(), 2),
+            'degraded': bool(skipped_stages),
+            'fast_path': fast_path,
+            'skipped_stages': skipped_stages,
+            'retrieval': self.last_retrieval_stats,
+        }
+        return recommendations
     
-    def _get_candidate_foods(self, meal_type=None):
+    def _get_candidate_foods(self, meal_type=None, current_nutrition=None, deadline=None):
         """Obtener alimentos candidatos para recomendación"""
-        foods = Food.objects.filter(is_verified=True)
+        retriever = CandidateRetriever(
+            self.user,
+            self._get_base_queryset(meal_type),
+            nutritional_profile=self.nutritional_profile,
+            budgets=self.retrieval_budgets
+        )
+        candidates = retriever.retrieve(
+            current_nutrition, deadline, self.STAGE_RESERVES['optional_sources']
+        )
         
-        # Aplicar filtros de restricciones dietéticas SOLO si el usuario las tiene
+        # Si no hay suficientes alimentos después de filtros, relajar restricciones
+        if len(candidates) < 10 and (deadline is None or
+                                     deadline.has_fraction(self.STAGE_RESERVES['ranking'])):
+            retriever = CandidateRetriever(
+                self.user,
+                Food.objects.filter(is_verified=True),
+                nutritional_profile=self.nutritional_profile,
+                budgets=self.retrieval_budgets
+            )
+            candidates = retriever.retrieve(
+                current_nutrition, deadline, self.STAGE_RESERVES['optional_sources']
+            )
+        
+        self.last_retrieval_stats = retriever.stats
+        return candidates
+    
+    def _get_segment_fallback(self, meal_type, current_nutrition, count, exclude_ids=()):
+        """Recomendaciones de la lista precalculada del segmento, sin señales personales"""
+        goal = self.context.goal
+        food_ids = get_segment_food_ids(goal, meal_type)
+        if food_ids is None:
+            # Sin la lista del segmento no se calcula aquí (agregado pesado): lista barata
+            food_ids = quick_segment_food_ids(
+                goal, meal_type, self.filter_for_meal_type(Food.objects.filter(is_verified=True), meal_type)
+            )
+        
+        excluded_keywords = [keyword for keyword in map(normalize_text, self._get_excluded_keywords()) if keyword]
+        candidate_ids = [food_id for food_id in food_ids if food_id not in exclude_ids]
+        
+        # Sin consultas adicionales: preferencia neutral y variedad máxima
+        self._ranking_features = self._empty_ranking_features()
+        fallback = []
+        batch_size = count * 3
+        for start in range(0, len(candidate_ids), batch_size):
+            # Cargar por lotes hasta completar `count` (las exclusiones pueden descartar muchos)
+            batch = candidate_ids[start:start + batch_size]
+            foods_by_id = Food.objects.select_related('category').in_bulk(batch)
+            for food_id in batch:
+                food = foods_by_id.get(food_id)
+                if not food:
+                    continue
+                # Misma comparación que _get_base_queryset: sobre la clave normalizada
+                if any(keyword in food.name_key for keyword in excluded_keywords):
+                    continue
+                fallback.append(self._calculate_food_score(food, current_nutrition, meal_type))
+                if len(fallback) >= count:
+                    return fallback
+        return fallback
+    
+    def _get_excluded_keywords(self):
+        """Palabras clave excluidas por restricciones dietéticas y alergias"""
+        keywords = []
         if self.user_preferences:
-            if self.user_preferences.is_vegetarian:
-                # Excluir carnes (esto se puede mejorar con tags específicos)
-                foods = foods.exclude(
-                    Q(name__icontains='chicken') | Q(name__icontains='beef') |
-                    Q(name__icontains='pork') | Q(name__icontains='meat')
-                )
-            
-            if self.user_preferences.is_vegan:
-                # Excluir productos animales
-                foods = foods.exclude(
-                    Q(name__icontains='milk') | Q(name__icontains='cheese') |
-                    Q(name__icontains='egg') | Q(name__icontains='yogurt')
-                )
-            
-            if self.user_preferences.is_gluten_free:
-                # Excluir productos con gluten
-                foods = foods.exclude(
-                    Q(name__icontains='bread') | Q(name__icontains='pasta') |
-                    Q(name__icontains='wheat')
-                )
+            for flag, flag_keywords in DIETARY_EXCLUSIONS.items():
+                if getattr(self.user_preferences, flag, False):
+                    keywords.extend(flag_keywords)
+        
+        return keywords + [allergen.lower() for allergen in self.context.allergens]
+    
+    def _get_base_queryset(self, meal_type=None):
+        """Queryset base con restricciones dietéticas, alergias y tipo de comida"""
+        foods = Food.objects.filter(is_verified=True)
         
-        # Excluir alergias del usuario (solo si las tiene)
-        user_allergens = self.user.allergies.values_list('allergen', flat=True)
-        for allergen in user_allergens:
-            foods = foods.exclude(name__icontains=allergen)
+        # Aplicar restricciones dietéticas y alergias SOLO si el usuario las tiene
+        for keyword in self._get_excluded_keywords():
+            keyword = normalize_text(keyword)
+            if keyword:
+                foods = foods.exclude(name_key__contains=keyword)
         
-        # Filtros específicos por tipo de comida - MÁS FLEXIBLES
+        return self.filter_for_meal_type(foods, meal_type)
+    
+    @staticmethod
+    def filter_for_meal_type(foods, meal_type=None):
+        """Filtros específicos por tipo de comida - MÁS FLEXIBLES"""
         if meal_type == 'breakfast':
             # Ampliar opciones de desayuno
             breakfast_foods = foods.filter(
-                Q(name__icontains='egg') | Q(name__icontains='milk') |
-                Q(name__icontains='oat') | Q(name__icontains='fruit') |
-                Q(name__icontains='yogurt') | Q(name__icontains='cereal') |
-                Q(name__icontains='banana') | Q(name__icontains='apple') |
-                Q(name__icontains='orange') | Q(name__icontains='bread') |
+                Q(name_key__contains='egg') | Q(name_key__contains='milk') |
+                Q(name_key__contains='oat') | Q(name_key__contains='fruit') |
+                Q(name_key__contains='yogurt') | Q(name_key__contains='cereal') |
+                Q(name_key__contains='banana') | Q(name_key__contains='apple') |
+                Q(name_key__contains='orange') | Q(name_key__contains='bread') |
                 Q(protein__gte=10)  # Cualquier alimento con buena proteína
             )
             if breakfast_foods.exists():
@@ -97,17 +233,64 @@ class RecommendationEngine:
             # Snacks saludables
             snack_foods = foods.filter(
                 Q(calories__lte=300) |  # Aumentar límite de calorías
-                Q(name__icontains='fruit') | Q(name__icontains='nut') |
-                Q(name__icontains='yogurt')
+                Q(name_key__contains='fruit') | Q(name_key__contains='nut') |
+                Q(name_key__contains='yogurt')
             )
             if snack_foods.exists():
                 foods = snack_foods
         
-        # Si no hay suficientes alimentos después de filtros, relajar restricciones
-        if foods.count() < 10:
-            foods = Food.objects.filter(is_verified=True)
+        return foods
+    
+    @staticmethod
+    def _empty_ranking_features():
+        return {
+            'ratings': {},
+            'preferences': {},
+            'category_ratings': {},
+            'last_consumed': {},
+        }
+    
+    def _load_ranking_features(self, foods, include_categories=True):
+        """Cargar en bloque las señales del usuario necesarias para el ranking"""
+        food_ids = [food.id for food in foods]
+        
+        ratings = {
+            food_id: (rating, meal_type)
+            for food_id, rating, meal_type in UserFoodRating.objects.filter(
+                user=self.user, food_id__in=food_ids
+            ).values_list('food_id', 'rating', 'meal_type')
+        }
         
-        return foods.select_related('category').order_by('?')[:200]  # Limitar para performance
+        preferences = {
+            food_id: (preference_score, confidence)
+            for food_id, preference_score, confidence in UserFoodPreference.objects.filter(
+                user=self.user, food_id__in=food_ids
+            ).values_list('food_id', 'preference_score', 'confidence')
+        }
+        
+        # Respaldo por categoría: opcional cuando el presupuesto es ajustado
+        category_ratings = {}
+        if include_categories:
+            category_ratings = {
+                row['food__category_id']: row['avg_rating']
+                for row in UserFoodRating.objects.filter(user=self.user).values(
+                    'food__category_id'
+                ).annotate(avg_rating=Avg('rating'))
+            }
+        
+        last_consumed = {
+            row['food_id']: row['last_date']
+            for row in FoodConsumption.objects.filter(
+                daily_log__user=self.user, food_id__in=food_ids
+            ).values('food_id').annotate(last_date=Max('daily_log__date'))
+        }
+        
+        return {
+            'ratings': ratings,
+            'preferences': preferences,
+            'category_ratings': category_ratings,
+            'last_consumed': last_consumed,
+        }
     
     def _calculate_food_score(self, food, current_nutrition=None, meal_type=None):
         """Calcular score total de un alimento"""
@@ -151,8 +334,7 @@ class RecommendationEngine:
             'preference_score': round(preference_score, 2),
             'variety_score': round(variety_score, 2),
             'convenience_score': round(convenience_score, 2),
-            'suggested_quantity': self._calculate_suggested_quantity(food, current_nutrition),
-            'reason': self._generate_recommendation_reason(food, nutrition_score, preference_score)
+            'suggested_quantity': self._calculate_suggested_quantity(food, current_nutrition)
         }
     
     def _calculate_nutrition_score(self, food, current_nutrition=None):
@@ -220,51 +402,45 @@ class RecommendationEngine:
     
     def _calculate_preference_score(self, food, meal_type=None):
         """Calcular score basado en preferencias del usuario"""
+        features = self._ranking_features or self._load_ranking_features([food])
         score = 50  # Score neutral base
         
         # Buscar calificación directa del usuario
-        try:
-            rating = UserFoodRating.objects.get(user=self.user, food=food)
-            score = rating.rating * 20  # Convertir 1-5 a 20-100
+        if food.id in features['ratings']:
+            rating, rating_meal_type = features['ratings'][food.id]
+            score = rating * 20  # Convertir 1-5 a 20-100
             
             # Bonus si ha calificado positivamente en este tipo de comida
-            if meal_type and rating.meal_type == meal_type and rating.rating >= 4:
+            if meal_type and rating_meal_type == meal_type and rating >= 4:
                 score += 10
-                
-        except UserFoodRating.DoesNotExist:
-            # Buscar preferencia aprendida
-            try:
-                preference = UserFoodPreference.objects.get(user=self.user, food=food)
-                score = 50 + (preference.preference_score * 50)  # Convertir -1,1 a 0-100
-                
-                # Ajustar por confianza
-                score = 50 + (score - 50) * preference.confidence
-                
-            except UserFoodPreference.DoesNotExist:
-                # Buscar patrones en alimentos similares de la misma categoría
-                if food.category:
-                    avg_rating = UserFoodRating.objects.filter(
-                        user=self.user,
-                        food__category=food.category
-                    ).aggregate(avg_rating=Avg('rating'))['avg_rating']
-                    
-                    if avg_rating:
-                        score = avg_rating * 20
+        
+        # Buscar preferencia aprendida
+        elif food.id in features['preferences']:
+            preference_score, confidence = features['preferences'][food.id]
+            score = 50 + (preference_score * 50)  # Convertir -1,1 a 0-100
+            
+            # Ajustar por confianza
+            score = 50 + (score - 50) * confidence
+        
+        # Buscar patrones en alimentos similares de la misma categoría
+        elif food.category_id:
+            avg_rating = features['category_ratings'].get(food.category_id)
+            if avg_rating:
+                score = avg_rating * 20
         
         return max(0, min(100, score))
     
     def _calculate_variety_score(self, food):
         """Calcular score de variedad (evitar monotonía)"""
+        features = self._ranking_features or self._load_ranking_features([food])
+        
         # Verificar cuándo fue la última vez que consumió este alimento
-        last_consumption = FoodConsumption.objects.filter(
-            daily_log__user=self.user,
-            food=food
-        ).order_by('-timestamp').first()
+        last_date = features['last_consumed'].get(food.id)
         
-        if not last_consumption:
+        if not last_date:
             return 100  # Máximo score si nunca lo ha consumido
         
-        days_since = (timezone.now().date() - last_consumption.daily_log.date).days
+        days_since = (timezone.now().date() - last_date).days
         
         if days_since >= 7:
             return 100
@@ -366,31 +542,62 @@ class RecommendationEngine:
 
     def learn_from_consumption(self, food_consumption):
         """Aprender de los patrones de consumo del usuario"""
-        food = food_consumption.food
-        meal_type = food_consumption.meal_type
-        
-        # Actualizar o crear preferencia
-        preference, created = UserFoodPreference.objects.get_or_create(
-            user=self.user,
-            food=food,
-            defaults={
-                'preference_score': 0.1,  # Preferencia ligeramente positiva por consumir
-                'frequency_consumed': 1,
-                'confidence': 0.3
-            }
-        )
+        self.learn_from_consumptions([food_consumption])
+    
+    def learn_from_consumptions(self, food_consumptions):
+        """Aprender de varios consumos con una lectura y escrituras en bloque"""
+        if not food_consumptions:
+            return
+        
+        now = timezone.now()
+        food_ids = {consumption.food_id for consumption in food_consumptions}
+        preferences = {
+            preference.food_id: preference
+            for preference in UserFoodPreference.objects.filter(
+                user=self.user, food_id__in=food_ids
+            )
+        }
         
-        if not created:
-            # Incrementar frecuencia y ajustar preferencia
-            preference.frequency_consumed += 1
-            preference.preference_score = min(1.0, preference.preference_score + 0.05)
-            preference.confidence = min(1.0, preference.confidence + 0.1)
+        created_preferences = []
+        for consumption in food_consumptions:
+            meal_type = consumption.meal_type
+            preference = preferences.get(consumption.food_id)
+            
+            if preference is None:
+                # Crear preferencia
+                preference = UserFoodPreference(
+                    user=self.user,
+                    food_id=consumption.food_id,
+                    preference_score=0.1,  # Preferencia ligeramente positiva por consumir
+                    frequency_consumed=1,
+                    confidence=0.3
+                )
+                preferences[consumption.food_id] = preference
+                created_preferences.append(preference)
+            else:
+                # Incrementar frecuencia y ajustar preferencia
+                preference.frequency_consumed += 1
+                preference.preference_score = min(1.0, preference.preference_score + 0.05)
+                preference.confidence = min(1.0, preference.confidence + 0.1)
+                
+                # Actualizar tipos de comida preferidos
+                preferred_meals = preference.preferred_meal_types or []
+                if meal_type not in preferred_meals:
+                    preferred_meals.append(meal_type)
+                    preference.preferred_meal_types = preferred_meals
             
-            # Actualizar tipos de comida preferidos
-            preferred_meals = preference.preferred_meal_types or []
-            if meal_type not in preferred_meals:
-                preferred_meals.append(meal_type)
-                preference.preferred_meal_types = preferred_meals
-        
-        preference.last_consumed = timezone.now()
-        preference.save()
\ No newline at end of file
+            preference.last_consumed = now
+            preference.updated_at = now
+        
+        created_ids = {id(preference) for preference in created_preferences}
+        updated_preferences = [
+            preference for preference in preferences.values()
+            if id(preference) not in created_ids
+        ]
+        
+        # ignore_conflicts: si otra petición la creó a la vez, se conserva la suya
+        UserFoodPreference.objects.bulk_create(created_preferences, ignore_conflicts=True)
+        UserFoodPreference.objects.bulk_update(updated_preferences, [
+            'frequency_consumed', 'preference_score', 'confidence',
+            'preferred_meal_types', 'last_consumed', 'updated_at'
+        ])
@@ -0,0 +1,117 @@
+# recommendations/export.py
+import csv
+from django.db.models import F
+from .daily_totals import serving_factor_expression
+from .models import FoodConsumption
+
+# (columna, expresión de values()) en el orden de salida
+EXPORT_COLUMNS = (
+    ('consumption_id', 'id'),
+    ('user_id', 'daily_log__user_id'),
+    ('date', 'daily_log__date'),
+    ('meal_type', 'meal_type'),
+    ('timestamp', 'timestamp'),
+    ('consumed_at', 'consumed_at'),
+    ('food_id', 'food_id'),
+    ('food_name', 'food__name'),
+    ('food_name_es', 'food__name_es'),
+    ('category', 'food__category__name'),
+    ('quantity', 'quantity'),
+    ('calories', 'calories_consumed'),
+    ('protein', 'protein_consumed'),
+    ('carbs', 'carbs_consumed'),
+    ('fat', 'fat_consumed'),
+    ('fiber', 'fiber'),
+    ('sodium', 'sodium'),
+)
+COLUMN_NAMES = [name for name, _ in EXPORT_COLUMNS]
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def export_queryset(user_ids=None, start_date=None, end_date=None):
+    """Consumos unidos con alimento, categoría y log diario, como tuplas planas"""
+    consumptions = FoodConsumption.objects.all()
+    if user_ids:
+        consumptions = consumptions.filter(daily_log__user_id__in=user_ids)
+    if start_date:
+        consumptions = consumptions.filter(daily_log__date__gte=start_date)
+    if end_date:
+        consumptions = consumptions.filter(daily_log__date__lte=end_date)
+
+    # Fibra y sodio no se guardan por consumo: proporcionales a la porción
+    # (mismo factor que rebuild_daily_logs; vacío si la porción es 0)
+    factor = serving_factor_expression()
+    return consumptions.annotate(
+        fiber=factor * F('food__fiber'),
+        sodium=factor * F('food__sodium'),
+    ).values_list(*[lookup for _, lookup in EXPORT_COLUMNS])
+
+
+def iter_export_chunks(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Recorrer el queryset en lotes de `chunk_size` filas con paginación por ID.
+
+    Con MySQL, iterator() no usa cursores de servidor (el driver carga el
+    resultado completo), así que se avanza por rangos de PK: cada lote es una
+    consulta indexada y la memoria queda acotada al tamaño del lote.
+    """
+    last_id = 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id).order_by('id')[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1][0]
+
+
+class _Echo:
+    """Pseudo-archivo para csv.writer: devuelve la línea en vez de escribirla"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Generador de texto CSV por lotes, apto para StreamingHttpResponse"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(COLUMN_NAMES)
+    for chunk in iter_export_chunks(queryset, chunk_size):
+        yield ''.join(writer.writerow(row) for row in chunk)
+
+
+def write_parquet(queryset, sink, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Escribir el export en Parquet, un row group por lote. Devuelve el número de filas"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ('consumption_id', pa.int64()),
+        ('user_id', pa.int64()),
+        ('date', pa.date32()),
+        ('meal_type', pa.string()),
+        ('timestamp', pa.timestamp('us', tz='UTC')),
+        ('consumed_at', pa.timestamp('us', tz='UTC')),
+        ('food_id', pa.int64()),
+        ('food_name', pa.string()),
+        ('food_name_es', pa.string()),
+        ('category', pa.string()),
+        ('quantity', pa.float64()),
+        ('calories', pa.float64()),
+        ('protein', pa.float64()),
+        ('carbs', pa.float64()),
+        ('fat', pa.float64()),
+        ('fiber', pa.float64()),
+        ('sodium', pa.float64()),
+    ])
+
+    rows_written = 0
+    with pq.ParquetWriter(sink, schema, compression='snappy') as writer:
+        for chunk in iter_export_chunks(queryset, chunk_size):
+            columns = list(zip(*chunk))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema
+            ))
+            rows_written += len(chunk)
+    return rows_written
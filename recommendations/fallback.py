@@ -0,0 +1,62 @@
+# recommendations/fallback.py
+from datetime import timedelta
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+from .models import FoodConsumption
+
+# Listas precalculadas por segmento (objetivo del usuario + tipo de comida)
+SEGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+SEGMENT_LIST_SIZE = 60
+SEGMENT_POPULAR_DAYS = 30
+# Lista barata servida si falta la precalculada; build_segment_fallbacks la sustituye
+SEGMENT_MISS_TIMEOUT = 60 * 5
+
+
+def segment_cache_key(goal, meal_type):
+    return f'recommendations:segment:{goal or "none"}:{meal_type or "any"}'
+
+
+def build_segment_food_ids(goal, meal_type, foods, size=SEGMENT_LIST_SIZE):
+    """
+    Calcular la lista de respaldo de un segmento: los alimentos más consumidos
+    por usuarios con el mismo objetivo, completados con los de mayor densidad
+    nutricional. `foods` es el queryset ya filtrado por tipo de comida.
+    """
+    since = timezone.now().date() - timedelta(days=SEGMENT_POPULAR_DAYS)
+    consumptions = FoodConsumption.objects.filter(
+        daily_log__date__gte=since,
+        food__in=foods
+    )
+    if goal:
+        consumptions = consumptions.filter(daily_log__user__goal=goal)
+    if meal_type:
+        consumptions = consumptions.filter(meal_type=meal_type)
+
+    food_ids = list(consumptions.values('food_id').annotate(
+        times=Count('id')
+    ).order_by('-times').values_list('food_id', flat=True)[:size])
+
+    if len(food_ids) < size:
+        food_ids.extend(foods.exclude(id__in=food_ids).order_by(
+            '-nutrient_density_score'
+        ).values_list('id', flat=True)[:size - len(food_ids)])
+
+    cache.set(segment_cache_key(goal, meal_type), food_ids, SEGMENT_CACHE_TIMEOUT)
+    return food_ids
+
+
+def get_segment_food_ids(goal, meal_type):
+    """Lista precalculada del segmento, o None si aún no se ha construido"""
+    return cache.get(segment_cache_key(goal, meal_type))
+
+
+def quick_segment_food_ids(goal, meal_type, foods, size=SEGMENT_LIST_SIZE):
+    """
+    Lista de respaldo para cuando la precalculada no está en caché: sólo los
+    alimentos de mayor densidad nutricional (una consulta sin agregados). Se
+    cachea unos minutos; la lista completa la construye build_segment_fallbacks.
+    """
+    food_ids = list(foods.order_by('-nutrient_density_score').values_list('id', flat=True)[:size])
+    cache.set(segment_cache_key(goal, meal_type), food_ids, SEGMENT_MISS_TIMEOUT)
+    return food_ids
@@ -0,0 +1,111 @@
+# recommendations/insights.py
+import numpy as np
+from datetime import timedelta
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+from .models import DailyNutritionLog, FoodConsumption
+from .daily_totals import get_log_stamp
+
+MAX_WINDOW_DAYS = 365
+INSIGHTS_CACHE_TIMEOUT = 60 * 60 * 24  # la clave cambia con cada registro nuevo
+
+# Umbrales de los patrones
+CONSISTENT_ADHERENCE = 70
+BALANCED_SCORE = 70
+HIGH_PROTEIN_RATIO = 0.8
+
+
+def get_nutrition_insights(user_id, days, targets):
+    """
+    Insights de los últimos `days` días (hasta MAX_WINDOW_DAYS), cacheados por
+    la marca de última actualización de logs del usuario. Devuelve None si no
+    hay registros en la ventana.
+    """
+    end_date = timezone.now().date()
+    # Los objetivos entran en la clave: cambiar el perfil no toca los logs
+    cache_key = (
+        f'insights:{user_id}:{days}:{end_date.isoformat()}:{get_log_stamp(user_id)}:'
+        f'{targets["protein"]}'
+    )
+    insights = cache.get(cache_key)
+    if insights is None:
+        insights = compute_nutrition_insights(user_id, end_date, days, targets)
+        cache.set(cache_key, insights, INSIGHTS_CACHE_TIMEOUT)
+    return insights
+
+
+def compute_nutrition_insights(user_id, end_date, days, targets):
+    """Una consulta de filas diarias (vectorizada con numpy) y una agrupada de alimentos"""
+    start_date = end_date - timedelta(days=days - 1)
+
+    rows = list(DailyNutritionLog.objects.filter(
+        user_id=user_id,
+        date__range=[start_date, end_date]
+    ).order_by('date').values_list(
+        'date', 'consumed_calories', 'consumed_protein', 'adherence_score', 'balance_score'
+    ))
+    if not rows:
+        return None
+
+    _, calories, protein, adherence, balance = zip(*rows)
+    calories = np.array(calories, dtype=float)
+    protein = np.array(protein, dtype=float)
+    # None -> NaN: las comparaciones con NaN son falsas y no cuentan en los patrones
+    adherence = np.array(adherence, dtype=float)
+    balance = np.array(balance, dtype=float)
+
+    avg_calories = float(calories.mean())
+    avg_protein = float(protein.mean())
+    avg_adherence = float(np.nan_to_num(adherence).mean())
+
+    patterns = {
+        'consistent_days': int(np.count_nonzero(adherence >= CONSISTENT_ADHERENCE)),
+        'high_protein_days': int(np.count_nonzero(protein >= targets['protein'] * HIGH_PROTEIN_RATIO)),
+        'balanced_days': int(np.count_nonzero(balance >= BALANCED_SCORE))
+    }
+
+    # Comidas más frecuentes
+    frequent_foods = list(FoodConsumption.objects.filter(
+        daily_log__user_id=user_id,
+        daily_log__date__range=[start_date, end_date]
+    ).values('food__name_es', 'food__name').annotate(
+        count=Count('food')
+    ).order_by('-count')[:5])
+
+    # Recomendaciones de mejora
+    recommendations_for_improvement = []
+
+    if avg_protein < targets['protein'] * HIGH_PROTEIN_RATIO:
+        recommendations_for_improvement.append({
+            'area': 'Proteína',
+            'message': 'Considera aumentar tu consumo de proteína',
+            'suggestion': 'Incluye más carnes magras, huevos, o legumbres'
+        })
+
+    if avg_adherence < 60:
+        recommendations_for_improvement.append({
+            'area': 'Consistencia',
+            'message': 'Trabaja en ser más consistente con tus objetivos',
+            'suggestion': 'Planifica tus comidas con anticipación'
+        })
+
+    return {
+        'period': f'Últimos {days} días',
+        'averages': {
+            'calories': round(avg_calories, 1),
+            'protein': round(avg_protein, 1),
+            'adherence_score': round(avg_adherence, 1)
+        },
+        'patterns': patterns,
+        'frequent_foods': frequent_foods,
+        'improvement_recommendations': recommendations_for_improvement,
+        'daily_data': [
+            {
+                'date': date.isoformat(),
+                'calories': day_calories,
+                'protein': day_protein,
+                'adherence': day_adherence
+            } for date, day_calories, day_protein, day_adherence, _ in rows
+        ]
+    }
@@ -0,0 +1,36 @@
+# recommendations/management/commands/backfill_nutrition_rollups.py
+from django.core.management.base import BaseCommand, CommandError
+from recommendations.models import DailyNutritionLog
+from recommendations.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Construir los acumulados semanales/mensuales a partir de DailyNutritionLog y FoodConsumption'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='ID de usuario a reconstruir')
+        parser.add_argument('--chunk-size', type=int, default=200, help='Usuarios por lote')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size <= 0:
+            raise CommandError('--chunk-size debe ser mayor que 0')
+
+        user_ids = DailyNutritionLog.objects.order_by('user_id').values_list(
+            'user_id', flat=True
+        ).distinct()
+        if options['user']:
+            user_ids = user_ids.filter(user_id=options['user'])
+        user_ids = list(user_ids)
+
+        rollups_count = meal_rollups_count = 0
+        for start in range(0, len(user_ids), chunk_size):
+            chunk = user_ids[start:start + chunk_size]
+            rollups, meal_rollups = rebuild_rollups(chunk)
+            rollups_count += rollups
+            meal_rollups_count += meal_rollups
+            self.stdout.write(f'Usuarios {start + len(chunk)}/{len(user_ids)}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Acumulados creados: {rollups_count} de periodo, {meal_rollups_count} por tipo de comida'
+        ))
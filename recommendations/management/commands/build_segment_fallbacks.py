@@ -0,0 +1,29 @@
+# recommendations/management/commands/build_segment_fallbacks.py
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from nutrition.models import Food
+from recommendations.engine import RecommendationEngine
+from recommendations.fallback import build_segment_food_ids
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Precalcular las listas de respaldo por segmento (objetivo + tipo de comida)'
+
+    def handle(self, *args, **options):
+        goals = [None] + [goal for goal, _ in User.GOAL_CHOICES]
+        meal_types = [None, 'breakfast', 'lunch', 'dinner', 'snack']
+        
+        built = 0
+        for meal_type in meal_types:
+            foods = RecommendationEngine.filter_for_meal_type(
+                Food.objects.filter(is_verified=True), meal_type
+            )
+            for goal in goals:
+                food_ids = build_segment_food_ids(goal, meal_type, foods)
+                built += 1
+                self.stdout.write(f'{goal or "sin objetivo"} / {meal_type or "cualquiera"}: {len(food_ids)} alimentos')
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Listas de segmento construidas: {built}')
+        )
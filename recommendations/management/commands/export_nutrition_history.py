@@ -0,0 +1,55 @@
+# recommendations/management/commands/export_nutrition_history.py
+import csv
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from recommendations.export import (
+    COLUMN_NAMES, DEFAULT_CHUNK_SIZE, export_queryset, iter_export_chunks, write_parquet
+)
+
+
+class Command(BaseCommand):
+    help = 'Exportar historiales de consumo a CSV o Parquet con memoria constante'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Ruta del archivo de salida')
+        parser.add_argument('--format', choices=['csv', 'parquet'], default=None,
+                            help='Formato (por defecto, según la extensión del archivo)')
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='ID de usuario (repetible); por defecto todos')
+        parser.add_argument('--start', help='Fecha inicial (YYYY-MM-DD)')
+        parser.add_argument('--end', help='Fecha final (YYYY-MM-DD)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Filas por lote')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        export_format = options['format'] or ('parquet' if output.endswith('.parquet') else 'csv')
+        chunk_size = options['chunk_size']
+        if chunk_size <= 0:
+            raise CommandError('--chunk-size debe ser mayor que 0')
+
+        queryset = export_queryset(
+            options['users'],
+            self._parse_date(options['start']),
+            self._parse_date(options['end'])
+        )
+
+        if export_format == 'parquet':
+            rows = write_parquet(queryset, output, chunk_size)
+        else:
+            rows = 0
+            with open(output, 'w', encoding='utf-8', newline='') as csv_file:
+                writer = csv.writer(csv_file)
+                writer.writerow(COLUMN_NAMES)
+                for chunk in iter_export_chunks(queryset, chunk_size):
+                    writer.writerows(chunk)
+                    rows += len(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f'Exportadas {rows} filas a {output} ({export_format})'))
+
+    def _parse_date(self, value):
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Fecha inválida: {value}. Use YYYY-MM-DD')
@@ -0,0 +1,179 @@
+# recommendations/management/commands/rebuild_daily_logs.py
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Mod
+from django.utils import timezone
+from recommendations.models import DailyNutritionLog, FoodConsumption
+from recommendations.context import load_targets_for_users
+from recommendations.daily_totals import TOTAL_FIELDS, compute_day_scores, serving_factor_expression
+from recommendations.rollups import rebuild_rollups
+
+SCORE_FIELDS = ('adherence_score', 'balance_score')
+# Diferencias menores se consideran ruido de coma flotante
+TOLERANCE = 0.01
+
+
+class Command(BaseCommand):
+    help = 'Recalcular totales, adherencia y balance de DailyNutritionLog a partir de FoodConsumption'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='ID de usuario a reconstruir')
+        parser.add_argument('--start', help='Fecha inicial (YYYY-MM-DD)')
+        parser.add_argument('--end', help='Fecha final (YYYY-MM-DD)')
+        parser.add_argument('--dry-run', action='store_true', help='Mostrar diferencias sin guardar')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Logs diarios por lote')
+        parser.add_argument('--workers', type=int, default=1, help='Hilos en paralelo (shards por user_id)')
+        parser.add_argument('--show', type=int, default=20, help='Diferencias a mostrar en --dry-run')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] <= 0 or options['workers'] <= 0:
+            raise CommandError('--chunk-size y --workers deben ser mayores que 0')
+
+        logs = DailyNutritionLog.objects.all()
+        if options['user']:
+            logs = logs.filter(user_id=options['user'])
+        if options['start']:
+            logs = logs.filter(date__gte=self._parse_date(options['start']))
+        if options['end']:
+            logs = logs.filter(date__lte=self._parse_date(options['end']))
+
+        self.dry_run = options['dry_run']
+        self.chunk_size = options['chunk_size']
+        workers = options['workers']
+        started = time.perf_counter()
+
+        if workers == 1:
+            results = [self._rebuild_shard(logs)]
+        else:
+            shards = [
+                logs.annotate(shard=Mod('user_id', workers)).filter(shard=shard)
+                for shard in range(workers)
+            ]
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(self._run_in_thread, shards))
+
+        checked = sum(result['checked'] for result in results)
+        changed = sum(result['changed'] for result in results)
+        diffs = [diff for result in results for diff in result['diffs']]
+        changed_users = set().union(*(result['users'] for result in results))
+
+        if self.dry_run:
+            for diff in diffs[:options['show']]:
+                self.stdout.write(diff)
+            if len(diffs) > options['show']:
+                self.stdout.write(f'... y {len(diffs) - options["show"]} diferencias más')
+
+        elif changed_users:
+            # Los acumulados semanales/mensuales derivan de los logs corregidos
+            rebuild_rollups(changed_users)
+            self.stdout.write(f'Acumulados reconstruidos para {len(changed_users)} usuarios')
+
+        action = 'con diferencias (sin guardar)' if self.dry_run else 'actualizados'
+        self.stdout.write(self.style.SUCCESS(
+            f'Logs revisados: {checked}, {action}: {changed} '
+            f'({time.perf_counter() - started:.1f}s)'
+        ))
+
+    def _parse_date(self, value):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Fecha inválida: {value}. Use YYYY-MM-DD')
+
+    def _run_in_thread(self, logs):
+        """Cada hilo usa su propia conexión y la cierra al terminar"""
+        try:
+            return self._rebuild_shard(logs)
+        finally:
+            connection.close()
+
+    def _rebuild_shard(self, logs):
+        """Recorrer los logs del shard por lotes de ID (keyset) y reconstruir cada lote"""
+        result = {'checked': 0, 'changed': 0, 'diffs': [], 'users': set()}
+        last_id = 0
+        while True:
+            log_ids = list(logs.filter(id__gt=last_id).order_by('id').values_list(
+                'id', flat=True
+            )[:self.chunk_size])
+            if not log_ids:
+                break
+            last_id = log_ids[-1]
+
+            if self.dry_run:
+                self._rebuild_chunk(log_ids, result)
+            else:
+                # Bloquear el lote para no pisar incrementos concurrentes
+                with transaction.atomic():
+                    self._rebuild_chunk(log_ids, result)
+        return result
+
+    def _rebuild_chunk(self, log_ids, result):
+        current_logs = DailyNutritionLog.objects.filter(id__in=log_ids)
+        if not self.dry_run:
+            current_logs = current_logs.select_for_update()
+        current = list(current_logs.values('id', 'user_id', 'date', *TOTAL_FIELDS, *SCORE_FIELDS))
+
+        aggregates = self._aggregate_consumptions(log_ids)
+        targets_by_user = load_targets_for_users({row['user_id'] for row in current})
+
+        now = timezone.now()
+        changed_logs = []
+        for row in current:
+            totals = aggregates.get(row['id'], dict.fromkeys(TOTAL_FIELDS, 0))
+            expected = dict(totals)
+            expected.update(compute_day_scores(totals, targets_by_user[row['user_id']]))
+
+            differences = {
+                field: (row[field], value) for field, value in expected.items()
+                if self._differs(row[field], value)
+            }
+            result['checked'] += 1
+            if not differences:
+                continue
+
+            result['changed'] += 1
+            result['users'].add(row['user_id'])
+            if self.dry_run:
+                details = ', '.join(
+                    f'{field}: {old} -> {self._round(new)}' for field, (old, new) in differences.items()
+                )
+                result['diffs'].append(f'usuario {row["user_id"]} {row["date"]}: {details}')
+            else:
+                changed_logs.append(DailyNutritionLog(id=row['id'], updated_at=now, **expected))
+
+        if changed_logs:
+            DailyNutritionLog.objects.bulk_update(
+                changed_logs, [*TOTAL_FIELDS, *SCORE_FIELDS, 'updated_at'], batch_size=500
+            )
+
+    def _aggregate_consumptions(self, log_ids):
+        """Una consulta GROUP BY daily_log para todo el lote"""
+        # Fibra y sodio no se guardan por consumo: proporcionales a la porción
+        factor = serving_factor_expression()
+        rows = FoodConsumption.objects.filter(daily_log_id__in=log_ids).values(
+            'daily_log_id'
+        ).annotate(
+            consumed_calories=Sum('calories_consumed'),
+            consumed_protein=Sum('protein_consumed'),
+            consumed_carbs=Sum('carbs_consumed'),
+            consumed_fat=Sum('fat_consumed'),
+            consumed_fiber=Sum(factor * F('food__fiber')),
+            consumed_sodium=Sum(factor * F('food__sodium')),
+        ).order_by()
+
+        return {
+            row['daily_log_id']: {field: row[field] or 0 for field in TOTAL_FIELDS}
+            for row in rows
+        }
+
+    def _differs(self, old, new):
+        if old is None or new is None:
+            return old != new
+        return abs(old - new) > TOLERANCE
+
+    def _round(self, value):
+        return round(value, 2) if value is not None else None
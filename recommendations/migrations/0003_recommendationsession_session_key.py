@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:12
+
+from django.db import migrations, models
+import uuid
+
+
+def populate_session_keys(apps, schema_editor):
+    RecommendationSession = apps.get_model('recommendations', 'RecommendationSession')
+    for session in RecommendationSession.objects.filter(session_key__isnull=True).only('id'):
+        session.session_key = uuid.uuid4()
+        session.save(update_fields=['session_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendations', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recommendationsession',
+            name='session_key',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.RunPython(populate_session_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='recommendationsession',
+            name='session_key',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendations', '0003_recommendationsession_session_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='foodconsumption',
+            name='client_event_id',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='foodconsumption',
+            name='consumed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='foodconsumption',
+            constraint=models.UniqueConstraint(fields=('daily_log', 'client_event_id'), name='unique_consumption_client_event'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recommendations', '0004_foodconsumption_client_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NutritionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_type', models.CharField(choices=[('week', 'Semana'), ('month', 'Mes')], max_length=10)),
+                ('period_start', models.DateField(help_text='Lunes de la semana o día 1 del mes')),
+                ('consumed_calories', models.FloatField(default=0)),
+                ('consumed_protein', models.FloatField(default=0)),
+                ('consumed_carbs', models.FloatField(default=0)),
+                ('consumed_fat', models.FloatField(default=0)),
+                ('consumed_fiber', models.FloatField(default=0)),
+                ('consumed_sodium', models.FloatField(default=0)),
+                ('days_logged', models.IntegerField(default=0)),
+                ('adherence_sum', models.FloatField(default=0)),
+                ('days_on_target', models.IntegerField(default=0, help_text='Días con adherencia >= 80')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nutrition_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'period_type', 'period_start')},
+            },
+        ),
+        migrations.CreateModel(
+            name='MealTypeRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_type', models.CharField(choices=[('week', 'Semana'), ('month', 'Mes')], max_length=10)),
+                ('period_start', models.DateField()),
+                ('meal_type', models.CharField(max_length=20)),
+                ('calories', models.FloatField(default=0)),
+                ('protein', models.FloatField(default=0)),
+                ('carbs', models.FloatField(default=0)),
+                ('fat', models.FloatField(default=0)),
+                ('items_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='meal_type_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'period_type', 'period_start', 'meal_type')},
+            },
+        ),
+    ]
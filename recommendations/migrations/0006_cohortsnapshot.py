@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendations', '0005_nutrition_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CohortSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('goal', 'Objetivo'), ('activity_level', 'Nivel de actividad'), ('age_band', 'Rango de edad')], max_length=20)),
+                ('cohort', models.CharField(max_length=30)),
+                ('window_start', models.DateField()),
+                ('window_end', models.DateField()),
+                ('users_count', models.IntegerField(default=0)),
+                ('days_logged', models.IntegerField(default=0)),
+                ('avg_adherence', models.FloatField(blank=True, null=True)),
+                ('std_adherence', models.FloatField(blank=True, null=True)),
+                ('on_target_rate', models.FloatField(blank=True, help_text='Fracción de días con adherencia >= 80', null=True)),
+                ('avg_calories', models.FloatField(default=0)),
+                ('avg_protein', models.FloatField(default=0)),
+                ('avg_carbs', models.FloatField(default=0)),
+                ('avg_fat', models.FloatField(default=0)),
+                ('protein_energy_pct', models.FloatField(default=0)),
+                ('carbs_energy_pct', models.FloatField(default=0)),
+                ('fat_energy_pct', models.FloatField(default=0)),
+                ('top_foods', models.JSONField(default=list)),
+                ('computed_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['dimension', 'cohort'],
+                'unique_together': {('dimension', 'cohort')},
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-19 21:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_event_users(apps, schema_editor):
+    """
+    Propietario de los consumos sincronizados. Si una clave ya se repitió en
+    varios días del mismo usuario sólo la primera queda asociada, para que
+    la restricción nueva pueda crearse.
+    """
+    FoodConsumption = apps.get_model('recommendations', 'FoodConsumption')
+    seen = set()
+    rows = FoodConsumption.objects.filter(client_event_id__isnull=False).order_by('id').values_list(
+        'id', 'daily_log__user_id', 'client_event_id'
+    )
+    by_user = {}
+    for consumption_id, user_id, client_event_id in rows.iterator():
+        if (user_id, client_event_id) in seen:
+            continue
+        seen.add((user_id, client_event_id))
+        by_user.setdefault(user_id, []).append(consumption_id)
+    for user_id, consumption_ids in by_user.items():
+        for start in range(0, len(consumption_ids), 1000):
+            FoodConsumption.objects.filter(id__in=consumption_ids[start:start + 1000]).update(user_id=user_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recommendations', '0006_cohortsnapshot'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='foodconsumption',
+            name='unique_consumption_client_event',
+        ),
+        migrations.AddField(
+            model_name='foodconsumption',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_event_users, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='foodconsumption',
+            constraint=models.UniqueConstraint(fields=('user', 'client_event_id'), name='unique_consumption_user_client_event'),
+        ),
+    ]
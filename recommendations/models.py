@@ -4,6 +4,7 @@ from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
 from nutrition.models import Food
 import json
+import uuid
 
 User = get_user_model()
 
@@ -109,24 +110,50 @@ class DailyNutritionLog(models.Model):
         if not profile:
             return self._calculate_adherence_with_defaults()
         
-        # Calcular desviación de objetivos
-        calorie_adherence = min(100, (self.consumed_calories / profile.target_calories) * 100) if profile.target_calories > 0 else 0
-        protein_adherence = min(100, (self.consumed_protein / profile.target_protein) * 100) if profile.target_protein > 0 else 0
-        
-        # Score promedio ponderado
-        score = (calorie_adherence * 0.4 + protein_adherence * 0.6)
-        return round(min(100, score), 1)
+        return self.compute_adherence_score(
+            self.consumed_calories, self.consumed_protein,
+            profile.target_calories, profile.target_protein
+        )
     def _calculate_adherence_with_defaults(self):
         """Calcular adherencia con valores por defecto del usuario"""
         user = self.user
-        target_calories = user.daily_calories or 2000
-        target_protein = user.daily_protein or 150
-        
-        calorie_adherence = min(100, (self.consumed_calories / target_calories) * 100) if target_calories > 0 else 0
-        protein_adherence = min(100, (self.consumed_protein / target_protein) * 100) if target_protein > 0 else 0
+        return self.compute_adherence_score(
+            self.consumed_calories, self.consumed_protein,
+            user.daily_calories or 2000, user.daily_protein or 150
+        )
+    
+    @staticmethod
+    def compute_adherence_score(consumed_calories, consumed_protein, target_calories, target_protein):
+        """Score de adherencia a partir de totales y objetivos (sin consultas)"""
+        # Calcular desviación de objetivos
+        calorie_adherence = min(100, (consumed_calories / target_calories) * 100) if target_calories > 0 else 0
+        protein_adherence = min(100, (consumed_protein / target_protein) * 100) if target_protein > 0 else 0
         
+        # Score promedio ponderado
         score = (calorie_adherence * 0.4 + protein_adherence * 0.6)
         return round(min(100, score), 1)
+    
+    @staticmethod
+    def compute_balance_score(consumed_protein, consumed_carbs, consumed_fat,
+                              target_protein, target_carbs, target_fat):
+        """
+        Score de balance 0-100: compara el reparto de energía entre proteína,
+        carbohidratos y grasa con el reparto de los objetivos. None si aún no
+        hay consumo que evaluar.
+        """
+        consumed_energy = (consumed_protein * 4, consumed_carbs * 4, consumed_fat * 9)
+        target_energy = (target_protein * 4, target_carbs * 4, target_fat * 9)
+        consumed_total = sum(consumed_energy)
+        target_total = sum(target_energy)
+        if consumed_total <= 0 or target_total <= 0:
+            return None
+        
+        # Distancia entre repartos (0 = idéntico, 1 = totalmente distinto)
+        deviation = sum(
+            abs(consumed / consumed_total - target / target_total)
+            for consumed, target in zip(consumed_energy, target_energy)
+        ) / 2
+        return round(max(0, 100 * (1 - deviation)), 1)
 
 class FoodConsumption(models.Model):
     """Registro individual de consumo de alimentos"""
@@ -150,13 +177,33 @@ class FoodConsumption(models.Model):
     
     timestamp = models.DateTimeField(auto_now_add=True)
     
-    def save(self, *args, **kwargs):
-        """Calcular valores nutricionales basados en cantidad"""
+    # Sincronización offline: hora real del consumo y clave de idempotencia del
+    # cliente, única por usuario (un reintento puede caer en otro día). `user`
+    # sólo se rellena en los consumos sincronizados
+    consumed_at = models.DateTimeField(null=True, blank=True)
+    client_event_id = models.CharField(max_length=64, null=True, blank=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'client_event_id'],
+                name='unique_consumption_user_client_event'
+            ),
+        ]
+    
+    def calculate_nutrients(self):
+        """Calcular valores nutricionales basados en cantidad (también para bulk_create)"""
         factor = self.quantity / self.food.serving_size
         self.calories_consumed = self.food.calories * factor
         self.protein_consumed = self.food.protein * factor
         self.carbs_consumed = self.food.carbohydrate * factor
         self.fat_consumed = self.food.fat * factor
+        return factor
+    
+    def save(self, *args, **kwargs):
+        """Calcular valores nutricionales basados en cantidad"""
+        self.calculate_nutrients()
         super().save(*args, **kwargs)
     
     def __str__(self):
@@ -176,6 +223,9 @@ class RecommendationSession(models.Model):
     current_nutrition = models.JSONField(default=dict, help_text="Estado nutricional actual")
     user_preferences = models.JSONField(default=dict, help_text="Preferencias aplicadas")
     
+    # Identificador asignado antes de guardar (la escritura es diferida)
+    session_key = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    
     # Metadatos
     created_at = models.DateTimeField(auto_now_add=True)
     
@@ -267,4 +317,101 @@ class SimilarFood(models.Model):
         ]
     
     def __str__(self):
-        return f"{self.food1.name} ≈ {self.food2.name} ({self.overall_similarity:.2f})"
\ No newline at end of file
+        return f"{self.food1.name} ≈ {self.food2.name} ({self.overall_similarity:.2f})"
+
+PERIOD_CHOICES = [
+    ('week', 'Semana'),
+    ('month', 'Mes'),
+]
+
+class NutritionRollup(models.Model):
+    """Acumulados semanales/mensuales de DailyNutritionLog, mantenidos incrementalmente"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='nutrition_rollups')
+    period_type = models.CharField(max_length=10, choices=PERIOD_CHOICES)
+    period_start = models.DateField(help_text="Lunes de la semana o día 1 del mes")
+    
+    # Sumas del periodo
+    consumed_calories = models.FloatField(default=0)
+    consumed_protein = models.FloatField(default=0)
+    consumed_carbs = models.FloatField(default=0)
+    consumed_fat = models.FloatField(default=0)
+    consumed_fiber = models.FloatField(default=0)
+    consumed_sodium = models.FloatField(default=0)
+    
+    # Días con consumo y adherencia acumulada de esos días
+    days_logged = models.IntegerField(default=0)
+    adherence_sum = models.FloatField(default=0)
+    days_on_target = models.IntegerField(default=0, help_text="Días con adherencia >= 80")
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ('user', 'period_type', 'period_start')
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.period_type} {self.period_start}"
+    
+    @property
+    def average_adherence(self):
+        return self.adherence_sum / self.days_logged if self.days_logged else None
+
+class MealTypeRollup(models.Model):
+    """Acumulados semanales/mensuales por tipo de comida"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='meal_type_rollups')
+    period_type = models.CharField(max_length=10, choices=PERIOD_CHOICES)
+    period_start = models.DateField()
+    meal_type = models.CharField(max_length=20)
+    
+    calories = models.FloatField(default=0)
+    protein = models.FloatField(default=0)
+    carbs = models.FloatField(default=0)
+    fat = models.FloatField(default=0)
+    items_count = models.IntegerField(default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ('user', 'period_type', 'period_start', 'meal_type')
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.period_type} {self.period_start} ({self.meal_type})"
+
+class CohortSnapshot(models.Model):
+    """Estadísticas agregadas por cohorte (objetivo, actividad, edad), recalculadas cada noche"""
+    DIMENSION_CHOICES = [
+        ('goal', 'Objetivo'),
+        ('activity_level', 'Nivel de actividad'),
+        ('age_band', 'Rango de edad'),
+    ]
+    
+    dimension = models.CharField(max_length=20, choices=DIMENSION_CHOICES)
+    cohort = models.CharField(max_length=30)
+    window_start = models.DateField()
+    window_end = models.DateField()
+    
+    users_count = models.IntegerField(default=0)
+    days_logged = models.IntegerField(default=0)
+    
+    # Adherencia
+    avg_adherence = models.FloatField(null=True, blank=True)
+    std_adherence = models.FloatField(null=True, blank=True)
+    on_target_rate = models.FloatField(null=True, blank=True, help_text="Fracción de días con adherencia >= 80")
+    
+    # Promedios diarios y reparto energético de macros
+    avg_calories = models.FloatField(default=0)
+    avg_protein = models.FloatField(default=0)
+    avg_carbs = models.FloatField(default=0)
+    avg_fat = models.FloatField(default=0)
+    protein_energy_pct = models.FloatField(default=0)
+    carbs_energy_pct = models.FloatField(default=0)
+    fat_energy_pct = models.FloatField(default=0)
+    
+    top_foods = models.JSONField(default=list)
+    computed_at = models.DateTimeField()
+    
+    class Meta:
+        unique_together = ('dimension', 'cohort')
+        ordering = ['dimension', 'cohort']
+    
+    def __str__(self):
+        return f"{self.get_dimension_display()}: {self.cohort}"
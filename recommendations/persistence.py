@@ -0,0 +1,93 @@
+# recommendations/persistence.py
+import copy
+from django.db import transaction
+from django.utils import timezone
+from .models import RecommendationSession, Recommendation
+
+
+def build_recommendation_session(user, session_type, current_nutrition, user_preferences,
+                                 recommendations_data):
+    """Construir en memoria la sesión y sus recomendaciones a partir de los scores del motor"""
+    session = RecommendationSession(
+        user=user,
+        session_type=session_type,
+        current_nutrition=current_nutrition,
+        user_preferences=user_preferences,
+        created_at=timezone.now()
+    )
+    recommendations = [
+        Recommendation(
+            session=session,
+            food=rec_data['food'],
+            total_score=rec_data['total_score'],
+            nutrition_score=rec_data['nutrition_score'],
+            preference_score=rec_data['preference_score'],
+            variety_score=rec_data['variety_score'],
+            suggested_quantity=rec_data['suggested_quantity'],
+            reason=rec_data['reason'],
+            position=i + 1
+        )
+        for i, rec_data in enumerate(recommendations_data)
+    ]
+    return session, recommendations
+
+
+def detach_recommendation_session(session, recommendations):
+    """
+    Copias de la sesión y sus recomendaciones para guardarlas: el guardado
+    asigna PKs y la sesión a las copias, no a los objetos que la vista
+    sigue serializando.
+    """
+    session_copy = copy.copy(session)
+    recommendation_copies = [copy.copy(recommendation) for recommendation in recommendations]
+    for recommendation in recommendation_copies:
+        recommendation.session = session_copy
+    return session_copy, recommendation_copies
+
+
+def save_recommendation_sessions(entries, fetch_recommendation_ids=False):
+    """
+    Guardar un lote de sesiones [(session, recommendations), ...] con un
+    bulk_create para las sesiones y otro para todas sus recomendaciones.
+    """
+    if not entries:
+        return entries
+    
+    sessions = [session for session, _ in entries]
+    with transaction.atomic():
+        RecommendationSession.objects.bulk_create(sessions)
+        
+        # MySQL no devuelve las PKs en bulk_create: recuperarlas por session_key
+        if sessions[0].pk is None:
+            ids_by_key = dict(RecommendationSession.objects.filter(
+                session_key__in=[session.session_key for session in sessions]
+            ).values_list('session_key', 'id'))
+            for session in sessions:
+                session.pk = ids_by_key.get(session.session_key)
+        
+        all_recommendations = []
+        for session, recommendations in entries:
+            for recommendation in recommendations:
+                recommendation.session = session
+            all_recommendations.extend(recommendations)
+        Recommendation.objects.bulk_create(all_recommendations)
+        
+        if fetch_recommendation_ids and all_recommendations and all_recommendations[0].pk is None:
+            ids_by_position = {
+                (session_id, position): rec_id
+                for session_id, position, rec_id in Recommendation.objects.filter(
+                    session__in=sessions
+                ).values_list('session_id', 'position', 'id')
+            }
+            for recommendation in all_recommendations:
+                recommendation.pk = ids_by_position.get(
+                    (recommendation.session_id, recommendation.position)
+                )
+    
+    return entries
+
+
+def save_recommendation_session(session, recommendations):
+    """Guardar una sesión y todas sus recomendaciones, con sus PKs disponibles"""
+    save_recommendation_sessions([(session, recommendations)], fetch_recommendation_ids=True)
+    return session, recommendations
@@ -0,0 +1,188 @@
+# recommendations/retrieval.py
+import random
+import time
+from datetime import timedelta
+from django.core.cache import cache
+from django.db.models import Count, Max, Min
+from django.utils import timezone
+from nutrition.catalog import get_catalog_version
+from nutrition.models import Food
+from .models import UserFoodRating, FoodConsumption, SimilarFood
+
+
+class CandidateRetriever:
+    """Etapa de recuperación: combina candidatos de varias fuentes baratas"""
+
+    # Presupuesto máximo de candidatos por fuente (en orden de prioridad)
+    DEFAULT_BUDGETS = {
+        'top_rated': 40,
+        'recent_similar': 60,
+        'goal_popular': 50,
+        'macro_fit': 60,
+        'exploration': 40,
+    }
+
+    # Fuentes que se omiten cuando el presupuesto de latencia es ajustado
+    OPTIONAL_SOURCES = ('recent_similar', 'goal_popular', 'exploration')
+
+    RECENT_DAYS = 14
+    POPULAR_DAYS = 30
+    POPULAR_CACHE_TIMEOUT = 60 * 60  # 1 hora, compartido por todo el segmento
+    POPULAR_CACHE_SIZE = 200
+
+    def __init__(self, user, base_queryset, nutritional_profile=None, budgets=None):
+        self.user = user
+        self.base_queryset = base_queryset
+        self.nutritional_profile = nutritional_profile
+        self.budgets = dict(self.DEFAULT_BUDGETS)
+        if budgets:
+            self.budgets.update(budgets)
+        self.stats = {}
+
+    def retrieve(self, current_nutrition=None, deadline=None, optional_reserve=0):
+        """
+        Ejecutar cada fuente con su presupuesto y devolver los alimentos
+        candidatos deduplicados por id, en orden de prioridad de la fuente.
+        Con `deadline`, las fuentes opcionales se omiten si queda menos de
+        `optional_reserve` del presupuesto de latencia.
+        """
+        candidate_ids = []
+        seen = set()
+        self.stats = {'skipped': []}
+
+        for source_name, budget in self.budgets.items():
+            if budget <= 0:
+                continue
+
+            if (deadline is not None and source_name in self.OPTIONAL_SOURCES
+                    and not deadline.has_fraction(optional_reserve)):
+                self.stats['skipped'].append(source_name)
+                continue
+
+            start = time.perf_counter()
+            source = getattr(self, f'_source_{source_name}')
+            source_ids = list(source(budget, current_nutrition))[:budget]
+            new_ids = []
+            for food_id in source_ids:
+                if food_id not in seen:
+                    seen.add(food_id)
+                    new_ids.append(food_id)
+            candidate_ids.extend(new_ids)
+
+            self.stats[source_name] = {
+                'budget': budget,
+                'returned': len(source_ids),
+                'new': len(new_ids),
+                'ms': round((time.perf_counter() - start) * 1000, 2),
+            }
+
+        # Una sola consulta para cargar los alimentos; el queryset base vuelve a
+        # aplicar restricciones y alergias a las fuentes que no parten de él
+        start = time.perf_counter()
+        foods_by_id = self.base_queryset.select_related('category').in_bulk(candidate_ids)
+        foods = [foods_by_id[food_id] for food_id in candidate_ids if food_id in foods_by_id]
+        self.stats['merge'] = {
+            'candidates': len(foods),
+            'ms': round((time.perf_counter() - start) * 1000, 2),
+        }
+        return foods
+
+    def _source_top_rated(self, budget, current_nutrition=None):
+        """Alimentos mejor calificados por el propio usuario"""
+        return UserFoodRating.objects.filter(
+            user=self.user, rating__gte=4
+        ).order_by('-rating', '-updated_at').values_list('food_id', flat=True)[:budget]
+
+    def _source_recent_similar(self, budget, current_nutrition=None):
+        """Alimentos similares a los consumidos recientemente"""
+        since = timezone.now().date() - timedelta(days=self.RECENT_DAYS)
+        recent = list(FoodConsumption.objects.filter(
+            daily_log__user=self.user,
+            daily_log__date__gte=since
+        ).order_by('-timestamp').values_list('food_id', 'food__category_id')[:50])
+
+        if not recent:
+            return []
+
+        recent_ids = {food_id for food_id, _ in recent}
+        category_ids = {category_id for _, category_id in recent if category_id}
+
+        # Primero la tabla de similitud precalculada, luego la misma categoría
+        similar_ids = list(SimilarFood.objects.filter(
+            food1_id__in=recent_ids
+        ).exclude(food2_id__in=recent_ids).order_by(
+            '-overall_similarity'
+        ).values_list('food2_id', flat=True)[:budget // 2])
+
+        remaining = budget - len(similar_ids)
+        if category_ids and remaining > 0:
+            similar_ids.extend(self.base_queryset.filter(
+                category_id__in=category_ids
+            ).exclude(id__in=recent_ids).order_by(
+                '-nutrient_density_score'
+            ).values_list('id', flat=True)[:remaining])
+
+        return similar_ids
+
+    def _source_goal_popular(self, budget, current_nutrition=None):
+        """Alimentos populares entre usuarios con el mismo objetivo"""
+        goal = getattr(self.user, 'goal', None) or 'none'
+        cache_key = f'retrieval:goal_popular:{goal}'
+
+        popular_ids = cache.get(cache_key)
+        if popular_ids is None:
+            since = timezone.now().date() - timedelta(days=self.POPULAR_DAYS)
+            consumptions = FoodConsumption.objects.filter(daily_log__date__gte=since)
+            if goal != 'none':
+                consumptions = consumptions.filter(daily_log__user__goal=goal)
+            popular_ids = list(consumptions.values('food_id').annotate(
+                times=Count('id')
+            ).order_by('-times').values_list('food_id', flat=True)[:self.POPULAR_CACHE_SIZE])
+            cache.set(cache_key, popular_ids, self.POPULAR_CACHE_TIMEOUT)
+
+        return popular_ids[:budget]
+
+    def _source_macro_fit(self, budget, current_nutrition=None):
+        """Alimentos que encajan en el presupuesto de macros restante"""
+        profile = self.nutritional_profile
+        if not profile:
+            return []
+
+        current_nutrition = current_nutrition or {}
+        remaining_calories = max(0, profile.target_calories - current_nutrition.get('calories', 0))
+        remaining_protein = max(0, profile.target_protein - current_nutrition.get('protein', 0))
+
+        # Aproximadamente una comida del presupuesto restante
+        meal_calories = max(150, remaining_calories * 0.4)
+        foods = self.base_queryset.filter(calories__lte=meal_calories, calories__gt=0)
+
+        if remaining_protein > 20:
+            foods = foods.order_by('-protein_density')
+        else:
+            foods = foods.order_by('-nutrient_density_score')
+
+        return foods.values_list('id', flat=True)[:budget]
+
+    def _source_exploration(self, budget, current_nutrition=None):
+        """Exploración aleatoria sin ORDER BY RAND() sobre todo el catálogo"""
+        # La clave incluye la versión del catálogo: cambia al crear o borrar alimentos
+        cache_key = f'retrieval:food_id_range:{get_catalog_version()}'
+        id_range = cache.get(cache_key)
+        if id_range is None:
+            id_range = Food.objects.aggregate(min_id=Min('id'), max_id=Max('id'))
+            cache.set(cache_key, id_range, self.POPULAR_CACHE_TIMEOUT)
+
+        if id_range['min_id'] is None:
+            return []
+
+        # Varios bloques cortos desde pivotes aleatorios (rango sobre la PK)
+        pivots = 4
+        per_pivot = max(1, budget // pivots)
+        exploration_ids = []
+        for _ in range(pivots):
+            pivot = random.randint(id_range['min_id'], id_range['max_id'])
+            exploration_ids.extend(self.base_queryset.filter(
+                id__gte=pivot
+            ).order_by('id').values_list('id', flat=True)[:per_pivot])
+
+        return exploration_ids
@@ -0,0 +1,174 @@
+# recommendations/rollups.py
+from collections import defaultdict
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+from .models import DailyNutritionLog, FoodConsumption, NutritionRollup, MealTypeRollup
+from .daily_totals import NUTRIENTS, TOTAL_FIELDS, touch_log_stamp
+
+MEAL_NUTRIENTS = ('calories', 'protein', 'carbs', 'fat')
+ON_TARGET_ADHERENCE = 80
+# Umbral para considerar que un día tiene consumo (evita ruido de coma flotante)
+LOGGED_EPSILON = 0.001
+# Usuarios por transacción al reconstruir (acota el tiempo que se mantienen los bloqueos)
+USER_BATCH_SIZE = 200
+
+
+def period_starts(date):
+    """Inicio de la semana (lunes) y del mes que contienen `date`"""
+    return (
+        ('week', date - timedelta(days=date.weekday())),
+        ('month', date.replace(day=1)),
+    )
+
+
+def meal_type_deltas(consumptions):
+    """Nutrientes y número de alimentos por tipo de comida para un conjunto de consumos"""
+    deltas = defaultdict(lambda: dict.fromkeys((*MEAL_NUTRIENTS, 'items'), 0))
+    for consumption in consumptions:
+        meal = deltas[consumption.meal_type]
+        meal['calories'] += consumption.calories_consumed
+        meal['protein'] += consumption.protein_consumed
+        meal['carbs'] += consumption.carbs_consumed
+        meal['fat'] += consumption.fat_consumed
+        meal['items'] += 1
+    return dict(deltas)
+
+
+def _is_logged(calories):
+    return calories is not None and calories > LOGGED_EPSILON
+
+
+def _is_on_target(logged, adherence_score):
+    return logged and adherence_score is not None and adherence_score >= ON_TARGET_ADHERENCE
+
+
+def _upsert_increment(model, lookup, increments):
+    """Crear la fila si falta (INSERT IGNORE / ON CONFLICT) y sumar con F()"""
+    model.objects.bulk_create([model(**lookup)], ignore_conflicts=True)
+    model.objects.filter(**lookup).update(
+        updated_at=timezone.now(),
+        **{field: F(field) + value for field, value in increments.items() if value}
+    )
+
+
+def apply_day_change(user_id, date, deltas, before, after, meal_deltas=None):
+    """
+    Trasladar a los acumulados semanal y mensual el cambio de un día.
+
+    `deltas` son los nutrientes sumados al día; `before` y `after` los
+    valores consumed_calories/adherence_score del día antes y después del
+    cambio. Llamar dentro de la misma transacción que actualiza el día.
+    """
+    logged_before = _is_logged(before['consumed_calories'])
+    logged_after = _is_logged(after['consumed_calories'])
+    adherence_before = (before['adherence_score'] or 0) if logged_before else 0
+    adherence_after = (after['adherence_score'] or 0) if logged_after else 0
+
+    increments = {f'consumed_{nutrient}': deltas.get(nutrient, 0) for nutrient in NUTRIENTS}
+    increments['days_logged'] = int(logged_after) - int(logged_before)
+    increments['adherence_sum'] = adherence_after - adherence_before
+    increments['days_on_target'] = (
+        int(_is_on_target(logged_after, after['adherence_score']))
+        - int(_is_on_target(logged_before, before['adherence_score']))
+    )
+
+    for period_type, period_start in period_starts(date):
+        lookup = {'user_id': user_id, 'period_type': period_type, 'period_start': period_start}
+        _upsert_increment(NutritionRollup, lookup, increments)
+
+        for meal_type, meal in (meal_deltas or {}).items():
+            _upsert_increment(MealTypeRollup, dict(lookup, meal_type=meal_type), {
+                **{nutrient: meal[nutrient] for nutrient in MEAL_NUTRIENTS},
+                'items_count': meal['items'],
+            })
+
+
+def rebuild_rollups(user_ids, batch_size=USER_BATCH_SIZE):
+    """
+    Reconstruir por completo los acumulados de `user_ids` con consultas
+    agrupadas por periodo (backfill y tras reconciliar los logs diarios).
+
+    Cada lote de usuarios se lee y se reemplaza en una sola transacción que
+    antes bloquea sus logs diarios y acumulados (select_for_update, en el
+    mismo orden que apply_day_change): un registro concurrente espera a que
+    termine y suma su incremento sobre los acumulados nuevos, en vez de
+    perderse entre la lectura y el borrado.
+    """
+    user_ids = sorted(set(user_ids))
+    rollup_count = meal_rollup_count = 0
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        with transaction.atomic():
+            _lock_user_rollups(batch)
+            rollups, meal_rollups = _aggregate_rollups(batch)
+            NutritionRollup.objects.filter(user_id__in=batch).delete()
+            MealTypeRollup.objects.filter(user_id__in=batch).delete()
+            NutritionRollup.objects.bulk_create(rollups, batch_size=1000)
+            MealTypeRollup.objects.bulk_create(meal_rollups, batch_size=1000)
+
+        for user_id in batch:
+            touch_log_stamp(user_id)
+        rollup_count += len(rollups)
+        meal_rollup_count += len(meal_rollups)
+    return rollup_count, meal_rollup_count
+
+
+def _lock_user_rollups(user_ids):
+    """Bloquear logs diarios y acumulados de los usuarios (locking reads, sólo IDs)"""
+    for model in (DailyNutritionLog, NutritionRollup, MealTypeRollup):
+        list(model.objects.select_for_update().filter(
+            user_id__in=user_ids
+        ).order_by('id').values_list('id', flat=True))
+
+
+def _aggregate_rollups(user_ids):
+    """Acumulados semanales y mensuales de los usuarios calculados desde los logs"""
+    logged = Q(consumed_calories__gt=LOGGED_EPSILON)
+    rollups = []
+    meal_rollups = []
+    for period_type, trunc in (('week', TruncWeek), ('month', TruncMonth)):
+        rows = DailyNutritionLog.objects.filter(user_id__in=user_ids).annotate(
+            period_start=trunc('date')
+        ).values('user_id', 'period_start').annotate(
+            **{f'consumed_{nutrient}': Sum(f'consumed_{nutrient}') for nutrient in NUTRIENTS},
+            days_logged=Count('id', filter=logged),
+            adherence_sum=Sum('adherence_score', filter=logged),
+            days_on_target=Count('id', filter=logged & Q(adherence_score__gte=ON_TARGET_ADHERENCE)),
+        ).order_by()
+        for row in rows:
+            rollups.append(NutritionRollup(
+                user_id=row['user_id'],
+                period_type=period_type,
+                period_start=row['period_start'],
+                **{field: row[field] or 0 for field in TOTAL_FIELDS},
+                days_logged=row['days_logged'],
+                adherence_sum=row['adherence_sum'] or 0,
+                days_on_target=row['days_on_target'],
+            ))
+
+        meal_rows = FoodConsumption.objects.filter(daily_log__user_id__in=user_ids).annotate(
+            period_start=trunc('daily_log__date')
+        ).values('daily_log__user_id', 'period_start', 'meal_type').annotate(
+            calories=Sum('calories_consumed'),
+            protein=Sum('protein_consumed'),
+            carbs=Sum('carbs_consumed'),
+            fat=Sum('fat_consumed'),
+            items_count=Count('id'),
+        ).order_by()
+        for row in meal_rows:
+            meal_rollups.append(MealTypeRollup(
+                user_id=row['daily_log__user_id'],
+                period_type=period_type,
+                period_start=row['period_start'],
+                meal_type=row['meal_type'],
+                calories=row['calories'] or 0,
+                protein=row['protein'] or 0,
+                carbs=row['carbs'] or 0,
+                fat=row['fat'] or 0,
+                items_count=row['items_count'],
+            ))
+
+    return rollups, meal_rollups
@@ -83,6 +83,13 @@ class RecommendationSerializer(serializers.ModelSerializer):
             'nutrition_for_quantity'
         ]
     
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if instance.pk is None:
+            # Sin guardar (registro diferido): se identifica por session_key + position
+            data.pop('id')
+        return data
+    
     def get_nutrition_for_quantity(self, obj):
         """Calcular nutrición para la cantidad sugerida"""
         factor = obj.suggested_quantity / obj.food.serving_size
@@ -95,14 +102,28 @@ class RecommendationSerializer(serializers.ModelSerializer):
         }
 
 class RecommendationSessionSerializer(serializers.ModelSerializer):
-    recommendations = RecommendationSerializer(many=True, read_only=True)
+    recommendations = serializers.SerializerMethodField()
     
     class Meta:
         model = RecommendationSession
         fields = [
-            'id', 'session_type', 'current_nutrition', 'user_preferences',
+            'id', 'session_key', 'session_type', 'current_nutrition', 'user_preferences',
             'created_at', 'recommendations'
         ]
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if instance.pk is None:
+            # Sesión aún sin guardar (registro diferido): su identificador es session_key
+            data.pop('id')
+        return data
+    
+    def get_recommendations(self, obj):
+        """Usar las recomendaciones ya puntuadas en memoria si vienen en el contexto"""
+        recommendations = self.context.get('recommendations')
+        if recommendations is None:
+            recommendations = obj.recommendations.select_related('food__category')
+        return RecommendationSerializer(recommendations, many=True).data
 
 class UserFoodPreferenceSerializer(serializers.ModelSerializer):
     food_name = serializers.CharField(source='food.name_es', read_only=True)
@@ -0,0 +1,172 @@
+# recommendations/session_log.py
+import atexit
+import logging
+import queue
+import threading
+from django.conf import settings
+from django.db import close_old_connections
+from .persistence import (
+    detach_recommendation_session, save_recommendation_sessions, save_recommendation_session,
+)
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class RecommendationLogWriter:
+    """
+    Registro diferido (write-behind) de sesiones de recomendación.
+
+    Las sesiones se encolan en una cola acotada y un hilo en segundo plano
+    las guarda por lotes. Con RECOMMENDATION_LOG_MODE = 'sync' (tests) se
+    guardan en la misma petición. Un lote que falla se reintenta una vez; si
+    vuelve a fallar se descarta y se suma a `dropped`.
+    """
+
+    def __init__(self, max_queue_size=None, batch_size=None, flush_interval=None):
+        self.max_queue_size = max_queue_size or getattr(settings, 'RECOMMENDATION_LOG_QUEUE_SIZE', 1000)
+        self.batch_size = batch_size or getattr(settings, 'RECOMMENDATION_LOG_BATCH_SIZE', 100)
+        self.flush_interval = flush_interval or getattr(settings, 'RECOMMENDATION_LOG_FLUSH_INTERVAL', 1.0)
+        self.queue = queue.Queue(maxsize=self.max_queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    @property
+    def is_sync(self):
+        return getattr(settings, 'RECOMMENDATION_LOG_MODE', 'async') == 'sync'
+
+    def submit(self, session, recommendations):
+        """
+        Encolar una copia de la sesión y devolver su session_key, el
+        identificador estable para la respuesta. Los objetos recibidos no se
+        modifican (sin PKs): el hilo de escritura trabaja sobre la copia.
+        """
+        session, recommendations = detach_recommendation_session(session, recommendations)
+        if self.is_sync:
+            save_recommendation_session(session, recommendations)
+            return session.session_key
+
+        self._ensure_started()
+        try:
+            self.queue.put_nowait((session, recommendations))
+        except queue.Full:
+            # Contrapresión: nunca perder el registro, escribirlo en línea
+            logger.warning('Cola de registro de recomendaciones llena; escritura síncrona')
+            save_recommendation_sessions([(session, recommendations)])
+        return session.session_key
+
+    def flush(self):
+        """Esperar a que todo lo encolado esté guardado"""
+        if self._thread is not None and self._thread.is_alive():
+            self.queue.join()
+        else:
+            self._drain()
+
+    def shutdown(self, timeout=5.0):
+        """Detener el hilo guardando lo pendiente (registrado con atexit)"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+
+        if thread is not None and thread.is_alive():
+            try:
+                self.queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                # Cola llena y escritor atascado: no bloquear atexit
+                logger.warning('Cola de registro de recomendaciones llena al cerrar; vaciado desde este hilo')
+            else:
+                thread.join(timeout)
+
+        # Si el hilo no terminó a tiempo, guardar el resto desde este hilo
+        self._drain()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='recommendation-log-writer', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                first = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            batch = []
+            stop = first is _STOP
+            if not stop:
+                batch.append(first)
+            while not stop and len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                else:
+                    batch.append(item)
+
+            self._write(batch)
+            for _ in range(len(batch) + (1 if stop else 0)):
+                self.queue.task_done()
+
+            if stop:
+                self._drain()
+                return
+
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                batch.append(item)
+            self.queue.task_done()
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+        self._write(batch)
+
+    def _write(self, batch):
+        if not batch:
+            return
+        for attempt in range(2):
+            close_old_connections()
+            try:
+                save_recommendation_sessions(batch)
+                return
+            except Exception:
+                if attempt == 0:
+                    logger.warning('Error guardando %s sesiones de recomendación; reintentando', len(batch))
+                    self._reset_pks(batch)
+                    continue
+                with self._lock:
+                    self.dropped += len(batch)
+                    dropped = self.dropped
+                logger.exception(
+                    'Descartadas %s sesiones de recomendación tras reintentar (%s en total)',
+                    len(batch), dropped
+                )
+            finally:
+                close_old_connections()
+
+    @staticmethod
+    def _reset_pks(batch):
+        """La transacción fallida se deshizo: olvidar las PKs asignadas antes de reintentar"""
+        for session, recommendations in batch:
+            session.pk = None
+            for recommendation in recommendations:
+                recommendation.pk = None
+
+
+recommendation_log = RecommendationLogWriter()
+atexit.register(recommendation_log.shutdown)
@@ -0,0 +1,63 @@
+# recommendations/signals.py
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from users.models import UserAllergy, UserPreference
+from .context import USER_FIELDS, ensure_nutritional_profile, invalidate_nutrition_context
+from .models import NutritionalProfile
+
+User = get_user_model()
+
+# Campos del usuario que usan el perfil nutricional y el contexto cacheado
+PROFILE_TRIGGER_FIELDS = ('profile_completed', 'daily_calories', 'daily_protein', 'daily_carbs', 'daily_fat')
+TRACKED_USER_FIELDS = ('profile_completed', *USER_FIELDS)
+
+_DEFERRED = object()
+
+
+def _tracked_values(user):
+    # __dict__ en vez de getattr: no cargar campos diferidos
+    return {field: user.__dict__.get(field, _DEFERRED) for field in TRACKED_USER_FIELDS}
+
+
+@receiver(post_init, sender=User)
+def user_loaded(sender, instance, **kwargs):
+    """Recordar los valores cargados para detectar qué cambia al guardar"""
+    instance._nutrition_values = _tracked_values(instance)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Crear el perfil nutricional al completar el perfil del usuario y
+    actualizar sus objetivos cuando cambian las necesidades daily_*. Los
+    guardados que no tocan campos nutricionales (login, cambio de
+    contraseña...) no hacen nada.
+    """
+    previous = getattr(instance, '_nutrition_values', {})
+    current = _tracked_values(instance)
+    instance._nutrition_values = current
+
+    if created:
+        changed = set(TRACKED_USER_FIELDS)
+    else:
+        changed = {field for field in TRACKED_USER_FIELDS if current[field] != previous.get(field, _DEFERRED)}
+        if update_fields is not None:
+            changed &= set(update_fields)
+    if not changed:
+        return
+
+    invalidate_nutrition_context(instance.pk)
+    if instance.profile_completed and changed & set(PROFILE_TRIGGER_FIELDS):
+        # Los objetivos del perfil tienen prioridad: copiar las necesidades recalculadas
+        ensure_nutritional_profile(instance, update_targets=True)
+
+
+@receiver(post_save, sender=NutritionalProfile)
+@receiver(post_delete, sender=NutritionalProfile)
+@receiver(post_save, sender=UserPreference)
+@receiver(post_delete, sender=UserPreference)
+@receiver(post_save, sender=UserAllergy)
+@receiver(post_delete, sender=UserAllergy)
+def nutrition_context_changed(sender, instance, **kwargs):
+    invalidate_nutrition_context(instance.user_id)
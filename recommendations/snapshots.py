@@ -0,0 +1,79 @@
+# recommendations/snapshots.py
+from django.core.cache import cache
+from django.utils import timezone
+from .context import UserNutritionContext
+from .daily_totals import get_log_stamp
+from .models import DailyNutritionLog, FoodConsumption
+
+DASHBOARD_CACHE_TIMEOUT = 60 * 60 * 24  # la clave incluye fecha y marca de logs
+RECENT_FOODS_LIMIT = 5
+MACROS = ('calories', 'protein', 'carbs', 'fat')
+
+
+def _snapshot_key(user_id, date, stamp, targets):
+    # Los objetivos forman parte de la clave: editar el perfil no toca los logs
+    target_values = ':'.join(str(targets[macro]) for macro in MACROS)
+    return f'dashboard_snapshot:{user_id}:{date.isoformat()}:{stamp}:{target_values}'
+
+
+def get_dashboard_snapshot(user):
+    """
+    Totales de hoy, objetivos, porcentajes y comidas recientes del usuario.
+
+    Se cachea bajo la marca de última actualización de logs: cada registro
+    de consumo (increment_daily_totals) la renueva al confirmar, así que un
+    acierto no consulta la base de datos y un fallo cuesta dos consultas.
+    """
+    today = timezone.now().date()
+    targets = UserNutritionContext.for_user(user).targets
+    cache_key = _snapshot_key(user.pk, today, get_log_stamp(user.pk), targets)
+
+    snapshot = cache.get(cache_key)
+    if snapshot is None:
+        snapshot = build_dashboard_snapshot(user.pk, today, targets)
+        cache.set(cache_key, snapshot, DASHBOARD_CACHE_TIMEOUT)
+    return snapshot
+
+
+def build_dashboard_snapshot(user_id, date, targets):
+    """Construir el snapshot del día con una consulta del log y otra de comidas recientes"""
+    today_nutrition = dict.fromkeys(MACROS, 0)
+    today_nutrition['adherence_score'] = None
+
+    daily_log = DailyNutritionLog.objects.filter(user_id=user_id, date=date).values(
+        'consumed_calories', 'consumed_protein', 'consumed_carbs', 'consumed_fat', 'adherence_score'
+    ).first()
+
+    recent_foods = []
+    if daily_log:
+        today_nutrition = {macro: daily_log[f'consumed_{macro}'] or 0 for macro in MACROS}
+        today_nutrition['adherence_score'] = daily_log['adherence_score']
+
+        meal_labels = dict(FoodConsumption._meta.get_field('meal_type').choices)
+        recent_foods = [
+            {
+                'food': {'name': row['food__name'], 'name_es': row['food__name_es']},
+                'quantity': row['quantity'],
+                'meal_type': row['meal_type'],
+                'meal_type_display': meal_labels.get(row['meal_type'], row['meal_type']),
+                'calories_consumed': row['calories_consumed'],
+            }
+            for row in FoodConsumption.objects.filter(
+                daily_log__user_id=user_id, daily_log__date=date
+            ).order_by('-timestamp').values(
+                'food__name', 'food__name_es', 'quantity', 'meal_type', 'calories_consumed'
+            )[:RECENT_FOODS_LIMIT]
+        ]
+
+    # Porcentaje del objetivo, limitado a 100%
+    percentages = {
+        macro: min(100, round(today_nutrition[macro] / targets[macro] * 100, 1)) if targets[macro] > 0 else 0
+        for macro in MACROS
+    }
+
+    return {
+        'today_nutrition': today_nutrition,
+        'nutrition_targets': dict(targets),
+        'percentages': percentages,
+        'recent_foods': recent_foods,
+    }
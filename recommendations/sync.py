@@ -0,0 +1,181 @@
+# recommendations/sync.py
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from nutrition.models import Food
+from .models import FoodConsumption
+from .daily_totals import consumption_deltas, get_or_create_daily_log_id, increment_daily_totals
+from .rollups import meal_type_deltas
+
+User = get_user_model()
+
+MAX_CLIENT_EVENT_ID_LENGTH = 64
+# Tolerancia para relojes de dispositivo adelantados
+FUTURE_TOLERANCE = timedelta(hours=1)
+
+
+class ConsumptionSync:
+    """
+    Sincronización idempotente de eventos de consumo registrados offline.
+
+    Los eventos se procesan en lotes de tamaño fijo (la memoria no crece con
+    el tamaño de la subida), se agrupan por día y cada día se aplica en su
+    propia transacción: bloqueo del usuario, descarte de claves ya
+    registradas (en cualquier día del usuario), bulk_create de los nuevos
+    consumos y un único incremento de totales. Un reintento con las mismas
+    claves devuelve 'duplicate' aunque su consumed_at caiga en otro día.
+    """
+
+    def __init__(self, user, targets, engine=None, chunk_size=None):
+        self.user = user
+        self.targets = targets
+        self.engine = engine
+        self.chunk_size = chunk_size or settings.CONSUMPTION_SYNC_CHUNK_SIZE
+        self.meal_types = {
+            choice for choice, _ in FoodConsumption._meta.get_field('meal_type').choices
+        }
+
+    def sync(self, events):
+        """Procesar `events` y devolver un resultado por evento, en el mismo orden"""
+        results = []
+        seen_event_ids = set()
+
+        for start in range(0, len(events), self.chunk_size):
+            chunk = events[start:start + self.chunk_size]
+            chunk_results = [None] * len(chunk)
+            pending = []
+
+            for index, event in enumerate(chunk):
+                parsed, error = self._parse_event(event)
+                if error:
+                    chunk_results[index] = {'status': 'error', 'error': error}
+                elif parsed['client_event_id'] in seen_event_ids:
+                    chunk_results[index] = {'status': 'duplicate'}
+                else:
+                    seen_event_ids.add(parsed['client_event_id'])
+                    pending.append((index, parsed))
+
+            self._apply_chunk(pending, chunk_results)
+
+            for index, result in enumerate(chunk_results):
+                result['index'] = start + index
+                result['client_event_id'] = self._event_id_of(chunk[index])
+                results.append(result)
+
+        return results
+
+    def _event_id_of(self, event):
+        return event.get('client_event_id') if isinstance(event, dict) else None
+
+    def _parse_event(self, event):
+        """Validar un evento; devuelve (datos, None) o (None, mensaje de error)"""
+        if not isinstance(event, dict):
+            return None, 'Evento inválido'
+
+        client_event_id = event.get('client_event_id')
+        if not isinstance(client_event_id, str) or not client_event_id.strip():
+            return None, 'client_event_id requerido'
+        if len(client_event_id) > MAX_CLIENT_EVENT_ID_LENGTH:
+            return None, f'client_event_id excede {MAX_CLIENT_EVENT_ID_LENGTH} caracteres'
+
+        try:
+            food_id = int(event['food_id'])
+            quantity = float(event['quantity'])
+        except (KeyError, TypeError, ValueError):
+            return None, 'food_id y quantity son requeridos'
+        if quantity <= 0:
+            return None, 'La cantidad debe ser mayor que 0'
+
+        meal_type = event.get('meal_type')
+        if meal_type not in self.meal_types:
+            return None, 'Tipo de comida inválido'
+
+        try:
+            consumed_at = parse_datetime(event.get('consumed_at') or '')
+        except (TypeError, ValueError):
+            consumed_at = None
+        if consumed_at is None:
+            return None, 'consumed_at debe ser una fecha ISO 8601'
+        if timezone.is_naive(consumed_at):
+            consumed_at = timezone.make_aware(consumed_at)
+        if consumed_at > timezone.now() + FUTURE_TOLERANCE:
+            return None, 'consumed_at está en el futuro'
+
+        return {
+            'client_event_id': client_event_id,
+            'food_id': food_id,
+            'quantity': quantity,
+            'meal_type': meal_type,
+            'consumed_at': consumed_at,
+        }, None
+
+    def _apply_chunk(self, pending, chunk_results):
+        """Aplicar los eventos válidos de un lote agrupados por día"""
+        if not pending:
+            return
+
+        foods = Food.objects.in_bulk({parsed['food_id'] for _, parsed in pending})
+
+        events_by_day = defaultdict(list)
+        for index, parsed in pending:
+            if parsed['food_id'] not in foods:
+                chunk_results[index] = {'status': 'error', 'error': 'Alimento no encontrado'}
+                continue
+            events_by_day[timezone.localdate(parsed['consumed_at'])].append((index, parsed))
+
+        created = []
+        for date, day_events in sorted(events_by_day.items()):
+            created.extend(self._apply_day(date, day_events, foods, chunk_results))
+
+        if self.engine is not None and created:
+            self.engine.learn_from_consumptions(created)
+
+    def _apply_day(self, date, day_events, foods, chunk_results):
+        """Insertar los eventos nuevos de un día y sumar sus totales en una transacción"""
+        # Upsert fuera de la transacción (ver get_or_create_daily_log_id)
+        daily_log_id = get_or_create_daily_log_id(self.user.id, date)
+
+        with transaction.atomic():
+            # Las claves son únicas por usuario: el bloqueo serializa sus
+            # sincronizaciones simultáneas (aunque sean de días distintos), así la
+            # comprobación de claves y el incremento no pueden duplicarse
+            User.objects.select_for_update().filter(pk=self.user.id).values_list('id').get()
+
+            existing_ids = set(FoodConsumption.objects.filter(
+                user_id=self.user.id,
+                client_event_id__in=[parsed['client_event_id'] for _, parsed in day_events]
+            ).values_list('client_event_id', flat=True))
+
+            consumptions = []
+            for index, parsed in day_events:
+                if parsed['client_event_id'] in existing_ids:
+                    chunk_results[index] = {'status': 'duplicate'}
+                    continue
+
+                food = foods[parsed['food_id']]
+                consumption = FoodConsumption(
+                    daily_log_id=daily_log_id,
+                    user_id=self.user.id,
+                    food=food,
+                    quantity=parsed['quantity'],
+                    meal_type=parsed['meal_type'],
+                    consumed_at=parsed['consumed_at'],
+                    client_event_id=parsed['client_event_id']
+                )
+                consumption.calculate_nutrients()
+                consumptions.append(consumption)
+
+                chunk_results[index] = {'status': 'created', 'date': date.isoformat()}
+
+            if consumptions:
+                FoodConsumption.objects.bulk_create(consumptions)
+                increment_daily_totals(
+                    daily_log_id, consumption_deltas(consumptions), self.targets,
+                    meal_deltas=meal_type_deltas(consumptions)
+                )
+
+        return consumptions
@@ -1,3 +1,134 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.utils import timezone
+from .context import UserNutritionContext
+from .daily_totals import get_or_create_daily_log_id, increment_daily_totals
+from .models import DailyNutritionLog, FoodConsumption, NutritionalProfile, NutritionRollup
+from .rollups import rebuild_rollups
+from .sync import ConsumptionSync
+from nutrition.models import Food
 
-# Create your tests here.
+User = get_user_model()
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class DailyTotalsConcurrencyTests(TransactionTestCase):
+    """Registros simultáneos (móvil + web) no deben perder incrementos"""
+
+    WORKERS = 8
+    LOGS = 40
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='concurrent', password='test-pass-123')
+        self.targets = {'calories': 2000, 'protein': 150, 'carbs': 250, 'fat': 65}
+        self.date = timezone.now().date()
+
+    def _log_once(self, _):
+        try:
+            daily_log_id = get_or_create_daily_log_id(self.user.id, self.date)
+            with transaction.atomic():
+                increment_daily_totals(daily_log_id, {
+                    'calories': 100, 'protein': 5, 'carbs': 10,
+                    'fat': 2, 'fiber': 1, 'sodium': 50,
+                }, self.targets)
+        finally:
+            connection.close()
+
+    def test_parallel_logs_keep_exact_totals(self):
+        with ThreadPoolExecutor(max_workers=self.WORKERS) as executor:
+            list(executor.map(self._log_once, range(self.LOGS)))
+
+        daily_logs = DailyNutritionLog.objects.filter(user=self.user, date=self.date)
+        self.assertEqual(daily_logs.count(), 1)
+
+        daily_log = daily_logs.get()
+        self.assertAlmostEqual(daily_log.consumed_calories, 100 * self.LOGS)
+        self.assertAlmostEqual(daily_log.consumed_protein, 5 * self.LOGS)
+        self.assertAlmostEqual(daily_log.consumed_carbs, 10 * self.LOGS)
+        self.assertAlmostEqual(daily_log.consumed_fat, 2 * self.LOGS)
+        self.assertAlmostEqual(daily_log.consumed_fiber, 1 * self.LOGS)
+        self.assertAlmostEqual(daily_log.consumed_sodium, 50 * self.LOGS)
+        self.assertEqual(daily_log.adherence_score, DailyNutritionLog.compute_adherence_score(
+            daily_log.consumed_calories, daily_log.consumed_protein,
+            self.targets['calories'], self.targets['protein']
+        ))
+
+        # Los acumulados incrementales cuentan el día una sola vez
+        rollups = NutritionRollup.objects.filter(user=self.user)
+        self.assertEqual(rollups.count(), 2)
+        for rollup in rollups:
+            self.assertEqual(rollup.days_logged, 1)
+            self.assertAlmostEqual(rollup.consumed_calories, 100 * self.LOGS)
+            self.assertAlmostEqual(rollup.adherence_sum, daily_log.adherence_score)
+
+        # y coinciden con una reconstrucción completa
+        incremental = sorted(rollups.values_list('period_type', 'consumed_calories', 'days_logged'))
+        rebuild_rollups([self.user.id])
+        rebuilt = sorted(rollups.values_list('period_type', 'consumed_calories', 'days_logged'))
+        self.assertEqual(incremental, rebuilt)
+
+
+class NutritionalProfileSyncTests(TestCase):
+    """Los objetivos del perfil siguen a las necesidades daily_* del usuario"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='targets', password='test-pass-123', profile_completed=True,
+            daily_calories=2000, daily_protein=120, daily_carbs=220, daily_fat=60,
+        )
+
+    def _targets(self):
+        return UserNutritionContext.for_user(User.objects.get(pk=self.user.pk)).targets
+
+    def test_profile_created_with_user_targets(self):
+        self.assertEqual(NutritionalProfile.objects.get(user=self.user).target_calories, 2000)
+        self.assertEqual(self._targets()['calories'], 2000)
+
+    def test_changed_daily_targets_update_profile(self):
+        self.assertEqual(self._targets()['calories'], 2000)
+
+        self.user.daily_calories = 1800
+        self.user.daily_protein = 140
+        self.user.save()
+
+        targets = self._targets()
+        self.assertEqual(targets['calories'], 1800)
+        self.assertEqual(targets['protein'], 140)
+
+    def test_login_save_does_not_touch_profile(self):
+        profile = NutritionalProfile.objects.get(user=self.user)
+        self.user.last_login = timezone.now()
+        self.user.save(update_fields=['last_login'])
+        self.user.set_password('other-pass-456')
+        self.user.save()
+        self.assertEqual(NutritionalProfile.objects.get(user=self.user).updated_at, profile.updated_at)
+
+
+class ConsumptionSyncIdempotencyTests(TestCase):
+    """client_event_id es único por usuario, no por día"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='sync', password='test-pass-123')
+        self.food = Food.objects.create(name='Banana', calories=89, protein=1.1, carbohydrate=23, fat=0.3)
+        self.targets = {'calories': 2000, 'protein': 150, 'carbs': 250, 'fat': 65}
+
+    def _event(self, consumed_at):
+        return {
+            'client_event_id': 'evt-1', 'food_id': self.food.id, 'quantity': 100,
+            'meal_type': 'snack', 'consumed_at': consumed_at.isoformat(),
+        }
+
+    def test_retry_on_another_day_is_duplicate(self):
+        now = timezone.now()
+        sync = ConsumptionSync(self.user, self.targets)
+        first = sync.sync([self._event(now - timedelta(days=1))])
+        retry = ConsumptionSync(self.user, self.targets).sync([self._event(now)])
+
+        self.assertEqual(first[0]['status'], 'created')
+        self.assertEqual(retry[0]['status'], 'duplicate')
+        self.assertEqual(FoodConsumption.objects.filter(daily_log__user=self.user).count(), 1)
+        total = sum(DailyNutritionLog.objects.filter(user=self.user).values_list('consumed_calories', flat=True))
+        self.assertAlmostEqual(total, 89)
@@ -0,0 +1,102 @@
+# recommendations/timeseries.py
+import numpy as np
+from datetime import date
+from .models import DailyNutritionLog
+
+SERIES_FIELDS = {
+    'calories': 'consumed_calories',
+    'protein': 'consumed_protein',
+    'carbs': 'consumed_carbs',
+    'fat': 'consumed_fat',
+    'adherence': 'adherence_score',
+}
+DOWNSAMPLE_METHODS = ('bucket', 'lttb')
+MAX_SERIES_POINTS = 2000
+
+
+def load_daily_series(user_id, start_date, end_date, series):
+    """Una consulta: ordinales de fecha y un array float por serie (None -> NaN)"""
+    rows = list(DailyNutritionLog.objects.filter(
+        user_id=user_id,
+        date__range=[start_date, end_date]
+    ).order_by('date').values_list('date', *[SERIES_FIELDS[name] for name in series]))
+
+    if not rows:
+        return np.array([], dtype=np.int64), {name: np.array([], dtype=float) for name in series}
+
+    columns = list(zip(*rows))
+    ordinals = np.fromiter((day.toordinal() for day in columns[0]), dtype=np.int64, count=len(rows))
+    values = {name: np.array(column, dtype=float) for name, column in zip(series, columns[1:])}
+    return ordinals, values
+
+
+def bucket_downsample(ordinals, values, start_date, end_date, points):
+    """
+    Promediar por intervalos de tiempo de igual duración. Devuelve
+    (ordinal de inicio de cada intervalo no vacío, media) ignorando NaN.
+    """
+    mask = ~np.isnan(values)
+    ordinals, values = ordinals[mask], values[mask]
+    if len(ordinals) <= points:
+        return ordinals, values
+
+    edges = np.linspace(start_date.toordinal(), end_date.toordinal() + 1, points + 1)
+    buckets = np.clip(np.searchsorted(edges, ordinals, side='right') - 1, 0, points - 1)
+    counts = np.bincount(buckets, minlength=points)
+    sums = np.bincount(buckets, weights=values, minlength=points)
+
+    filled = counts > 0
+    return np.floor(edges[:-1][filled]).astype(np.int64), sums[filled] / counts[filled]
+
+
+def lttb_downsample(ordinals, values, points):
+    """Largest-Triangle-Three-Buckets: conserva la forma visual de la serie (ignora NaN)"""
+    mask = ~np.isnan(values)
+    x, y = ordinals[mask], values[mask]
+    n = len(x)
+    if points >= n or points < 3:
+        return x, y
+
+    selected = np.empty(points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    bucket_size = (n - 2) / (points - 2)
+
+    previous = 0
+    for i in range(points - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+
+        # Promedio del siguiente intervalo (o el último punto al final)
+        if end < next_end:
+            avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+
+        # Área del triángulo (anterior elegido, candidato, promedio siguiente)
+        areas = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+
+    return x[selected], y[selected]
+
+
+def build_time_series(user_id, start_date, end_date, series, points, method='bucket'):
+    """Series diarias del usuario reducidas a como máximo `points` puntos cada una"""
+    ordinals, values_by_series = load_daily_series(user_id, start_date, end_date, series)
+
+    result = {}
+    for name, values in values_by_series.items():
+        if method == 'lttb':
+            x, y = lttb_downsample(ordinals, values, points)
+        else:
+            x, y = bucket_downsample(ordinals, values, start_date, end_date, points)
+        result[name] = [
+            [date.fromordinal(int(ordinal)).isoformat(), round(float(value), 1)]
+            for ordinal, value in zip(x, y)
+        ]
+
+    return {'days_logged': len(ordinals), 'series': result}
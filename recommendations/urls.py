@@ -11,12 +11,17 @@ urlpatterns = [
     
     # Registro de consumo y calificaciones
     path('log-consumption/', views.log_food_consumption, name='log-consumption'),
+    path('log-meal/', views.log_meal, name='log-meal'),
+    path('sync-consumptions/', views.sync_consumptions, name='sync-consumptions'),
     path('rate-food/', views.rate_food, name='rate-food'),
     path('ratings/', views.UserFoodRatingListView.as_view(), name='food-ratings'),
     
     # Análisis y seguimiento
     path('daily-summary/', views.daily_nutrition_summary, name='daily-summary'),
     path('insights/', views.user_nutrition_insights, name='nutrition-insights'),
+    path('rollups/', views.nutrition_rollups, name='nutrition-rollups'),
+    path('time-series/', views.nutrition_time_series, name='nutrition-time-series'),
+    path('export/', views.export_nutrition_history, name='export-history'),
     
     # Perfil nutricional
     path('nutritional-profile/', views.NutritionalProfileView.as_view(), name='nutritional-profile'),
@@ -1,13 +1,22 @@
 # recommendations/views.py
+import hashlib
+import tempfile
+from datetime import date, timedelta
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from django.db import transaction
+from django.core.exceptions import ValidationError
 from .models import (
     UserFoodRating, NutritionalProfile, DailyNutritionLog,
-    FoodConsumption, RecommendationSession, Recommendation
+    FoodConsumption, Recommendation,
+    NutritionRollup, MealTypeRollup
 )
 from .serializers import (
     UserFoodRatingSerializer, NutritionalProfileSerializer,
@@ -15,8 +24,24 @@ from .serializers import (
     RecommendationSessionSerializer
 )
 from .engine import RecommendationEngine
+from .persistence import build_recommendation_session
+from .session_log import recommendation_log
+from .context import UserNutritionContext, ensure_nutritional_profile
+from .daily_totals import (
+    consumption_deltas, get_log_stamp, get_or_create_daily_log_id, increment_daily_totals
+)
+from .sync import ConsumptionSync
+from .rollups import meal_type_deltas
+from .insights import MAX_WINDOW_DAYS, get_nutrition_insights
+from .export import export_queryset, iter_csv, write_parquet
+from .timeseries import SERIES_FIELDS, DOWNSAMPLE_METHODS, MAX_SERIES_POINTS, build_time_series
 from nutrition.models import Food
 
+# Límite de alimentos por petición en el registro de comidas completas
+MAX_MEAL_ITEMS = 50
+# Periodos máximos devueltos por el endpoint de acumulados
+MAX_ROLLUP_PERIODS = 120
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def get_recommendations(request):
@@ -29,44 +54,36 @@ def get_recommendations(request):
             'error': 'Perfil incompleto. Complete su información personal primero.'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    # NUEVO: Asegurar que existe perfil nutricional
-    nutritional_profile, created = NutritionalProfile.objects.get_or_create(
-        user=user,
-        defaults={
-            'target_calories': user.daily_calories or 2000,
-            'target_protein': user.daily_protein or 150,
-            'target_carbs': user.daily_carbs or 250,
-            'target_fat': user.daily_fat or 65,
-            'target_fiber': 25,
-            'max_sodium': 2300,
-            'min_calcium': 1000,
-            'min_iron': 8,
-            'min_vitamin_c': 90
-        }
-    )
+    # Perfil, preferencias y alergias en un solo contexto cacheado
+    context = UserNutritionContext.for_user(user)
+    if context.profile is None:
+        # Usuarios anteriores a la creación del perfil por señal
+        ensure_nutritional_profile(user)
+        user._nutrition_context = None
+        context = UserNutritionContext.for_user(user)
     
     # Parámetros de la solicitud
     session_type = request.data.get('session_type', 'meal_suggestion')
     meal_type = request.data.get('meal_type')  # breakfast, lunch, dinner, snack
     count = min(request.data.get('count', 10), 20)  # Máximo 20
+    time_budget_ms = request.data.get('time_budget_ms')  # Presupuesto de latencia opcional
+    preview = str(request.data.get('preview', '')).lower() in ('1', 'true')  # No persistir la sesión
     
-    # Obtener estado nutricional actual del día
+    # Obtener estado nutricional actual del día (sólo lectura)
     today = timezone.now().date()
-    daily_log, created = DailyNutritionLog.objects.get_or_create(
-        user=user, date=today
-    )
+    daily_totals = DailyNutritionLog.objects.filter(user=user, date=today).values(
+        'consumed_calories', 'consumed_protein', 'consumed_carbs',
+        'consumed_fat', 'consumed_fiber', 'consumed_sodium'
+    ).first() or {}
     
     current_nutrition = {
-        'calories': daily_log.consumed_calories,
-        'protein': daily_log.consumed_protein,
-        'carbs': daily_log.consumed_carbs,
-        'fat': daily_log.consumed_fat,
-        'fiber': daily_log.consumed_fiber,
-        'sodium': daily_log.consumed_sodium
+        nutrient: daily_totals.get(f'consumed_{nutrient}', 0)
+        for nutrient in ('calories', 'protein', 'carbs', 'fat', 'fiber', 'sodium')
     }
+    targets = context.targets
     
     # Inicializar motor de recomendaciones
-    engine = RecommendationEngine(user)
+    engine = RecommendationEngine(user, context=context)
     
     try:
         # Obtener recomendaciones
@@ -74,50 +91,41 @@ def get_recommendations(request):
             session_type=session_type,
             meal_type=meal_type,
             current_nutrition=current_nutrition,
-            count=count
+            count=count,
+            time_budget_ms=float(time_budget_ms) if time_budget_ms else None
         )
         
-        # Crear sesión de recomendación
-        session = RecommendationSession.objects.create(
-            user=user,
-            session_type=session_type,
-            current_nutrition=current_nutrition,
-            user_preferences=request.data
+        # Sólo los parámetros aplicados, no todo request.data
+        applied_preferences = {
+            key: request.data.get(key)
+            for key in ('meal_type', 'count', 'time_budget_ms')
+            if key in request.data
+        }
+        
+        # Construir sesión y recomendaciones desde los scores en memoria
+        session, recommendations = build_recommendation_session(
+            user, session_type, current_nutrition, applied_preferences, recommendations_data
         )
         
-        # Crear registros de recomendación
-        recommendations = []
-        for i, rec_data in enumerate(recommendations_data):
-            recommendation = Recommendation.objects.create(
-                session=session,
-                food=rec_data['food'],
-                total_score=rec_data['total_score'],
-                nutrition_score=rec_data['nutrition_score'],
-                preference_score=rec_data['preference_score'],
-                variety_score=rec_data['variety_score'],
-                suggested_quantity=rec_data['suggested_quantity'],
-                reason=rec_data['reason'],
-                position=i + 1
-            )
-            recommendations.append(recommendation)
+        # El registro de auditoría se guarda en segundo plano (write-behind) sobre
+        # una copia: estos objetos quedan sin PK y la sesión se identifica por session_key
+        if not preview:
+            recommendation_log.submit(session, recommendations)
         
-        # Serializar respuesta
-        session_serializer = RecommendationSessionSerializer(session)
+        # Serializar respuesta sin volver a consultar recomendaciones ni alimentos
+        session_serializer = RecommendationSessionSerializer(
+            session, context={'recommendations': recommendations}
+        )
         
         return Response({
             'session': session_serializer.data,
+            'engine_report': engine.last_run,
+            'persisted': not preview,
             'current_nutrition': current_nutrition,
-            'nutrition_targets': {
-                'calories': user.daily_calories,
-                'protein': user.daily_protein,
-                'carbs': user.daily_carbs,
-                'fat': user.daily_fat
-            },
+            'nutrition_targets': targets,
             'remaining_nutrition': {
-                'calories': max(0, user.daily_calories - daily_log.consumed_calories),
-                'protein': max(0, user.daily_protein - daily_log.consumed_protein),
-                'carbs': max(0, user.daily_carbs - daily_log.consumed_carbs),
-                'fat': max(0, user.daily_fat - daily_log.consumed_fat)
+                nutrient: max(0, target - current_nutrition[nutrient])
+                for nutrient, target in targets.items()
             }
         })
         
@@ -137,67 +145,41 @@ def log_food_consumption(request):
         quantity = float(request.data.get('quantity'))
         meal_type = request.data.get('meal_type')
         
-        food = Food.objects.get(id=food_id)
+        food = Food.objects.select_related('category').get(id=food_id)
+        context = UserNutritionContext.for_user(user)
         
-        # Obtener o crear log diario
+        # Upsert del log diario, seguro ante registros simultáneos
         today = timezone.now().date()
-        daily_log, created = DailyNutritionLog.objects.get_or_create(
-            user=user, date=today
-        )
-        
-        # NUEVO: Asegurar que existe perfil nutricional
-        nutritional_profile, profile_created = NutritionalProfile.objects.get_or_create(
-            user=user,
-            defaults={
-                'target_calories': user.daily_calories or 2000,
-                'target_protein': user.daily_protein or 150,
-                'target_carbs': user.daily_carbs or 250,
-                'target_fat': user.daily_fat or 65,
-                'target_fiber': 25,
-                'max_sodium': 2300,
-                'min_calcium': 1000,
-                'min_iron': 8,
-                'min_vitamin_c': 90
-            }
-        )
+        daily_log_id = get_or_create_daily_log_id(user.id, today)
         
         with transaction.atomic():
             # Crear registro de consumo
             consumption = FoodConsumption.objects.create(
-                daily_log=daily_log,
+                daily_log_id=daily_log_id,
                 food=food,
                 quantity=quantity,
                 meal_type=meal_type
             )
             
-            # Actualizar totales del día
-            daily_log.consumed_calories += consumption.calories_consumed
-            daily_log.consumed_protein += consumption.protein_consumed
-            daily_log.consumed_carbs += consumption.carbs_consumed
-            daily_log.consumed_fat += consumption.fat_consumed
-            
-            # Calcular fibra y sodio proporcionalmente
-            factor = quantity / food.serving_size
-            daily_log.consumed_fiber += food.fiber * factor
-            daily_log.consumed_sodium += food.sodium * factor
-            
-            # Recalcular scores
-            daily_log.adherence_score = daily_log.calculate_adherence_score()
-            daily_log.save()
-            
-            # Aprender de este consumo para futuras recomendaciones
-            engine = RecommendationEngine(user)
-            engine.learn_from_consumption(consumption)
+            # Actualizar totales del día con un UPDATE atómico
+            daily_totals = increment_daily_totals(
+                daily_log_id, consumption_deltas([consumption]), context.targets,
+                meal_deltas=meal_type_deltas([consumption])
+            )
+        
+        # Aprender de este consumo fuera de la transacción del log diario
+        engine = RecommendationEngine(user, context=context)
+        engine.learn_from_consumption(consumption)
         
         return Response({
             'message': 'Consumo registrado exitosamente',
             'consumption': FoodConsumptionSerializer(consumption).data,
             'daily_totals': {
-                'calories': round(daily_log.consumed_calories, 1),
-                'protein': round(daily_log.consumed_protein, 1),
-                'carbs': round(daily_log.consumed_carbs, 1),
-                'fat': round(daily_log.consumed_fat, 1),
-                'adherence_score': daily_log.adherence_score
+                'calories': round(daily_totals['consumed_calories'], 1),
+                'protein': round(daily_totals['consumed_protein'], 1),
+                'carbs': round(daily_totals['consumed_carbs'], 1),
+                'fat': round(daily_totals['consumed_fat'], 1),
+                'adherence_score': daily_totals['adherence_score']
             }
         })
         
@@ -208,6 +190,109 @@ def log_food_consumption(request):
     except Exception as e:
         return Response({'error': f'Error interno: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def log_meal(request):
+    """Registrar varios alimentos de una comida en una sola operación"""
+    user = request.user
+    items = request.data.get('items')
+    default_meal_type = request.data.get('meal_type')
+    
+    if not isinstance(items, list) or not items:
+        return Response({'error': 'Se requiere una lista "items" con al menos un alimento'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > MAX_MEAL_ITEMS:
+        return Response({'error': f'Máximo {MAX_MEAL_ITEMS} alimentos por comida'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    valid_meal_types = {choice for choice, _ in FoodConsumption._meta.get_field('meal_type').choices}
+    parsed_items = []
+    for index, item in enumerate(items):
+        try:
+            food_id = int(item['food_id'])
+            quantity = float(item['quantity'])
+        except (KeyError, TypeError, ValueError):
+            return Response({'error': f'Datos inválidos en el elemento {index}'}, status=status.HTTP_400_BAD_REQUEST)
+        meal_type = item.get('meal_type') or default_meal_type
+        if quantity <= 0 or meal_type not in valid_meal_types:
+            return Response({'error': f'Cantidad o tipo de comida inválido en el elemento {index}'}, status=status.HTTP_400_BAD_REQUEST)
+        parsed_items.append((food_id, quantity, meal_type))
+    
+    # Una sola consulta para todos los alimentos de la comida
+    foods = Food.objects.select_related('category').in_bulk({food_id for food_id, _, _ in parsed_items})
+    missing_ids = sorted({food_id for food_id, _, _ in parsed_items if food_id not in foods})
+    if missing_ids:
+        return Response({'error': 'Alimentos no encontrados', 'food_ids': missing_ids}, status=status.HTTP_404_NOT_FOUND)
+    
+    try:
+        context = UserNutritionContext.for_user(user)
+        today = timezone.now().date()
+        daily_log_id = get_or_create_daily_log_id(user.id, today)
+        
+        # Calcular nutrientes en memoria y acumular un único incremento del día
+        consumptions = []
+        for food_id, quantity, meal_type in parsed_items:
+            consumption = FoodConsumption(
+                daily_log_id=daily_log_id,
+                food=foods[food_id],
+                quantity=quantity,
+                meal_type=meal_type
+            )
+            consumption.calculate_nutrients()
+            consumptions.append(consumption)
+        deltas = consumption_deltas(consumptions)
+        
+        engine = RecommendationEngine(user, context=context)
+        with transaction.atomic():
+            FoodConsumption.objects.bulk_create(consumptions)
+            engine.learn_from_consumptions(consumptions)
+            # El UPDATE del log diario va al final para retener su bloqueo lo mínimo
+            daily_totals = increment_daily_totals(
+                daily_log_id, deltas, context.targets,
+                meal_deltas=meal_type_deltas(consumptions)
+            )
+        
+        return Response({
+            'message': f'{len(consumptions)} alimentos registrados exitosamente',
+            'consumptions': FoodConsumptionSerializer(consumptions, many=True).data,
+            'meal_totals': {nutrient: round(value, 1) for nutrient, value in deltas.items()},
+            'daily_totals': {
+                'calories': round(daily_totals['consumed_calories'], 1),
+                'protein': round(daily_totals['consumed_protein'], 1),
+                'carbs': round(daily_totals['consumed_carbs'], 1),
+                'fat': round(daily_totals['consumed_fat'], 1),
+                'adherence_score': daily_totals['adherence_score']
+            }
+        }, status=status.HTTP_201_CREATED)
+        
+    except Exception as e:
+        return Response({'error': f'Error interno: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def sync_consumptions(request):
+    """Sincronizar eventos de consumo registrados offline (idempotente)"""
+    events = request.data.get('events')
+    
+    if not isinstance(events, list) or not events:
+        return Response({'error': 'Se requiere una lista "events" con al menos un evento'}, status=status.HTTP_400_BAD_REQUEST)
+    max_events = settings.CONSUMPTION_SYNC_MAX_EVENTS
+    if len(events) > max_events:
+        return Response({
+            'error': f'Máximo {max_events} eventos por sincronización; divida la subida en varias peticiones'
+        }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    
+    try:
+        context = UserNutritionContext.for_user(request.user)
+        engine = RecommendationEngine(request.user, context=context)
+        results = ConsumptionSync(request.user, context.targets, engine=engine).sync(events)
+    except Exception as e:
+        return Response({'error': f'Error interno: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    summary = {'created': 0, 'duplicate': 0, 'error': 0}
+    for result in results:
+        summary[result['status']] += 1
+    
+    return Response({'summary': summary, 'results': results})
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def rate_food(request):
@@ -311,17 +396,24 @@ def recommendation_feedback(request):
         if feedback not in ['accepted', 'rejected', 'modified']:
             return Response({'error': 'Feedback inválido'}, status=status.HTTP_400_BAD_REQUEST)
         
-        recommendation = Recommendation.objects.get(
-            id=recommendation_id,
-            session__user=user
-        )
+        if recommendation_id:
+            recommendation = Recommendation.objects.get(
+                id=recommendation_id,
+                session__user=user
+            )
+        else:
+            # Sesiones registradas en diferido: identificar por session_key + posición
+            recommendation = Recommendation.objects.get(
+                session__session_key=request.data.get('session_key'),
+                position=int(request.data.get('position')),
+                session__user=user
+            )
         
         recommendation.user_feedback = feedback
         recommendation.save()
         
         # Si fue rechazado, aprender de ello
         if feedback == 'rejected':
-            engine = RecommendationEngine(user)
             # Reducir preferencia por este alimento
             from .models import UserFoodPreference
             preference, created = UserFoodPreference.objects.get_or_create(
@@ -337,87 +429,179 @@ def recommendation_feedback(request):
         
     except Recommendation.DoesNotExist:
         return Response({'error': 'Recomendación no encontrada'}, status=status.HTTP_404_NOT_FOUND)
+    except (ValueError, TypeError, ValidationError) as e:
+        return Response({'error': f'Datos inválidos: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def user_nutrition_insights(request):
     """Insights y análisis del comportamiento nutricional del usuario"""
     user = request.user
-    days = int(request.GET.get('days', 7))  # Análisis de últimos N días
     
-    from django.utils import timezone
-    from datetime import timedelta
-    
-    end_date = timezone.now().date()
-    start_date = end_date - timedelta(days=days-1)
+    try:
+        days = int(request.GET.get('days', 7))  # Análisis de últimos N días
+    except ValueError:
+        return Response({'error': 'days debe ser un número entero'}, status=status.HTTP_400_BAD_REQUEST)
+    if not 1 <= days <= MAX_WINDOW_DAYS:
+        return Response({'error': f'days debe estar entre 1 y {MAX_WINDOW_DAYS}'}, status=status.HTTP_400_BAD_REQUEST)
     
-    daily_logs = DailyNutritionLog.objects.filter(
-        user=user,
-        date__range=[start_date, end_date]
-    ).order_by('date')
+    context = UserNutritionContext.for_user(user)
+    insights = get_nutrition_insights(user.id, days, context.targets)
     
-    if not daily_logs.exists():
+    if insights is None:
         return Response({
             'message': 'No hay suficientes datos para generar insights'
         })
     
-    # Calcular promedios
-    avg_calories = sum(log.consumed_calories for log in daily_logs) / len(daily_logs)
-    avg_protein = sum(log.consumed_protein for log in daily_logs) / len(daily_logs)
-    avg_adherence = sum(log.adherence_score or 0 for log in daily_logs) / len(daily_logs)
+    return Response(insights)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def nutrition_rollups(request):
+    """Acumulados semanales o mensuales del usuario, con desglose por tipo de comida"""
+    user = request.user
+    period_type = request.GET.get('period', 'week')
+    if period_type not in ('week', 'month'):
+        return Response({'error': 'period debe ser "week" o "month"'}, status=status.HTTP_400_BAD_REQUEST)
     
-    # Identificar patrones
-    patterns = {
-        'consistent_days': len([log for log in daily_logs if log.adherence_score and log.adherence_score >= 70]),
-        'high_protein_days': len([log for log in daily_logs if log.consumed_protein >= user.daily_protein * 0.8]),
-        'balanced_days': len([log for log in daily_logs if log.balance_score and log.balance_score >= 70])
-    }
+    try:
+        limit = min(max(int(request.GET.get('limit', 12)), 1), MAX_ROLLUP_PERIODS)
+    except ValueError:
+        return Response({'error': 'limit debe ser un número entero'}, status=status.HTTP_400_BAD_REQUEST)
     
-    # Obtener comidas más frecuentes
-    from django.db.models import Count
-    frequent_foods = FoodConsumption.objects.filter(
-        daily_log__user=user,
-        daily_log__date__range=[start_date, end_date]
-    ).values('food__name_es', 'food__name').annotate(
-        count=Count('food')
-    ).order_by('-count')[:5]
-    
-    # Recomendaciones de mejora
-    recommendations_for_improvement = []
-    
-    if avg_protein < user.daily_protein * 0.8:
-        recommendations_for_improvement.append({
-            'area': 'Proteína',
-            'message': 'Considera aumentar tu consumo de proteína',
-            'suggestion': 'Incluye más carnes magras, huevos, o legumbres'
-        })
+    rollups = list(NutritionRollup.objects.filter(
+        user=user, period_type=period_type
+    ).order_by('-period_start')[:limit])
     
-    if avg_adherence < 60:
-        recommendations_for_improvement.append({
-            'area': 'Consistencia',
-            'message': 'Trabaja en ser más consistente con tus objetivos',
-            'suggestion': 'Planifica tus comidas con anticipación'
+    meals_by_period = {}
+    for meal in MealTypeRollup.objects.filter(
+        user=user, period_type=period_type,
+        period_start__in=[rollup.period_start for rollup in rollups]
+    ):
+        meals_by_period.setdefault(meal.period_start, {})[meal.meal_type] = {
+            'calories': round(meal.calories, 1),
+            'protein': round(meal.protein, 1),
+            'carbs': round(meal.carbs, 1),
+            'fat': round(meal.fat, 1),
+            'items_count': meal.items_count
+        }
+    
+    periods = []
+    for rollup in reversed(rollups):
+        days = rollup.days_logged or 1
+        periods.append({
+            'period_start': rollup.period_start.isoformat(),
+            'days_logged': rollup.days_logged,
+            'days_on_target': rollup.days_on_target,
+            'average_adherence': round(rollup.average_adherence, 1) if rollup.days_logged else None,
+            'totals': {
+                'calories': round(rollup.consumed_calories, 1),
+                'protein': round(rollup.consumed_protein, 1),
+                'carbs': round(rollup.consumed_carbs, 1),
+                'fat': round(rollup.consumed_fat, 1),
+                'fiber': round(rollup.consumed_fiber, 1),
+                'sodium': round(rollup.consumed_sodium, 1)
+            },
+            'daily_averages': {
+                'calories': round(rollup.consumed_calories / days, 1),
+                'protein': round(rollup.consumed_protein / days, 1),
+                'carbs': round(rollup.consumed_carbs / days, 1),
+                'fat': round(rollup.consumed_fat / days, 1)
+            },
+            'meal_types': meals_by_period.get(rollup.period_start, {})
         })
     
-    return Response({
-        'period': f'Últimos {days} días',
-        'averages': {
-            'calories': round(avg_calories, 1),
-            'protein': round(avg_protein, 1),
-            'adherence_score': round(avg_adherence, 1)
-        },
-        'patterns': patterns,
-        'frequent_foods': list(frequent_foods),
-        'improvement_recommendations': recommendations_for_improvement,
-        'daily_data': [
-            {
-                'date': log.date.isoformat(),
-                'calories': log.consumed_calories,
-                'protein': log.consumed_protein,
-                'adherence': log.adherence_score
-            } for log in daily_logs
-        ]
+    return Response({'period_type': period_type, 'periods': periods})
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def nutrition_time_series(request):
+    """Series diarias (calorías, macros, adherencia) reducidas en el servidor, con GET condicional"""
+    user = request.user
+    today = timezone.now().date()
+    
+    try:
+        end_date = date.fromisoformat(request.GET['end']) if request.GET.get('end') else today
+        start_date = (
+            date.fromisoformat(request.GET['start']) if request.GET.get('start')
+            else end_date - timedelta(days=29)
+        )
+        points = int(request.GET.get('points', 200))
+    except ValueError:
+        return Response({'error': 'Parámetros inválidos. Use fechas YYYY-MM-DD y points entero'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if start_date > end_date:
+        return Response({'error': 'start debe ser anterior a end'}, status=status.HTTP_400_BAD_REQUEST)
+    if not 3 <= points <= MAX_SERIES_POINTS:
+        return Response({'error': f'points debe estar entre 3 y {MAX_SERIES_POINTS}'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    method = request.GET.get('method', 'bucket')
+    if method not in DOWNSAMPLE_METHODS:
+        return Response({'error': f'method debe ser uno de: {", ".join(DOWNSAMPLE_METHODS)}'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    series = request.GET.get('series')
+    series = series.split(',') if series else list(SERIES_FIELDS)
+    unknown = [name for name in series if name not in SERIES_FIELDS]
+    if unknown:
+        return Response({'error': f'Series desconocidas: {", ".join(unknown)}'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Validadores a partir de la última actualización de logs del usuario
+    stamp = get_log_stamp(user.id)
+    etag = '"{}"'.format(hashlib.md5(
+        f'{user.id}:{stamp}:{start_date}:{end_date}:{points}:{method}:{",".join(series)}'.encode()
+    ).hexdigest())
+    last_modified = int(stamp) if stamp else None
+    
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+    
+    data = build_time_series(user.id, start_date, end_date, series, points, method)
+    response = Response({
+        'start': start_date.isoformat(),
+        'end': end_date.isoformat(),
+        'method': method,
+        'points': points,
+        **data
     })
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    # Privado: cada usuario ve sus datos; revalidar siempre con ETag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_nutrition_history(request):
+    """Exportar el historial de consumos del usuario en CSV (streaming) o Parquet"""
+    user = request.user
+    export_format = request.GET.get('export_format', 'csv')
+    if export_format not in ('csv', 'parquet'):
+        return Response({'error': 'export_format debe ser "csv" o "parquet"'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        start_date = date.fromisoformat(request.GET['start']) if request.GET.get('start') else None
+        end_date = date.fromisoformat(request.GET['end']) if request.GET.get('end') else None
+    except ValueError:
+        return Response({'error': 'Formato de fecha inválido. Use YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    queryset = export_queryset([user.id], start_date, end_date)
+    filename = f'nutrimatch_{user.username}_{timezone.now():%Y%m%d}'
+    
+    if export_format == 'csv':
+        response = StreamingHttpResponse(iter_csv(queryset), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+        return response
+    
+    # Parquet escribe su índice al final: se genera en un temporal en disco y se sirve por bloques
+    sink = tempfile.TemporaryFile()
+    write_parquet(queryset, sink)
+    sink.seek(0)
+    return FileResponse(
+        sink, as_attachment=True, filename=f'{filename}.parquet',
+        content_type='application/vnd.apache.parquet'
+    )
 
 class NutritionalProfileView(generics.RetrieveUpdateAPIView):
     """Ver y actualizar perfil nutricional"""
@@ -425,16 +609,10 @@ class NutritionalProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = [IsAuthenticated]
     
     def get_object(self):
-        profile, created = NutritionalProfile.objects.get_or_create(
-            user=self.request.user,
-            defaults={
-                'target_calories': self.request.user.daily_calories or 2000,
-                'target_protein': self.request.user.daily_protein or 150,
-                'target_carbs': self.request.user.daily_carbs or 250,
-                'target_fat': self.request.user.daily_fat or 65
-            }
-        )
-        return profile
+        try:
+            return NutritionalProfile.objects.get(user=self.request.user)
+        except NutritionalProfile.DoesNotExist:
+            return ensure_nutritional_profile(self.request.user)
 
 class UserFoodRatingListView(generics.ListCreateAPIView):
     """Lista y crear calificaciones de alimentos"""
@@ -450,7 +628,7 @@ class UserFoodRatingListView(generics.ListCreateAPIView):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def get_simple_recommendations(request):
-    """Recomendaciones simples - versión de emergencia"""
+    """Recomendaciones simples - versión de emergencia (usar get_recommendations con time_budget_ms)"""
     user = request.user
     
     # Parámetros
@@ -471,7 +649,7 @@ def get_simple_recommendations(request):
             breakfast_keywords = ['egg', 'milk', 'bread', 'fruit', 'yogurt', 'oat', 'cereal', 'banana', 'apple']
             breakfast_q = Q()
             for keyword in breakfast_keywords:
-                breakfast_q |= Q(name__icontains=keyword)
+                breakfast_q |= Q(name_key__contains=keyword)
             
             breakfast_foods = foods.filter(breakfast_q)
             if breakfast_foods.exists():
@@ -482,7 +660,7 @@ def get_simple_recommendations(request):
             main_keywords = ['chicken', 'rice', 'beef', 'fish', 'pasta', 'potato', 'beans']
             main_q = Q()
             for keyword in main_keywords:
-                main_q |= Q(name__icontains=keyword)
+                main_q |= Q(name_key__contains=keyword)
             
             main_foods = foods.filter(main_q)
             if main_foods.exists():